@@ -28,6 +28,8 @@ class Settings(BaseSettings):
     gemini_api_key: str = Field(default="")
     openai_api_key: str = Field(default="")
     ollama_base_url: str = Field(default="http://localhost:11434")
+    # Monta e aquece o RAG na subida da API; /health só passa quando ele estiver pronto.
+    rag_prewarm: bool = Field(default=False)
 
     # SIGAA
     sigaa_url: str = Field(default="")
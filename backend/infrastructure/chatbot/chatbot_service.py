@@ -58,11 +58,12 @@ faz com o RAG e com o Chatwoot.
 from __future__ import annotations
 
 import hashlib
+import json
 import re
 import time
 import unicodedata
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import MISSING, dataclass, field, fields
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Optional
@@ -124,7 +125,8 @@ class ChatState(str, Enum):
     ENDED = "ended"
 
 
-@dataclass
+# `slots=True`: sem __dict__ por instância — uma sessão por conversa ativa.
+@dataclass(slots=True)
 class ChatSession:
     session_id: str
     state: ChatState = ChatState.AWAITING_MATRICULA
@@ -157,34 +159,101 @@ class ChatSession:
     def is_expired(self) -> bool:
         return time.time() - self.last_activity > SESSION_TTL_SECONDS
 
+    @property
+    def expires_at(self) -> float:
+        return self.last_activity + SESSION_TTL_SECONDS
+
+    def dumps(self) -> str:
+        """
+        JSON compacto para o store compartilhado: só os campos fora do padrão.
+
+        Do candidato reconhecido guarda apenas matrícula, nome e e-mail — o
+        que a confirmação usa; o resto do registro do diretório fica no banco.
+        """
+        data = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.default is not MISSING and value == f.default:
+                continue
+            if f.name == "state":
+                value = value.value
+            elif f.name == "recognized":
+                value = {k: value.get(k) for k in ("matricula", "nome", "email")}
+            data[f.name] = value
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, data: str) -> "ChatSession":
+        raw = json.loads(data)
+        if "state" in raw:
+            raw["state"] = ChatState(raw["state"])
+        return cls(**raw)
+
+
+# ── Registro de sessões ───────────────────────────────────────────────────────
+#
+# Em memória por padrão; `CHATBOT_SESSION_BACKEND=database` compartilha as
+# sessões entre workers (ver `session_store`). No backend em memória a sessão
+# devolvida é o próprio objeto guardado; no banco, quem a altera grava de volta
+# com `save_session` / `save_conversation_session`.
+
+WEB_NAMESPACE = "web"
+CONVERSATION_NAMESPACE = "conversa"
 
-# ── Registro de sessões (em memória) ─────────────────────────────────────────
 
-_sessions: dict[str, ChatSession] = {}
-_sessions_by_conversation: dict[int, ChatSession] = {}
+def _store():
+    from backend.infrastructure.chatbot.session_store import get_session_store
+    return get_session_store()
 
 
 def _cleanup_expired() -> None:
-    expired = [sid for sid, s in _sessions.items() if s.is_expired()]
-    for sid in expired:
-        del _sessions[sid]
-    expired_conv = [cid for cid, s in _sessions_by_conversation.items() if s.is_expired()]
-    for cid in expired_conv:
-        del _sessions_by_conversation[cid]
+    # Barato a cada mensagem: o store só olha o prazo mais próximo (heap).
+    _store().purge_expired()
+
+
+def _get_active(namespace: str, key) -> Optional[ChatSession]:
+    sess = _store().get(namespace, key)
+    if sess is not None and sess.is_expired():
+        _store().delete(namespace, key)
+        return None
+    return sess
 
 
 def get_or_create_session(session_id: Optional[str]) -> ChatSession:
     _cleanup_expired()
-    if session_id and session_id in _sessions:
-        sess = _sessions[session_id]
+    sess = _get_active(WEB_NAMESPACE, session_id) if session_id else None
+    if sess is not None:
         sess.touch()
+        _store().put(WEB_NAMESPACE, session_id, sess)
         return sess
     new_id = str(uuid.uuid4())
     sess = ChatSession(session_id=new_id)
-    _sessions[new_id] = sess
+    _store().put(WEB_NAMESPACE, new_id, sess)
     return sess
 
 
+def save_session(session: ChatSession) -> None:
+    """Grava a sessão do endpoint REST depois de processar uma mensagem."""
+    _store().put(WEB_NAMESPACE, session.session_id, session)
+
+
+def save_conversation_session(conversation_id: int, session: ChatSession) -> None:
+    """Grava a sessão da conversa do Chatwoot depois de processar um evento."""
+    _store().put(CONVERSATION_NAMESPACE, conversation_id, session)
+
+
+def lock_conversation(conversation_id: int) -> bool:
+    """
+    Bloqueia a conversa para um atendimento (entre processos, no backend do
+    banco). False se o prazo esgotou — quem chama segue mesmo assim, com aviso.
+    """
+    return _store().acquire(CONVERSATION_NAMESPACE, conversation_id)
+
+
+def unlock_conversation(conversation_id: int) -> None:
+    _store().release(CONVERSATION_NAMESPACE, conversation_id)
+
+
 def get_or_create_session_by_conversation(conversation_id: int) -> tuple[ChatSession, bool]:
     """
     Sessão endereçada pelo conversation_id do Chatwoot (usada pelo webhook —
@@ -192,12 +261,13 @@ def get_or_create_session_by_conversation(conversation_id: int) -> tuple[ChatSes
     Retorna (sessão, criada_agora).
     """
     _cleanup_expired()
-    existing = _sessions_by_conversation.get(conversation_id)
+    existing = _get_active(CONVERSATION_NAMESPACE, conversation_id)
     if existing:
         existing.touch()
+        _store().put(CONVERSATION_NAMESPACE, conversation_id, existing)
         return existing, False
     sess = ChatSession(session_id=str(uuid.uuid4()), chatwoot_conversation_id=conversation_id)
-    _sessions_by_conversation[conversation_id] = sess
+    _store().put(CONVERSATION_NAMESPACE, conversation_id, sess)
     return sess, True
 
 
@@ -213,13 +283,13 @@ def reset_session_for_conversation(conversation_id: int) -> ChatSession:
     ticket somem: o novo atendimento passa pelo reconhecimento outra vez e
     ganha um ticket novo.
     """
-    anterior = _sessions_by_conversation.get(conversation_id)
+    anterior = _store().get(CONVERSATION_NAMESPACE, conversation_id)
     sess = ChatSession(session_id=str(uuid.uuid4()), chatwoot_conversation_id=conversation_id)
     if anterior:
         sess.contact_channel = anterior.contact_channel
         sess.contact_key = anterior.contact_key
         sess.chatwoot_contact_id = anterior.chatwoot_contact_id
-    _sessions_by_conversation[conversation_id] = sess
+    _store().put(CONVERSATION_NAMESPACE, conversation_id, sess)
     return sess
 
 
@@ -0,0 +1,288 @@
+"""Armazenamento das sessões do chatbot (memória ou banco compartilhado).
+
+Em memória, as sessões vivem no processo: com mais de um worker do uvicorn a
+máquina de estados de uma conversa se divide entre processos, e um restart
+perde o atendimento no meio. Com ``CHATBOT_SESSION_BACKEND=database`` as
+sessões ficam na tabela ``chatbot_sessoes`` (SQLite/PostgreSQL pelo engine da
+aplicação), serializadas em JSON compacto (``ChatSession.dumps``), com expiração
+por TTL e um bloqueio por conversa (lease com prazo) que vale entre processos.
+
+Endereçamento: ``namespace`` separa as sessões do endpoint REST (``"web"``,
+chave = session_id) das do webhook do Chatwoot (``"conversa"``, chave =
+conversation_id).
+
+O backend em memória devolve sempre o MESMO objeto — alterações na sessão
+valem sem ``put``. No banco, quem altera a sessão precisa gravá-la de volta.
+
+Expiração: a sessão vencida nunca é devolvida (checagem na leitura). A memória
+é recuperada por um heap de prazos — ``purge_expired`` só olha o topo, então
+custa O(1) quando nada venceu, em vez de varrer todas as sessões a cada
+mensagem — e por uma varredura periódica no event loop
+(``start_session_sweeper``, iniciada no lifespan da API).
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Protocol, Tuple
+
+if TYPE_CHECKING:
+    from backend.infrastructure.chatbot.chatbot_service import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# "memory" (padrão, um processo) ou "database" (compartilhado entre workers).
+SESSION_BACKEND = os.getenv("CHATBOT_SESSION_BACKEND", "memory").strip().lower()
+# Prazo do bloqueio por conversa: se o processo que o detém morrer, outro
+# assume depois disso. Maior que o tempo de um atendimento (RAG + LLM).
+SESSION_LOCK_LEASE_S = float(os.getenv("CHATBOT_SESSION_LOCK_LEASE_S", "60"))
+# Quanto esperar pelo bloqueio antes de seguir sem ele (com aviso no log).
+SESSION_LOCK_TIMEOUT_S = float(os.getenv("CHATBOT_SESSION_LOCK_TIMEOUT_S", "30"))
+# Intervalo mínimo entre purgas de sessões vencidas no banco.
+SESSION_PURGE_INTERVAL_S = 300.0
+# Intervalo da varredura de sessões vencidas em segundo plano.
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("CHATBOT_SESSION_SWEEP_INTERVAL_S", "60"))
+
+
+class SessionStore(Protocol):
+    def get(self, namespace: str, key: Hashable) -> Optional["ChatSession"]:
+        """Sessão ativa (não expirada) ou None."""
+
+    def put(self, namespace: str, key: Hashable, session: "ChatSession") -> None:
+        ...
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        ...
+
+    def acquire(self, namespace: str, key: Hashable, timeout: float = SESSION_LOCK_TIMEOUT_S) -> bool:
+        """Bloqueia a sessão para um atendimento; False se o prazo esgotou."""
+
+    def release(self, namespace: str, key: Hashable) -> None:
+        ...
+
+    def purge_expired(self) -> int:
+        """Remove as sessões vencidas; retorna quantas."""
+
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class MemorySessionStore:
+    """Sessões no processo (dict por namespace) — o comportamento de sempre.
+
+    Cada ``put`` agenda o prazo da sessão num heap mínimo. Entradas antigas
+    (sessão regravada com prazo novo, ou removida) não são procuradas no heap:
+    ``_deadlines`` guarda o prazo vigente de cada chave e a entrada que não
+    bate com ele é descartada quando chega ao topo. Se o heap acumular muitas
+    entradas obsoletas, é reconstruído a partir de ``_deadlines``.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Dict[Hashable, "ChatSession"]] = {}
+        self._guard = threading.Lock()
+        # (namespace, key) → [lock, quantos seguram/esperam]; some ao zerar.
+        self._locks: Dict[Tuple[str, Hashable], List[Any]] = {}
+        self._heap: List[Tuple[float, int, str, Hashable]] = []
+        self._deadlines: Dict[Tuple[str, Hashable], float] = {}
+        self._seq = 0
+        self.expired = 0
+
+    def get(self, namespace: str, key: Hashable) -> Optional["ChatSession"]:
+        return self._data.get(namespace, {}).get(key)
+
+    def put(self, namespace: str, key: Hashable, session: "ChatSession") -> None:
+        with self._guard:
+            self._data.setdefault(namespace, {})[key] = session
+            self._schedule(namespace, key, session.expires_at)
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        with self._guard:
+            self._data.get(namespace, {}).pop(key, None)
+            self._deadlines.pop((namespace, key), None)
+
+    def _schedule(self, namespace: str, key: Hashable, deadline: float) -> None:
+        if self._deadlines.get((namespace, key)) == deadline:
+            return
+        self._deadlines[(namespace, key)] = deadline
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, namespace, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = []
+            for (ns, k), d in self._deadlines.items():
+                self._seq += 1
+                self._heap.append((d, self._seq, ns, k))
+            heapq.heapify(self._heap)
+
+    def acquire(self, namespace: str, key: Hashable, timeout: float = SESSION_LOCK_TIMEOUT_S) -> bool:
+        with self._guard:
+            entry = self._locks.setdefault((namespace, key), [threading.Lock(), 0])
+            entry[1] += 1
+        if entry[0].acquire(timeout=timeout):
+            return True
+        self._drop_lock_ref((namespace, key), entry)
+        return False
+
+    def release(self, namespace: str, key: Hashable) -> None:
+        with self._guard:
+            entry = self._locks.get((namespace, key))
+        if entry is None:
+            return
+        entry[0].release()
+        self._drop_lock_ref((namespace, key), entry)
+
+    def _drop_lock_ref(self, lock_key: Tuple[str, Hashable], entry: List[Any]) -> None:
+        with self._guard:
+            entry[1] -= 1
+            if entry[1] <= 0 and self._locks.get(lock_key) is entry:
+                del self._locks[lock_key]
+
+    def purge_expired(self) -> int:
+        """Remove as sessões cujo prazo venceu, do topo do heap para baixo."""
+        removed = 0
+        now = time.time()
+        with self._guard:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, namespace, key = heapq.heappop(self._heap)
+                if self._deadlines.get((namespace, key)) != deadline:
+                    continue  # entrada obsoleta: a sessão foi regravada ou removida
+                del self._deadlines[(namespace, key)]
+                session = self._data.get(namespace, {}).get(key)
+                if session is None:
+                    continue
+                if session.is_expired():
+                    del self._data[namespace][key]
+                    removed += 1
+                else:
+                    # Atividade registrada sem `put` (touch direto): reagenda.
+                    self._schedule(namespace, key, session.expires_at)
+        self.expired += removed
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(sessions) for sessions in self._data.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": {namespace: len(sessions) for namespace, sessions in self._data.items()},
+            "locks": len(self._locks),
+            "expiry_heap": len(self._heap),
+            "expired": self.expired,
+        }
+
+
+class DatabaseSessionStore:
+    """Sessões na tabela ``chatbot_sessoes``, compartilhadas entre processos."""
+
+    def __init__(self, lock_lease_s: float = SESSION_LOCK_LEASE_S) -> None:
+        self.lock_lease_s = lock_lease_s
+        self._last_purge = time.monotonic()
+        self.lock_timeouts = 0
+
+    @staticmethod
+    def _key(namespace: str, key: Hashable) -> str:
+        return f"{namespace}:{key}"
+
+    def get(self, namespace: str, key: Hashable) -> Optional["ChatSession"]:
+        from backend.infrastructure.chatbot.chatbot_service import ChatSession
+        from backend.infrastructure.database.repository import carregar_sessao_chatbot
+
+        dados = carregar_sessao_chatbot(self._key(namespace, key))
+        return ChatSession.loads(dados) if dados else None
+
+    def put(self, namespace: str, key: Hashable, session: "ChatSession") -> None:
+        from backend.infrastructure.database.repository import salvar_sessao_chatbot
+
+        salvar_sessao_chatbot(self._key(namespace, key), session.dumps(), session.expires_at)
+
+    def delete(self, namespace: str, key: Hashable) -> None:
+        from backend.infrastructure.database.repository import remover_sessao_chatbot
+
+        remover_sessao_chatbot(self._key(namespace, key))
+
+    def acquire(self, namespace: str, key: Hashable, timeout: float = SESSION_LOCK_TIMEOUT_S) -> bool:
+        from backend.infrastructure.database.repository import adquirir_bloqueio_sessao_chatbot
+
+        chave = self._key(namespace, key)
+        deadline = time.monotonic() + timeout
+        delay = 0.02
+        while True:
+            if adquirir_bloqueio_sessao_chatbot(chave, self.lock_lease_s):
+                return True
+            if time.monotonic() >= deadline:
+                self.lock_timeouts += 1
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def release(self, namespace: str, key: Hashable) -> None:
+        from backend.infrastructure.database.repository import liberar_bloqueio_sessao_chatbot
+
+        liberar_bloqueio_sessao_chatbot(self._key(namespace, key))
+
+    def purge_expired(self) -> int:
+        """Purga no máximo a cada ``SESSION_PURGE_INTERVAL_S`` (``get`` já ignora as vencidas)."""
+        from backend.infrastructure.database.repository import purgar_sessoes_chatbot_expiradas
+
+        if time.monotonic() - self._last_purge < SESSION_PURGE_INTERVAL_S:
+            return 0
+        self._last_purge = time.monotonic()
+        return purgar_sessoes_chatbot_expiradas()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "database",
+            "lock_lease_s": self.lock_lease_s,
+            "lock_timeouts": self.lock_timeouts,
+        }
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Store global das sessões (criado sob demanda, conforme o backend configurado)."""
+    global _store
+    if _store is None:
+        _store = DatabaseSessionStore() if SESSION_BACKEND == "database" else MemorySessionStore()
+        logger.info("Sessões do chatbot: backend %s", type(_store).__name__)
+    return _store
+
+
+# ── Varredura em segundo plano ───────────────────────────────────────────────
+
+_sweeper: Optional["asyncio.Task[None]"] = None
+
+
+async def _sweep_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await asyncio.to_thread(get_session_store().purge_expired)
+        except Exception as exc:
+            logger.warning("⚠️ Falha na varredura de sessões do chatbot: %s", exc)
+            continue
+        if removed:
+            logger.info("🧹 %d sessão(ões) do chatbot expirada(s) removida(s)", removed)
+
+
+def start_session_sweeper(interval: float = SESSION_SWEEP_INTERVAL_S) -> "asyncio.Task[None]":
+    """Agenda a varredura periódica no event loop corrente (idempotente)."""
+    global _sweeper
+    loop = asyncio.get_running_loop()
+    if _sweeper is None or _sweeper.done() or _sweeper.get_loop() is not loop:
+        _sweeper = loop.create_task(_sweep_forever(max(0.01, interval)), name="chatbot-session-sweeper")
+    return _sweeper
+
+
+async def stop_session_sweeper() -> None:
+    global _sweeper
+    task, _sweeper = _sweeper, None
+    if task is None or task.done():
+        return
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
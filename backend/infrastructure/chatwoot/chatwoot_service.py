@@ -7,15 +7,104 @@ Documentação oficial: https://www.chatwoot.com/developers/api
 Todas as funções lêem as settings de forma lazy (na chamada, não no import),
 para garantir que variáveis de ambiente alteradas após o boot sejam refletidas
 e para facilitar testes unitários com mock.
+
+As chamadas reutilizam conexões de um pool compartilhado (keep-alive e HTTP/2
+quando o pacote ``h2`` está instalado), em vez de um handshake TCP+TLS novo por
+resposta do bot. Há dois clientes: ``httpx.Client`` para as funções síncronas
+(usadas pelo fluxo do chatbot, que roda em thread) e ``httpx.AsyncClient``
+para ``send_message_async``/``send_quick_replies_async``, aguardadas direto
+pelo webhook. O cliente assíncrono é aberto/fechado no lifespan da aplicação.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+import threading
 from typing import Optional
 import httpx
 
 logger = logging.getLogger(__name__)
 
+# Pool de conexões com o Chatwoot (um único host): conexões simultâneas,
+# conexões ociosas mantidas e por quanto tempo (s) uma ociosa é reaproveitada.
+HTTP_MAX_CONNECTIONS = int(os.getenv("CHATWOOT_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("CHATWOOT_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("CHATWOOT_HTTP_KEEPALIVE_EXPIRY_S", "60"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("CHATWOOT_HTTP_CONNECT_TIMEOUT_S", "5"))
+
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 só com o extra ``httpx[http2]`` (pacote ``h2``) instalado."""
+    if os.getenv("CHATWOOT_HTTP2", "1").lower() in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _client_options() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+        "timeout": httpx.Timeout(10.0, connect=HTTP_CONNECT_TIMEOUT_S),
+    }
+
+
+def get_client() -> httpx.Client:
+    """Cliente síncrono compartilhado (criado sob demanda, thread-safe)."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_options())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Cliente assíncrono compartilhado do event loop corrente.
+
+    Normalmente já foi aberto por ``open_async_client`` no lifespan; se não
+    (ex.: testes sem lifespan) ou se o loop mudou, cria um novo — conexões de
+    um AsyncClient não podem ser usadas em outro event loop.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(**_client_options())
+        _async_client_loop = loop
+    return _async_client
+
+
+async def open_async_client() -> httpx.AsyncClient:
+    """Abre o pool assíncrono no startup da aplicação."""
+    client = get_async_client()
+    logger.info("Chatwoot: pool HTTP aberto (http2=%s, max_connections=%s)", _http2_enabled(), HTTP_MAX_CONNECTIONS)
+    return client
+
+
+async def close_clients() -> None:
+    """Fecha os pools (shutdown da aplicação)."""
+    global _client, _async_client, _async_client_loop
+    async_client, _async_client, _async_client_loop = _async_client, None, None
+    if async_client is not None and not async_client.is_closed:
+        await async_client.aclose()
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
 
 def _cfg() -> tuple[str, int, str]:
     """Retorna (base_url, account_id, token) lendo as settings no momento da chamada."""
@@ -40,7 +129,7 @@ def check_connection() -> dict:
     if not token or not base:
         return {"ok": False, "error": "CHATWOOT_API_TOKEN ou CHATWOOT_API_URL não configurados"}
     try:
-        r = httpx.get(
+        r = get_client().get(
             f"{base}/api/v1/accounts/{acct}/inboxes",
             headers=_headers(token),
             timeout=8,
@@ -48,7 +137,7 @@ def check_connection() -> dict:
         r.raise_for_status()
         inboxes = r.json().get("payload", [])
         # Listar equipes
-        rt = httpx.get(
+        rt = get_client().get(
             f"{base}/api/v1/accounts/{acct}/teams",
             headers=_headers(token),
             timeout=8,
@@ -76,10 +165,11 @@ def create_or_get_contact(*, name: str, email: str, phone: Optional[str] = None)
     """Cria ou busca um contato no Chatwoot. Retorna o contact_id."""
     base, acct, token = _cfg()
     hdrs = _headers(token)
+    client = get_client()
 
     # Tenta buscar por e-mail primeiro
     try:
-        r = httpx.get(
+        r = client.get(
             _url(base, acct, "contacts/search"),
             params={"q": email, "include_contacts": "true"},
             headers=hdrs,
@@ -99,7 +189,7 @@ def create_or_get_contact(*, name: str, email: str, phone: Optional[str] = None)
     if phone:
         payload["phone_number"] = phone
 
-    r = httpx.post(_url(base, acct, "contacts"), json=payload, headers=hdrs, timeout=10)
+    r = client.post(_url(base, acct, "contacts"), json=payload, headers=hdrs, timeout=10)
     r.raise_for_status()
     contact_id = r.json()["id"]
     logger.info("Chatwoot: novo contato criado id=%s email=%s", contact_id, email)
@@ -123,7 +213,7 @@ def update_contact_attributes(contact_id: int, *, custom_attributes: dict) -> No
         return
     base, acct, token = _cfg()
     try:
-        r = httpx.put(
+        r = get_client().put(
             _url(base, acct, f"contacts/{contact_id}"),
             json={"custom_attributes": custom_attributes},
             headers=_headers(token),
@@ -154,7 +244,7 @@ def create_conversation(
     if additional_attributes:
         payload["additional_attributes"] = additional_attributes
 
-    r = httpx.post(
+    r = get_client().post(
         _url(base, acct, "conversations"),
         json=payload,
         headers=_headers(token),
@@ -176,8 +266,9 @@ def assign_team(conversation_id: int, team_id: int) -> None:
     # POST /assignments é o método que efetivamente atribui a equipe nesta
     # instância — o PATCH direto na conversa retorna 200 sem aplicar a
     # mudança (não lança erro, então um fallback nunca seria acionado).
+    client = get_client()
     try:
-        r = httpx.post(
+        r = client.post(
             _url(base, acct, f"conversations/{conversation_id}/assignments"),
             json={"team_id": team_id},
             headers=_headers(token),
@@ -191,7 +282,7 @@ def assign_team(conversation_id: int, team_id: int) -> None:
 
     # Fallback: PATCH direto na conversa
     try:
-        r = httpx.patch(
+        r = client.patch(
             _url(base, acct, f"conversations/{conversation_id}"),
             json={"team_id": team_id},
             headers=_headers(token),
@@ -207,7 +298,21 @@ def send_message(conversation_id: int, content: str, *, private: bool = False) -
     """Envia uma mensagem (bot/agente) em uma conversa do Chatwoot."""
     base, acct, token = _cfg()
     payload = {"content": content, "message_type": "outgoing", "private": private}
-    r = httpx.post(
+    r = get_client().post(
+        _url(base, acct, f"conversations/{conversation_id}/messages"),
+        json=payload,
+        headers=_headers(token),
+        timeout=10,
+    )
+    r.raise_for_status()
+    logger.info("Chatwoot: mensagem enviada na conversa %s (private=%s)", conversation_id, private)
+
+
+async def send_message_async(conversation_id: int, content: str, *, private: bool = False) -> None:
+    """Variante assíncrona de ``send_message``."""
+    base, acct, token = _cfg()
+    payload = {"content": content, "message_type": "outgoing", "private": private}
+    r = await get_async_client().post(
         _url(base, acct, f"conversations/{conversation_id}/messages"),
         json=payload,
         headers=_headers(token),
@@ -217,6 +322,15 @@ def send_message(conversation_id: int, content: str, *, private: bool = False) -
     logger.info("Chatwoot: mensagem enviada na conversa %s (private=%s)", conversation_id, private)
 
 
+def _quick_replies_payload(options: list[str], content: str) -> dict:
+    return {
+        "content": content,
+        "message_type": "outgoing",
+        "content_type": "input_select",
+        "content_attributes": {"items": [{"title": opt, "value": opt} for opt in options]},
+    }
+
+
 def send_quick_replies(
     conversation_id: int,
     options: list[str],
@@ -232,15 +346,27 @@ def send_quick_replies(
     o texto e outra só com "Escolha uma opção:".
     """
     base, acct, token = _cfg()
-    payload = {
-        "content": content,
-        "message_type": "outgoing",
-        "content_type": "input_select",
-        "content_attributes": {"items": [{"title": opt, "value": opt} for opt in options]},
-    }
-    r = httpx.post(
+    r = get_client().post(
         _url(base, acct, f"conversations/{conversation_id}/messages"),
-        json=payload,
+        json=_quick_replies_payload(options, content),
+        headers=_headers(token),
+        timeout=10,
+    )
+    r.raise_for_status()
+    logger.info("Chatwoot: quick-replies enviadas na conversa %s (%d opções)", conversation_id, len(options))
+
+
+async def send_quick_replies_async(
+    conversation_id: int,
+    options: list[str],
+    *,
+    content: str = "Escolha uma opção:",
+) -> None:
+    """Variante assíncrona de ``send_quick_replies``."""
+    base, acct, token = _cfg()
+    r = await get_async_client().post(
+        _url(base, acct, f"conversations/{conversation_id}/messages"),
+        json=_quick_replies_payload(options, content),
         headers=_headers(token),
         timeout=10,
     )
@@ -0,0 +1,177 @@
+"""Deduplicação de reentregas do webhook do Chatwoot.
+
+O Chatwoot reenvia ``message_created`` quando não recebe resposta a tempo (ou
+em retries de rede). Sem deduplicação, a reentrega roda a máquina de estados
+de novo — pode avançar o estado errado ou chamar o RAG duas vezes e mandar duas
+respostas. O webhook consulta este índice ANTES de enfileirar qualquer trabalho.
+
+O índice em memória é limitado em tamanho (LRU por ordem de chegada) e em tempo
+(TTL). Com ``CHATWOOT_WEBHOOK_DEDUP_BACKEND=database``, uma mensagem não vista
+localmente é conferida também na tabela ``chatbot_webhook_mensagens`` — é o que
+cobre reentregas que caem em outra réplica da API. Falha no backend é
+fail-open: vale a resposta do índice local.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+# Por quanto tempo (s) uma mensagem continua "vista" e quantas ficam em memória.
+DEDUP_TTL_S = float(os.getenv("CHATWOOT_WEBHOOK_DEDUP_TTL_S", "86400"))
+DEDUP_MAX_ENTRIES = int(os.getenv("CHATWOOT_WEBHOOK_DEDUP_MAX_ENTRIES", "50000"))
+# "memory" (padrão) ou "database" (tabela compartilhada entre réplicas).
+DEDUP_BACKEND = os.getenv("CHATWOOT_WEBHOOK_DEDUP_BACKEND", "memory").strip().lower()
+# A cada quantos registros no backend os vencidos são purgados.
+DEDUP_PURGE_EVERY = 1000
+
+
+class SeenBackend(Protocol):
+    def claim(self, key: str, ttl_s: float) -> bool:
+        """True se ``key`` foi registrada agora; False se já estava registrada."""
+
+    def forget(self, key: str) -> None:
+        ...
+
+
+class DatabaseSeenBackend:
+    """Registro compartilhado via banco da aplicação (SQLite/PostgreSQL)."""
+
+    def __init__(self) -> None:
+        self._claims = 0
+
+    def claim(self, key: str, ttl_s: float) -> bool:
+        from backend.infrastructure.database.repository import (
+            purgar_mensagens_webhook_expiradas,
+            registrar_mensagem_webhook,
+        )
+
+        novo = registrar_mensagem_webhook(key, ttl_s)
+        self._claims += 1
+        if self._claims % DEDUP_PURGE_EVERY == 0:
+            purgar_mensagens_webhook_expiradas()
+        return novo
+
+    def forget(self, key: str) -> None:
+        from backend.infrastructure.database.repository import remover_mensagem_webhook
+
+        remover_mensagem_webhook(key)
+
+
+class SeenMessageIndex:
+    """Índice limitado e com TTL das mensagens já recebidas."""
+
+    def __init__(
+        self,
+        max_entries: int = DEDUP_MAX_ENTRIES,
+        ttl_s: float = DEDUP_TTL_S,
+        backend: Optional[SeenBackend] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.backend = backend
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self.backend_errors = 0
+
+    def _purge(self, now: float) -> None:
+        # TTL fixo: a ordem de inserção é a ordem de expiração.
+        while self._expires and next(iter(self._expires.values())) <= now:
+            self._expires.popitem(last=False)
+        while len(self._expires) > self.max_entries:
+            self._expires.popitem(last=False)
+            self.evicted += 1
+
+    def check_and_mark(self, key: str) -> bool:
+        """True na primeira entrega de ``key``; False (e conta) numa reentrega."""
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            self.checked += 1
+            if key in self._expires:
+                self.duplicates += 1
+                return False
+            self._expires[key] = now + self.ttl_s
+            self._purge(now)
+        if self.backend is None:
+            return True
+        try:
+            novo = self.backend.claim(key, self.ttl_s)
+        except Exception as exc:
+            self.backend_errors += 1
+            logger.warning("Deduplicação do webhook: backend indisponível (%s) — usando só a memória", exc)
+            return True
+        if not novo:
+            with self._lock:
+                self.duplicates += 1
+        return novo
+
+    def forget(self, key: str) -> None:
+        """Remove ``key`` para que uma reentrega seja aceita (evento não enfileirado)."""
+        with self._lock:
+            self._expires.pop(key, None)
+        if self.backend is not None:
+            try:
+                self.backend.forget(key)
+            except Exception as exc:
+                self.backend_errors += 1
+                logger.warning("Deduplicação do webhook: falha ao esquecer %s: %s", key, exc)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._expires)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__ if self.backend is not None else "memory",
+                "entries": len(self._expires),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "evicted": self.evicted,
+                "backend_errors": self.backend_errors,
+            }
+
+    def render_prometheus(self) -> str:
+        stats = self.stats()
+        return "\n".join([
+            "# HELP chatwoot_webhook_duplicates_total Reentregas do webhook descartadas.",
+            "# TYPE chatwoot_webhook_duplicates_total counter",
+            f"chatwoot_webhook_duplicates_total {stats['duplicates']}",
+            "# HELP chatwoot_webhook_dedup_entries Mensagens no índice de deduplicação em memória.",
+            "# TYPE chatwoot_webhook_dedup_entries gauge",
+            f"chatwoot_webhook_dedup_entries {stats['entries']}",
+        ]) + "\n"
+
+
+def message_key(payload: dict) -> Optional[str]:
+    """``"<account_id>:<message_id>"`` do evento, ou None sem id de mensagem."""
+    message_id = payload.get("id")
+    if message_id in (None, ""):
+        return None
+    account = payload.get("account") if isinstance(payload.get("account"), dict) else {}
+    return f"{account.get('id', '')}:{message_id}"
+
+
+_index: Optional[SeenMessageIndex] = None
+
+
+def get_seen_index() -> SeenMessageIndex:
+    """Índice global do webhook (criado sob demanda, conforme o backend configurado)."""
+    global _index
+    if _index is None:
+        backend = DatabaseSeenBackend() if DEDUP_BACKEND == "database" else None
+        _index = SeenMessageIndex(backend=backend)
+    return _index
@@ -0,0 +1,240 @@
+"""Fila de processamento do webhook do Chatwoot (responde antes, processa depois).
+
+O webhook só valida o payload, enfileira o evento e responde 200; o fluxo do
+bot (que pode passar pela cadeia RAG + LLM por vários segundos) e a entrega da
+resposta rodam aqui, num pool limitado de workers no event loop da aplicação.
+Assim um LLM lento não segura a requisição do Chatwoot (nem dispara os retries
+dele por timeout).
+
+Ordem FIFO por conversa: enquanto um evento de uma conversa está em
+processamento, os seguintes da MESMA conversa esperam — duas mensagens do
+aluno nunca disputam a mesma sessão. Conversas diferentes andam em paralelo.
+
+Métricas: profundidade da fila, tempo de espera (enfileirado → início) e tempo
+de processamento, em ``stats()`` e no texto do Prometheus (``/metrics``).
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from backend.infrastructure.rag.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Workers simultâneos (conversas processadas em paralelo) e eventos aguardando
+# início; acima do limite o evento é recusado e logado.
+WEBHOOK_WORKERS = int(os.getenv("CHATWOOT_WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_PENDING = int(os.getenv("CHATWOOT_WEBHOOK_MAX_PENDING", "500"))
+# Resultados de jobs concluídos mantidos para consulta (diagnóstico/testes).
+WEBHOOK_RESULTS_KEPT = 256
+
+
+class QueueFull(RuntimeError):
+    """A fila atingiu ``max_pending`` eventos aguardando."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    key: Hashable
+    fn: Callable[[], Awaitable[Any]]
+    future: "asyncio.Future[Any]"
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class ConversationJobQueue:
+    """Pool de workers asyncio com FIFO por chave (conversa)."""
+
+    def __init__(
+        self,
+        workers: int = WEBHOOK_WORKERS,
+        max_pending: int = WEBHOOK_MAX_PENDING,
+        name: str = "chatwoot-webhook",
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._ready: Optional["asyncio.Queue[Hashable]"] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._pending: Dict[Hashable, Deque[Job]] = {}
+        self._scheduled: set = set()
+        self._results: "OrderedDict[str, asyncio.Future[Any]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._depth = 0
+        self._active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.peak_depth = 0
+        self.wait = LatencyHistogram()
+        self.processing = LatencyHistogram()
+
+    # ── ciclo de vida ────────────────────────────────────────────────────────
+
+    def start(self) -> "ConversationJobQueue":
+        """Sobe os workers no event loop corrente (idempotente)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks and not all(t.done() for t in self._tasks):
+            return self
+        self._loop = loop
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending.clear()
+        self._scheduled.clear()
+        self._depth = self._active = 0
+        self._tasks = [
+            loop.create_task(self._worker(), name=f"{self.name}-{i}") for i in range(self.workers)
+        ]
+        return self
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Espera os eventos em andamento (até ``timeout``) e encerra os workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Fila %s encerrada com %d evento(s) pendente(s).", self.name, self._depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ── produção/consumo ─────────────────────────────────────────────────────
+
+    def submit(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Job:
+        """Enfileira ``fn`` atrás dos eventos pendentes da mesma ``key``."""
+        self.start()
+        if self._depth >= self.max_pending:
+            self.rejected += 1
+            raise QueueFull(f"fila {self.name} cheia ({self._depth} eventos)")
+        job = Job(
+            job_id=str(next(self._ids)),
+            key=key,
+            fn=fn,
+            future=self._loop.create_future(),
+        )
+        self._results[job.job_id] = job.future
+        while len(self._results) > WEBHOOK_RESULTS_KEPT and next(iter(self._results.values())).done():
+            self._results.popitem(last=False)
+        self._pending.setdefault(key, deque()).append(job)
+        self._depth += 1
+        self.submitted += 1
+        self.peak_depth = max(self.peak_depth, self._depth)
+        self._idle.clear()
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            job = self._pending[key].popleft()
+            self._depth -= 1
+            self._active += 1
+            started = time.perf_counter()
+            self.wait.observe(started - job.enqueued_at)
+            try:
+                result = await job.fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.failed += 1
+                logger.error("Erro ao processar evento %s (%s=%s): %s", job.job_id, self.name, key, exc, exc_info=True)
+                if not job.future.done():
+                    job.future.set_exception(exc)
+                    job.future.exception()  # marca como recuperada (sem aviso de exceção não lida)
+            else:
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.processing.observe(time.perf_counter() - started)
+                self._active -= 1
+                if self._pending[key]:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                    self._scheduled.discard(key)
+                if self._depth == 0 and self._active == 0:
+                    self._idle.set()
+
+    async def join(self) -> None:
+        """Aguarda até não haver evento pendente nem em processamento."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def result(self, job_id: str) -> Any:
+        """Resultado de um job recente (aguarda se ainda estiver na fila)."""
+        return await self._results[job_id]
+
+    # ── métricas ─────────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": bool(self._tasks) and not all(t.done() for t in self._tasks),
+            "depth": self._depth,
+            "active": self._active,
+            "conversations": len(self._scheduled),
+            "max_pending": self.max_pending,
+            "peak_depth": self.peak_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_s": self.wait.summary(),
+            "processing_s": self.processing.summary(),
+        }
+
+    def render_prometheus(self) -> str:
+        """Métricas da fila no formato texto 0.0.4 do Prometheus."""
+        lines = [
+            "# HELP chatwoot_webhook_queue_depth Eventos do webhook aguardando processamento.",
+            "# TYPE chatwoot_webhook_queue_depth gauge",
+            f"chatwoot_webhook_queue_depth {self._depth}",
+            "# HELP chatwoot_webhook_active Eventos do webhook em processamento.",
+            "# TYPE chatwoot_webhook_active gauge",
+            f"chatwoot_webhook_active {self._active}",
+            "# HELP chatwoot_webhook_jobs_total Eventos do webhook, por resultado.",
+            "# TYPE chatwoot_webhook_jobs_total counter",
+        ]
+        for outcome, count in (
+            ("completed", self.completed), ("failed", self.failed), ("rejected", self.rejected),
+        ):
+            lines.append(f'chatwoot_webhook_jobs_total{{outcome="{outcome}"}} {count}')
+        for metric, histogram, help_text in (
+            ("chatwoot_webhook_wait_seconds", self.wait, "Espera na fila até o início do processamento."),
+            ("chatwoot_webhook_processing_seconds", self.processing, "Tempo de processamento de um evento."),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            bounds = [repr(float(b)) for b in histogram.buckets] + ["+Inf"]
+            for bound, cumulative in zip(bounds, histogram.cumulative_counts()):
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {histogram.sum!r}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+_queue: Optional[ConversationJobQueue] = None
+
+
+def get_webhook_queue() -> ConversationJobQueue:
+    """Fila global do webhook (criada sob demanda)."""
+    global _queue
+    if _queue is None:
+        _queue = ConversationJobQueue()
+    return _queue
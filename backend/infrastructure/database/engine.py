@@ -53,6 +53,8 @@ def init_db() -> None:
         LancamentoConceito,
         Funcionario,
         ChatbotContatoConhecido,
+        ChatbotWebhookMensagem,
+        ChatbotSessao,
     )
     
     print("🔧 Inicializando banco de dados...")
@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import Column, LargeBinary, UniqueConstraint
+from sqlalchemy import Column, LargeBinary, Text, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
 
@@ -546,3 +546,43 @@ class ChatbotContatoConhecido(SQLModel, table=True):
     atualizado_em: Optional[datetime] = Field(default=None)
     # Indexado: sustenta a janela de revalidação e a futura purga de retenção.
     ultimo_atendimento_em: Optional[datetime] = Field(default=None, index=True)
+
+
+class ChatbotWebhookMensagem(SQLModel, table=True):
+    """
+    Mensagem do webhook do Chatwoot já recebida (deduplicação de reentregas).
+
+    Backend compartilhado opcional do índice de mensagens vistas: com várias
+    réplicas da API, uma reentrega pode cair em outra instância. A chave é
+    ``"<account_id>:<message_id>"``; ``expira_em`` é epoch em segundos (sem
+    datetime, para a comparação ser igual em SQLite e PostgreSQL).
+    """
+
+    __tablename__ = "chatbot_webhook_mensagens"
+    __table_args__ = {"extend_existing": True}
+
+    chave: str = Field(primary_key=True, max_length=80)
+    expira_em: float = Field(index=True)
+
+
+class ChatbotSessao(SQLModel, table=True):
+    """
+    Sessão do chatbot no store compartilhado (``CHATBOT_SESSION_BACKEND=database``).
+
+    Com vários workers da API, a máquina de estados da conversa precisa ser a
+    mesma em todos. ``chave`` é ``"<namespace>:<id>"`` (``web:<uuid>`` ou
+    ``conversa:<conversation_id>``); ``dados`` é o JSON compacto de
+    ``ChatSession`` (None numa linha que, por ora, só guarda o bloqueio).
+    ``expira_em`` e ``bloqueio_ate`` são epoch em segundos, como na
+    deduplicação do webhook.
+    """
+
+    __tablename__ = "chatbot_sessoes"
+    __table_args__ = {"extend_existing": True}
+
+    chave: str = Field(primary_key=True, max_length=120)
+    dados: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    expira_em: float = Field(index=True)
+    # Bloqueio por conversa (lease): vale até este instante, mesmo se o
+    # processo que o adquiriu morrer.
+    bloqueio_ate: Optional[float] = Field(default=None)
@@ -3,11 +3,13 @@ from __future__ import annotations
 
 import json
 import threading
+import time
 import unicodedata
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import inspect, text
+from sqlalchemy import delete, inspect, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from backend.infrastructure.database.engine import engine, get_db_session
@@ -26,10 +28,16 @@ from backend.infrastructure.database.models import (
     LancamentoConceito,
     Funcionario,
     ChatbotContatoConhecido,
+    ChatbotWebhookMensagem,
+    ChatbotSessao,
 )
 
 _chatbot_contatos_schema_lock = threading.Lock()
 _chatbot_contatos_schema_ready = False
+_chatbot_webhook_schema_lock = threading.Lock()
+_chatbot_webhook_schema_ready = False
+_chatbot_sessoes_schema_lock = threading.Lock()
+_chatbot_sessoes_schema_ready = False
 _alerta_schema_lock = threading.Lock()
 _alerta_schema_ready = False
 _forms_schema_lock = threading.Lock()
@@ -1969,3 +1977,180 @@ def desativar_chatbot_contato_conhecido(canal: str, chave: str) -> None:
         row.atualizado_em = datetime.utcnow()
         session.add(row)
         session.commit()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Mensagens do webhook do Chatwoot já recebidas
+#
+# Backend compartilhado da deduplicação de reentregas (ver
+# `backend/infrastructure/chatwoot/webhook_dedup.py`).
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _ensure_chatbot_webhook_schema() -> None:
+    """Garante que `chatbot_webhook_mensagens` existe (mesmo motivo do diretório)."""
+    global _chatbot_webhook_schema_ready
+    with _chatbot_webhook_schema_lock:
+        if _chatbot_webhook_schema_ready:
+            return
+        inspector = inspect(engine)
+        if "chatbot_webhook_mensagens" not in inspector.get_table_names():
+            ChatbotWebhookMensagem.__table__.create(engine, checkfirst=True)
+        _chatbot_webhook_schema_ready = True
+
+
+def registrar_mensagem_webhook(chave: str, ttl_s: float) -> bool:
+    """
+    Registra a mensagem como vista por `ttl_s` segundos.
+
+    Retorna True se ela é nova (ou o registro anterior já expirou) e False se
+    outra entrega — nesta ou em outra réplica — já a registrou.
+    """
+    _ensure_chatbot_webhook_schema()
+    agora = time.time()
+    with get_db_session() as session:
+        existente = session.get(ChatbotWebhookMensagem, chave)
+        if existente is not None and existente.expira_em > agora:
+            return False
+        if existente is None:
+            session.add(ChatbotWebhookMensagem(chave=chave, expira_em=agora + ttl_s))
+        else:
+            existente.expira_em = agora + ttl_s
+            session.add(existente)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Corrida: outra réplica inseriu a mesma chave entre o get e o commit.
+            session.rollback()
+            return False
+    return True
+
+
+def remover_mensagem_webhook(chave: str) -> None:
+    """Esquece a mensagem (ex.: não pôde ser enfileirada e deve aceitar a reentrega)."""
+    _ensure_chatbot_webhook_schema()
+    with get_db_session() as session:
+        session.exec(delete(ChatbotWebhookMensagem).where(ChatbotWebhookMensagem.chave == chave))
+        session.commit()
+
+
+def purgar_mensagens_webhook_expiradas() -> int:
+    """Apaga os registros vencidos. Retorna quantos foram removidos."""
+    _ensure_chatbot_webhook_schema()
+    with get_db_session() as session:
+        resultado = session.exec(
+            delete(ChatbotWebhookMensagem).where(ChatbotWebhookMensagem.expira_em <= time.time())
+        )
+        session.commit()
+        return resultado.rowcount or 0
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Sessões do chatbot (store compartilhado entre workers)
+#
+# Ver `backend/infrastructure/chatbot/session_store.py`. O bloqueio por
+# conversa é um lease: `bloqueio_ate` no futuro = alguém atendendo.
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _ensure_chatbot_sessoes_schema() -> None:
+    """Garante que `chatbot_sessoes` existe (mesmo motivo do diretório)."""
+    global _chatbot_sessoes_schema_ready
+    with _chatbot_sessoes_schema_lock:
+        if _chatbot_sessoes_schema_ready:
+            return
+        inspector = inspect(engine)
+        if "chatbot_sessoes" not in inspector.get_table_names():
+            ChatbotSessao.__table__.create(engine, checkfirst=True)
+        _chatbot_sessoes_schema_ready = True
+
+
+def carregar_sessao_chatbot(chave: str) -> Optional[str]:
+    """JSON da sessão, ou None se não existe ou já expirou."""
+    _ensure_chatbot_sessoes_schema()
+    with get_db_session() as session:
+        row = session.get(ChatbotSessao, chave)
+        if row is None or row.dados is None or row.expira_em <= time.time():
+            return None
+        return row.dados
+
+
+def salvar_sessao_chatbot(chave: str, dados: str, expira_em: float) -> None:
+    """Grava (insere ou substitui) a sessão, preservando o bloqueio vigente."""
+    _ensure_chatbot_sessoes_schema()
+    with get_db_session() as session:
+        atualizadas = session.exec(
+            update(ChatbotSessao)
+            .where(ChatbotSessao.chave == chave)
+            .values(dados=dados, expira_em=expira_em)
+        ).rowcount
+        if not atualizadas:
+            session.add(ChatbotSessao(chave=chave, dados=dados, expira_em=expira_em))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Corrida com outro worker inserindo a mesma chave: vence a última escrita.
+            session.rollback()
+            session.exec(
+                update(ChatbotSessao)
+                .where(ChatbotSessao.chave == chave)
+                .values(dados=dados, expira_em=expira_em)
+            )
+            session.commit()
+
+
+def remover_sessao_chatbot(chave: str) -> None:
+    _ensure_chatbot_sessoes_schema()
+    with get_db_session() as session:
+        session.exec(delete(ChatbotSessao).where(ChatbotSessao.chave == chave))
+        session.commit()
+
+
+def adquirir_bloqueio_sessao_chatbot(chave: str, lease_s: float) -> bool:
+    """
+    Tenta bloquear a sessão por `lease_s` segundos. Não espera: retorna False
+    se outro atendimento detém um bloqueio ainda vigente.
+    """
+    _ensure_chatbot_sessoes_schema()
+    agora = time.time()
+    with get_db_session() as session:
+        adquiridas = session.exec(
+            update(ChatbotSessao)
+            .where(ChatbotSessao.chave == chave)
+            .where((ChatbotSessao.bloqueio_ate.is_(None)) | (ChatbotSessao.bloqueio_ate <= agora))
+            .values(bloqueio_ate=agora + lease_s)
+        ).rowcount
+        if adquiridas:
+            session.commit()
+            return True
+        if session.get(ChatbotSessao, chave) is not None:
+            return False
+        # Sessão ainda inexistente: a linha nasce só com o bloqueio.
+        session.add(ChatbotSessao(chave=chave, expira_em=agora + lease_s, bloqueio_ate=agora + lease_s))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+        return True
+
+
+def liberar_bloqueio_sessao_chatbot(chave: str) -> None:
+    _ensure_chatbot_sessoes_schema()
+    with get_db_session() as session:
+        session.exec(
+            update(ChatbotSessao).where(ChatbotSessao.chave == chave).values(bloqueio_ate=None)
+        )
+        session.commit()
+
+
+def purgar_sessoes_chatbot_expiradas() -> int:
+    """Apaga sessões vencidas e sem bloqueio vigente. Retorna quantas."""
+    _ensure_chatbot_sessoes_schema()
+    agora = time.time()
+    with get_db_session() as session:
+        resultado = session.exec(
+            delete(ChatbotSessao)
+            .where(ChatbotSessao.expira_em <= agora)
+            .where((ChatbotSessao.bloqueio_ate.is_(None)) | (ChatbotSessao.bloqueio_ate <= agora))
+        )
+        session.commit()
+        return resultado.rowcount or 0
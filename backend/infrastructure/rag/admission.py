@@ -0,0 +1,104 @@
+"""Controle de admissão da etapa de LLM do RAG.
+
+O chat web e o webhook do Chatwoot chamam ``ask_question`` via
+``asyncio.to_thread``; sem limite, um pico de perguntas na semana de
+matrícula vira dezenas de gerações simultâneas disputando o mesmo provedor e
+ocupando todas as threads do pool padrão. O limitador deixa no máximo
+``max_in_flight`` gerações em andamento, enfileira até ``max_waiting``
+pedidos por no máximo ``wait_timeout`` segundos e recusa o resto na hora —
+o aluno recebe "tente novamente em instantes" em vez de um timeout longo.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class AdmissionRejected(RuntimeError):
+    """Pedido recusado: fila cheia ou tempo de espera esgotado."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """Semáforo com fila de espera limitada, timeout e métricas."""
+
+    def __init__(self, max_in_flight: int, max_waiting: int, wait_timeout: float) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = max(0.0, wait_timeout)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _admit(self, waited: float) -> None:
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self._total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def acquire(self) -> None:
+        with self._cond:
+            if self.in_flight < self.max_in_flight and self.waiting == 0:
+                self._admit(0.0)
+                return
+            if self.waiting >= self.max_waiting:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected("queue_full")
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            start = time.monotonic()
+            deadline = start + self.wait_timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise AdmissionRejected("timeout")
+                    self._cond.wait(timeout=remaining)
+            finally:
+                self.waiting -= 1
+            self._admit(time.monotonic() - start)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_waiting": self.max_waiting,
+                "wait_timeout_s": self.wait_timeout,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "peak_in_flight": self.peak_in_flight,
+                "peak_waiting": self.peak_waiting,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_wait_ms": (self._total_wait / self.admitted * 1000) if self.admitted else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
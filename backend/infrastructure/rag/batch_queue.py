@@ -0,0 +1,163 @@
+"""Fila em segundo plano que agrupa itens por chave e os grava em lote.
+
+Usada pela contagem de frequência do cache semântico: ``ask_question`` só
+enfileira ``(pergunta, resposta)`` e retorna; uma thread daemon junta as
+repetições da mesma pergunta (``merge``) e chama ``flush_fn`` com o lote a
+cada ``flush_interval`` segundos ou quando ``max_batch`` chaves distintas
+estiverem pendentes. Uma gravação por lote, em vez de uma por pergunta, evita
+que a tabela LanceDB se fragmente em milhares de versões minúsculas.
+
+Se ``flush_fn`` falhar, o lote volta para a fila (juntado pelo ``merge`` às
+repetições que chegaram nesse meio-tempo) e vai no próximo flush; uma chave
+que falha ``max_retries`` vezes seguidas é descartada e contada em ``dropped``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingBatchQueue:
+    """Fila keyed com coalescência e flush periódico em thread daemon."""
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], None],
+        merge_fn: Callable[[Any, Any], Any],
+        max_batch: int = 64,
+        flush_interval: float = 2.0,
+        name: str = "batch-queue",
+        max_retries: int = 3,
+    ) -> None:
+        self._flush_fn = flush_fn
+        self._merge_fn = merge_fn
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = max(0.01, flush_interval)
+        self.name = name
+        self.max_retries = max(0, max_retries)
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Falhas seguidas de gravação por chave (só das que já falharam).
+        self._failures: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_items = 0
+        self.errors = 0
+        self.retried_items = 0
+        self.dropped = 0
+        self.last_flush_ms: Optional[float] = None
+
+    def start(self) -> "CoalescingBatchQueue":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, key: Hashable, item: Any) -> None:
+        with self._lock:
+            self.submitted += 1
+            if key in self._pending:
+                self._pending[key] = self._merge_fn(self._pending[key], item)
+                self.coalesced += 1
+            else:
+                self._pending[key] = item
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+
+    def _take_batch(self) -> List[Tuple[Hashable, Any]]:
+        with self._lock:
+            batch = list(self._pending.items())
+            self._pending.clear()
+            return batch
+
+    def _requeue(self, batch: List[Tuple[Hashable, Any]]) -> None:
+        """Devolve um lote que falhou à frente da fila, juntando às novas repetições."""
+        with self._lock:
+            for key, item in reversed(batch):
+                failures = self._failures.get(key, 0) + 1
+                if failures > self.max_retries:
+                    self._failures.pop(key, None)
+                    self.dropped += 1
+                    continue
+                self._failures[key] = failures
+                if key in self._pending:
+                    item = self._merge_fn(item, self._pending[key])
+                self._pending[key] = item
+                self._pending.move_to_end(key, last=False)
+                self.retried_items += 1
+
+    def flush(self) -> int:
+        """Grava agora tudo o que está pendente; retorna o nº de itens gravados."""
+        with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self._flush_fn([item for _, item in batch])
+            except Exception as e:
+                self.errors += 1
+                logger.warning("⚠️ Falha ao gravar lote de %d itens (%s): %s", len(batch), self.name, e)
+                self._requeue(batch)
+                return 0
+            finally:
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+            if self._failures:
+                with self._lock:
+                    for key, _ in batch:
+                        self._failures.pop(key, None)
+            self.flushes += 1
+            self.flushed_items += len(batch)
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._wakeup.wait(timeout=self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread após um último flush."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=timeout)
+        else:
+            self.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "flushed_items": self.flushed_items,
+                "errors": self.errors,
+                "retried_items": self.retried_items,
+                "dropped": self.dropped,
+                "last_flush_ms": self.last_flush_ms,
+            }
@@ -0,0 +1,109 @@
+"""Índice invertido BM25 em memória para o ranking esparso do RAG.
+
+Substitui a varredura ``table.to_pandas()`` + contagem de substrings que o
+``_keyword_search`` fazia a cada pergunta: o índice é montado uma única vez a
+partir da tabela ``recipes`` (ao fim da indexação ou no boot) e cada consulta
+só percorre as listas de postings dos termos da pergunta.
+
+Tokenização pensada para os documentos da FASI: minúsculas, sem acentos
+("matrícula" == "matricula"), stop words do português removidas e períodos
+letivos mantidos como um único token ("2026.2"). Tokens de 2 letras são
+preservados para que discriminadores como "II" em "Estrutura de Dados II"
+continuem pesando. (Robertson & Zaragoza, 2009)
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+", re.UNICODE)
+
+
+def fold_accents(text: str) -> str:
+    """'Matrícula' → 'matricula'."""
+    decomposed = unicodedata.normalize("NFD", (text or "").lower())
+    return "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+
+
+class BM25Index:
+    """Índice BM25 (Okapi) imutável sobre os chunks indexados."""
+
+    def __init__(
+        self,
+        stop_words: Iterable[str] = (),
+        k1: float = 1.5,
+        b: float = 0.75,
+        min_token_length: int = 2,
+    ) -> None:
+        self.k1 = k1
+        self.b = b
+        self.min_token_length = min_token_length
+        self.stop_words = frozenset(fold_accents(w) for w in stop_words)
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_ids: List[str] = []
+        self._doc_contents: List[str] = []
+        self._doc_lengths: List[int] = []
+        self._id_to_index: Dict[str, int] = {}
+        self._avg_doc_length: float = 0.0
+
+    def tokenize(self, text: str) -> List[str]:
+        return [
+            tok
+            for tok in _TOKEN_RE.findall(fold_accents(text))
+            if len(tok) >= self.min_token_length and tok not in self.stop_words
+        ]
+
+    def build(self, documents: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """Monta o índice a partir de pares (chunk_id, conteúdo)."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for chunk_id, content in documents:
+            if not content:
+                continue
+            doc_index = len(self._doc_ids)
+            terms = Counter(self.tokenize(content))
+            self._doc_ids.append(chunk_id)
+            self._doc_contents.append(content)
+            self._doc_lengths.append(sum(terms.values()))
+            self._id_to_index[chunk_id] = doc_index
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_index, tf))
+        self._postings = postings
+        n_docs = len(self._doc_ids)
+        self._avg_doc_length = (sum(self._doc_lengths) / n_docs) if n_docs else 0.0
+        return self
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    def _idf(self, doc_freq: int) -> float:
+        n_docs = len(self._doc_ids)
+        return math.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Retorna ``(chunk_id, score)`` dos ``top_k`` chunks mais relevantes."""
+        if not self._doc_ids or top_k <= 0:
+            return []
+        scores: Dict[int, float] = {}
+        avg_len = self._avg_doc_length or 1.0
+        for term in set(self.tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(len(postings))
+            for doc_index, tf in postings:
+                norm = self.k1 * (1.0 - self.b + self.b * self._doc_lengths[doc_index] / avg_len)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+        return [(self._doc_ids[i], score) for i, score in best]
+
+    def get_content(self, chunk_id: str) -> Optional[str]:
+        index = self._id_to_index.get(chunk_id)
+        return self._doc_contents[index] if index is not None else None
@@ -0,0 +1,105 @@
+"""Observador dos documentos do RAG (checagem periódica em thread daemon).
+
+O hash da versão dos documentos fica memorizado no serviço; quem o mantém
+atualizado é este observador: a cada ``interval`` segundos ele recalcula a
+impressão digital barata (nome + tamanho + mtime, sem ler conteúdo) e, se ela
+mudou, chama ``on_change`` — que no serviço dispara a reindexação incremental.
+Assim nenhuma pergunta faz ``stat`` em disco, e um documento atualizado no
+volume é absorvido sem reiniciar o container.
+
+Polling em vez de inotify: funciona em bind mounts/volumes de rede (onde o
+inotify não recebe eventos) e não exige dependência nova; o custo é um
+``stat`` por arquivo a cada ciclo.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentWatcher:
+    """Chama ``on_change(fingerprint)`` quando ``fingerprint_fn()`` muda."""
+
+    def __init__(
+        self,
+        fingerprint_fn: Callable[[], str],
+        on_change: Callable[[str], None],
+        interval: float = 30.0,
+        name: str = "rag-document-watcher",
+    ) -> None:
+        self._fingerprint_fn = fingerprint_fn
+        self._on_change = on_change
+        self.interval = max(0.05, interval)
+        self.name = name
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fingerprint: Optional[str] = None
+        self.checks = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_change_at: Optional[float] = None
+
+    def start(self, fingerprint: Optional[str] = None) -> "DocumentWatcher":
+        """Inicia a thread; ``fingerprint`` é a versão já indexada (se conhecida)."""
+        with self._lock:
+            if fingerprint is not None:
+                self._fingerprint = fingerprint
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def check(self) -> bool:
+        """Uma rodada de checagem; retorna True se detectou (e tratou) mudança.
+
+        Se ``on_change`` falhar, a versão anterior é mantida e a próxima rodada
+        tenta de novo.
+        """
+        try:
+            current = self._fingerprint_fn()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("⚠️ Falha ao verificar documentos (%s): %s", self.name, e)
+            return False
+        self.checks += 1
+        if self._fingerprint is None:
+            self._fingerprint = current
+            return False
+        if current == self._fingerprint:
+            return False
+        try:
+            self._on_change(current)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("⚠️ Falha ao aplicar mudança nos documentos (%s): %s", self.name, e)
+            return False
+        self._fingerprint = current
+        self.changes += 1
+        self.last_change_at = time.time()
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_s": self.interval,
+            "checks": self.checks,
+            "changes": self.changes,
+            "errors": self.errors,
+            "last_change_at": self.last_change_at,
+        }
@@ -0,0 +1,133 @@
+"""Latência por etapa do pipeline RAG (histogramas + percentis).
+
+``get_status()`` só guardava a latência da última pergunta, o que não diz
+onde os segundos são gastos em produção. Cada etapa (busca no cache,
+checagem temporal, gate de domínio, busca densa/esparsa, RRF, reranking,
+LLM primário/fallback, contabilidade do cache e seu flush em segundo plano)
+é cronometrada com ``rag_metrics.time("etapa")`` e registrada em:
+
+- um histograma com buckets fixos, exposto no formato texto do Prometheus
+  em ``/metrics`` (sem depender de ``prometheus_client``);
+- uma janela circular das últimas amostras, de onde saem p50/p95/p99 para o
+  ``get_status()``.
+
+O registro é global do processo: ``/metrics`` responde mesmo antes de o
+serviço RAG ser inicializado.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+# Limites superiores (segundos) dos buckets; o +Inf é implícito.
+DEFAULT_BUCKETS: Sequence[float] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+# Amostras mantidas por etapa para os percentis.
+DEFAULT_WINDOW = 2048
+
+
+class LatencyHistogram:
+    """Histograma cumulativo + janela das últimas amostras."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = DEFAULT_WINDOW) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent: Deque[float] = deque(maxlen=max(1, window))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        seconds = max(0.0, float(seconds))
+        self._counts[bisect_left(self.buckets, seconds)] += 1
+        self._recent.append(seconds)
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative_counts(self) -> List[int]:
+        total, out = 0, []
+        for c in self._counts:
+            total += c
+            out.append(total)
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0, "avg": None, "p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(np.fromiter(self._recent, dtype=np.float64), [50, 95, 99])
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+        }
+
+
+class RagMetrics:
+    """Histogramas de latência por etapa e contadores de perguntas."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = DEFAULT_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self._window = window
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._questions: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = LatencyHistogram(self._buckets, self._window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count_question(self, outcome: str) -> None:
+        with self._lock:
+            self._questions[outcome] = self._questions.get(outcome, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: h.summary() for stage, h in sorted(self._stages.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._questions.clear()
+
+    def render_prometheus(self) -> str:
+        """Exposição no formato texto 0.0.4 do Prometheus."""
+        lines = [
+            "# HELP rag_stage_latency_seconds Latência de cada etapa do pipeline RAG.",
+            "# TYPE rag_stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._stages.items()):
+                bounds = [repr(float(b)) for b in h.buckets] + ["+Inf"]
+                for bound, cumulative in zip(bounds, h.cumulative_counts()):
+                    lines.append(
+                        f'rag_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'rag_stage_latency_seconds_sum{{stage="{stage}"}} {h.sum!r}')
+                lines.append(f'rag_stage_latency_seconds_count{{stage="{stage}"}} {h.count}')
+            lines.append("# HELP rag_questions_total Perguntas processadas, por resultado.")
+            lines.append("# TYPE rag_questions_total counter")
+            for outcome, count in sorted(self._questions.items()):
+                lines.append(f'rag_questions_total{{outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+rag_metrics = RagMetrics()
@@ -0,0 +1,251 @@
+"""Backend ONNX Runtime (int8) para o cross-encoder de reranking.
+
+O reranking do ``bge-reranker-base`` via sentence-transformers/PyTorch é a
+etapa que mais consome CPU no VPS de produção (2 vCPU): até
+``RERANK_CANDIDATE_POOL`` pares por pergunta. Aqui o modelo é exportado uma
+única vez para ONNX, quantizado dinamicamente para int8 e gravado em disco;
+nos boots seguintes só o arquivo quantizado é carregado (sem PyTorch).
+
+Na exportação, as notas do modelo quantizado são comparadas com as do
+PyTorch em casos de desambiguação (ex.: "Estrutura de Dados I" vs "II"). Se o
+primeiro colocado de algum caso mudar ou a diferença de nota passar da
+tolerância, o resultado fica registrado em ``export.json`` e o serviço
+continua com o PyTorch.
+
+Dependências opcionais: ``onnxruntime`` e ``transformers`` (já instalado
+com sentence-transformers); ``torch`` só é necessário para exportar.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_VERSION = 1
+QUANTIZED_FILE_NAME = "model_int8.onnx"
+EXPORT_META_FILE_NAME = "export.json"
+# Diferença máxima aceita entre as notas (após sigmoide, escala 0–1).
+PARITY_TOLERANCE = 0.05
+
+# (pergunta, candidatos, índice do candidato correto)
+PARITY_CASES: Sequence[Tuple[str, Sequence[str], int]] = (
+    (
+        "Qual a ementa de Estrutura de Dados II?",
+        (
+            "Estrutura de Dados I: listas, pilhas, filas e recursão. Carga horária de 68 horas.",
+            "Estrutura de Dados II: árvores, grafos, tabelas hash e ordenação. Carga horária de 68 horas.",
+            "Banco de Dados I: modelo relacional, SQL e normalização.",
+        ),
+        1,
+    ),
+    (
+        "Quais os pré-requisitos de Cálculo I?",
+        (
+            "Cálculo II tem como pré-requisito Cálculo I.",
+            "Cálculo I não possui pré-requisitos e é ofertada no primeiro período.",
+            "Álgebra Linear é ofertada no segundo período.",
+        ),
+        1,
+    ),
+    (
+        "Qual a carga horária das atividades complementares?",
+        (
+            "O estágio supervisionado tem 300 horas.",
+            "As Atividades Curriculares Complementares somam 200 horas ao longo do curso.",
+            "O TCC deve ser defendido perante banca de três membros.",
+        ),
+        1,
+    ),
+)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def export_dir_for(cache_root: Path, model_name: str) -> Path:
+    return Path(cache_root) / model_name.replace("/", "__")
+
+
+def read_export_meta(export_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        meta = json.loads((export_dir / EXPORT_META_FILE_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if meta.get("format_version") != EXPORT_FORMAT_VERSION:
+        return None
+    if not (export_dir / QUANTIZED_FILE_NAME).exists():
+        return None
+    return meta
+
+
+def export_quantized_model(model_name: str, export_dir: Path, max_length: int = 512) -> Path:
+    """Exporta ``model_name`` para ONNX e grava a versão int8 em ``export_dir``."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+
+    sample = tokenizer(
+        ["pergunta"], ["documento de exemplo"],
+        padding=True, truncation=True, max_length=max_length, return_tensors="pt",
+    )
+    input_names = list(sample.keys())
+    fp32_path = export_dir / "model_fp32.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+    quantized_path = export_dir / QUANTIZED_FILE_NAME
+    quantize_dynamic(str(fp32_path), str(quantized_path), weight_type=QuantType.QInt8)
+    fp32_path.unlink(missing_ok=True)
+    tokenizer.save_pretrained(str(export_dir))
+    logger.info("📦 Reranker exportado para ONNX int8: %s", quantized_path)
+    return quantized_path
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder sobre ONNX Runtime com a mesma interface ``predict`` do
+    ``sentence_transformers.CrossEncoder`` (notas com sigmoide, 1 rótulo)."""
+
+    def __init__(
+        self,
+        export_dir: Path,
+        threads: int = 0,
+        batch_size: int = 16,
+        max_length: int = 512,
+    ) -> None:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            str(Path(export_dir) / QUANTIZED_FILE_NAME), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.threads = threads
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], **_: Any) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        # Lotes de tamanhos parecidos desperdiçam menos padding.
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for offset in range(0, len(order), self.batch_size):
+            batch = order[offset: offset + self.batch_size]
+            encoded = self._tokenizer(
+                [pairs[i][0] for i in batch],
+                [pairs[i][1] for i in batch],
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self._input_names}
+            logits = self._session.run(None, feeds)[0]
+            scores[batch] = _sigmoid(np.asarray(logits, dtype=np.float32).reshape(len(batch), -1)[:, 0])
+        return scores
+
+
+def check_parity(
+    reference: Any,
+    candidate: Any,
+    cases: Sequence[Tuple[str, Sequence[str], int]] = PARITY_CASES,
+    tolerance: float = PARITY_TOLERANCE,
+) -> Dict[str, Any]:
+    """Compara as notas de ``candidate`` com as de ``reference`` (PyTorch)."""
+    pairs: List[Tuple[str, str]] = [(q, doc) for q, docs, _ in cases for doc in docs]
+
+    start = time.perf_counter()
+    expected = np.asarray(reference.predict(pairs), dtype=np.float32).reshape(-1)
+    reference_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    got = np.asarray(candidate.predict(pairs), dtype=np.float32).reshape(-1)
+    candidate_ms = (time.perf_counter() - start) * 1000
+
+    top1_matches = 0
+    correct = 0
+    offset = 0
+    for _, docs, best in cases:
+        ref_top = int(np.argmax(expected[offset: offset + len(docs)]))
+        cand_top = int(np.argmax(got[offset: offset + len(docs)]))
+        top1_matches += int(ref_top == cand_top)
+        correct += int(cand_top == best)
+        offset += len(docs)
+
+    max_abs_diff = float(np.max(np.abs(expected - got))) if len(pairs) else 0.0
+    return {
+        "ok": top1_matches == len(cases) and max_abs_diff <= tolerance,
+        "cases": len(cases),
+        "top1_matches": top1_matches,
+        "correct_top1": correct,
+        "max_abs_diff": max_abs_diff,
+        "tolerance": tolerance,
+        "reference_ms": reference_ms,
+        "candidate_ms": candidate_ms,
+        "speedup": reference_ms / candidate_ms if candidate_ms > 0 else None,
+    }
+
+
+def load_onnx_reranker(
+    model_name: str,
+    cache_root: Path,
+    reference_factory: Callable[[], Any],
+    threads: int = 0,
+    export: bool = True,
+) -> Tuple[Optional[OnnxCrossEncoder], Optional[Dict[str, Any]]]:
+    """
+    Carrega o reranker ONNX int8, exportando e validando na primeira vez.
+
+    Retorna ``(reranker, meta)``; ``reranker`` é ``None`` quando a paridade
+    com o PyTorch falhou (o chamador deve usar ``reference_factory``). Com
+    ``export=False`` e nenhuma exportação válida em disco, retorna
+    ``(None, None)`` sem exportar.
+    """
+    export_dir = export_dir_for(cache_root, model_name)
+    meta = read_export_meta(export_dir)
+    if meta is None or meta.get("model") != model_name:
+        if not export:
+            return None, None
+        export_quantized_model(model_name, export_dir)
+        candidate = OnnxCrossEncoder(export_dir, threads=threads)
+        parity = check_parity(reference_factory(), candidate)
+        meta = {
+            "format_version": EXPORT_FORMAT_VERSION,
+            "model": model_name,
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "parity": parity,
+        }
+        (export_dir / EXPORT_META_FILE_NAME).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        logger.info(
+            "🧪 Paridade ONNX x PyTorch: ok=%s, top-1 %d/%d, diff máx %.4f, speedup %.1fx",
+            parity["ok"], parity["top1_matches"], parity["cases"],
+            parity["max_abs_diff"], parity["speedup"] or 0.0,
+        )
+    else:
+        candidate = None
+
+    if not meta.get("parity", {}).get("ok"):
+        return None, meta
+    if candidate is None:
+        candidate = OnnxCrossEncoder(export_dir, threads=threads)
+    return candidate, meta
@@ -0,0 +1,101 @@
+"""
+Pré-aquecimento do serviço RAG na subida da API.
+
+Sem ele, o primeiro aluno depois de cada deploy paga a montagem do
+``ChatbotService`` (LanceDB, eventual reindexação, SQLite do histórico) e a
+carga do cross-encoder. Com ``RAG_PREWARM=true`` o ``lifespan`` da API chama
+``start_prewarm()``, que constrói o serviço numa thread em segundo plano e
+roda ``warm_up()``; ``/health`` consulta ``readiness()`` e só responde 200
+quando o RAG está pronto. Se o aquecimento falhar, ``/health`` volta a 200 com
+status "degraded": o resto do portal continua no ar e o RAG tenta montar de
+novo na primeira pergunta.
+
+Com ``RERANKER_BACKEND=onnx`` e sem ``RAG_PREWARM``, o ``lifespan`` chama
+``start_reranker_export()``: a exportação/quantização do cross-encoder roda
+no boot, em segundo plano e sem mexer em ``readiness()``, em vez de cair na
+pergunta de um aluno.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_state: Dict[str, Any] = {"enabled": False, "state": "disabled"}
+
+
+def _run() -> None:
+    started = time.perf_counter()
+    try:
+        from backend.infrastructure.rag.rag_ppc import get_service
+
+        with _lock:
+            _state["state"] = "warming"
+        service = get_service()
+        timings = service.warm_up()
+        with _lock:
+            _state.update({
+                "state": "ready",
+                "ready_at": datetime.utcnow().isoformat(),
+                "duration_s": round(time.perf_counter() - started, 3),
+                "timings": timings,
+            })
+        logger.info("✅ RAG pronto após %.1fs de pré-aquecimento.", time.perf_counter() - started)
+    except Exception as e:
+        logger.error(f"❌ Pré-aquecimento do RAG falhou: {e}")
+        with _lock:
+            _state.update({
+                "state": "failed",
+                "error": str(e),
+                "duration_s": round(time.perf_counter() - started, 3),
+            })
+
+
+def start_prewarm() -> bool:
+    """Dispara o pré-aquecimento (idempotente). Retorna False se já estava rodando/pronto."""
+    global _thread
+    with _lock:
+        if _thread is not None and _state.get("state") in ("pending", "warming", "ready"):
+            return False
+        _state.clear()
+        _state.update({
+            "enabled": True,
+            "state": "pending",
+            "started_at": datetime.utcnow().isoformat(),
+        })
+        _thread = threading.Thread(target=_run, name="rag-prewarm", daemon=True)
+        _thread.start()
+        return True
+
+
+def _export_reranker() -> None:
+    started = time.perf_counter()
+    try:
+        from backend.infrastructure.rag.rag_ppc import get_service
+
+        get_service()._get_reranker(allow_export=True)
+        logger.info("✅ Reranker ONNX preparado em %.1fs.", time.perf_counter() - started)
+    except Exception as e:
+        logger.warning(f"⚠️ Preparação do reranker ONNX falhou: {e}")
+
+
+def start_reranker_export() -> bool:
+    """Exporta o reranker ONNX em segundo plano (só com ``RERANKER_BACKEND=onnx``)."""
+    if os.getenv("RERANKER_BACKEND", "torch").strip().lower() != "onnx":
+        return False
+    threading.Thread(target=_export_reranker, name="rag-reranker-export", daemon=True).start()
+    return True
+
+
+def readiness() -> Dict[str, Any]:
+    """Estado do pré-aquecimento: disabled, pending, warming, ready ou failed."""
+    with _lock:
+        return dict(_state)
+
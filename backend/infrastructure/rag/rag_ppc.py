@@ -4,12 +4,15 @@ Este serviço permite fazer perguntas sobre o Projeto Pedagógico do Curso usand
 """
 
 from __future__ import annotations
+import atexit
 import os
 import shutil
 import logging
+import threading
 import hashlib
 import json
-from typing import Optional, Dict, Any, List
+import re
+from typing import Optional, Dict, Any, Iterator, List, Union
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from agno.models.google import Gemini
@@ -34,6 +37,23 @@ from dotenv import load_dotenv
 import time
 import numpy as np
 
+from backend.infrastructure.rag.admission import AdmissionLimiter, AdmissionRejected
+from backend.infrastructure.rag.batch_queue import CoalescingBatchQueue
+from backend.infrastructure.rag.bm25 import BM25Index
+from backend.infrastructure.rag.document_watcher import DocumentWatcher
+from backend.infrastructure.rag.lru import BoundedLRUCache
+from backend.infrastructure.rag.metrics import rag_metrics
+from backend.infrastructure.rag.onnx_reranker import load_onnx_reranker
+from backend.infrastructure.rag.semantic_cache_mirror import SemanticCacheMirror
+from backend.infrastructure.rag.single_flight import SingleFlight
+from backend.infrastructure.rag.table_pool import LanceTablePool
+from backend.infrastructure.rag.vector_index import (
+    ensure_scalar_indexes,
+    ensure_vector_index,
+    tune_vector_query,
+    vector_index_info,
+)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -41,7 +61,8 @@ logger = logging.getLogger(__name__)
 # Versão do pipeline de indexação/embedding. Incremente sempre que a estratégia de
 # chunking ou a forma de gerar embeddings mudar (ex.: prefixos de tarefa do nomic),
 # para forçar reindexação automática mesmo sem alteração nos arquivos fonte.
-INDEX_PIPELINE_VERSION = 2
+# v3: coluna ``source`` na tabela recipes (reindexação incremental por arquivo).
+INDEX_PIPELINE_VERSION = 3
 
 # Configuração do reranker (cross-encoder) aplicado após a fusão RRF.
 # bge-reranker-base (278M, ~1.1GB) é multilíngue, roda bem em CPU e resolve a
@@ -53,9 +74,74 @@ RERANKER_MODEL_DEFAULT = "BAAI/bge-reranker-base"
 # encontra — a busca densa não distingue bem discriminadores fracos como "I" vs "II",
 # então disciplinas como "Estrutura de Dados II" chegam ao pool via keyword.
 RERANK_CANDIDATE_POOL = 40
+# Backend do reranker: "torch" (sentence-transformers) ou "onnx" (ONNX Runtime
+# int8, exportado e validado contra o PyTorch no primeiro uso). Em falha do
+# ONNX o serviço volta para o PyTorch.
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch").strip().lower()
+# Threads de CPU do reranker (0 = padrão da biblioteca).
+RERANKER_THREADS = int(os.getenv("RERANKER_THREADS", "0"))
+# Onde fica o modelo ONNX exportado (padrão: ao lado do diretório LanceDB).
+RERANKER_ONNX_DIR_NAME = "reranker_onnx"
+# Cache LRU de notas do reranker por (pergunta normalizada, trecho, modelo):
+# perguntas populares não reavaliam os mesmos pares. 0 desabilita o cache.
+RERANK_SCORE_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_SCORE_CACHE_SIZE", "20000"))
+# Pool adaptativo: quando os rankings denso e esparso concordam no topo
+# (ao menos RERANK_AGREEMENT_MIN_OVERLAP dos RERANK_AGREEMENT_TOP primeiros),
+# a fusão já é decisiva e o reranker avalia só RERANK_ADAPTIVE_POOL_SIZE
+# candidatos. Casos I/II não entram aqui: neles o denso discorda do esparso.
+RERANK_ADAPTIVE_POOL = os.getenv("RERANK_ADAPTIVE_POOL", "1") != "0"
+RERANK_ADAPTIVE_POOL_SIZE = int(os.getenv("RERANK_ADAPTIVE_POOL_SIZE", "20"))
+RERANK_AGREEMENT_TOP = 5
+RERANK_AGREEMENT_MIN_OVERLAP = 4
 # Quantos candidatos cada recuperador (denso e esparso) contribui antes da fusão RRF.
 RETRIEVER_FANOUT = 30
 
+# Cache LRU de embeddings compartilhado entre as etapas de uma mesma pergunta
+# (cache semântico, gate de domínio, recuperação, frequência) e entre perguntas.
+# Cada miss é uma ida ao servidor Ollama; 0 desabilita o cache.
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "2048"))
+
+# Indexação em lote: quantos chunks vão em cada chamada ao embedder e quantas
+# chamadas podem estar em voo ao mesmo tempo. O Ollama aceita lista em /api/embed;
+# concorrência baixa porque o VPS tem 2 vCPU e o modelo roda na mesma máquina.
+INDEX_EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+INDEX_EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "2"))
+
+# Índice ANN (IVF_PQ ou IVF_HNSW_SQ) das tabelas vetoriais. Abaixo do limiar de
+# linhas a busca exata (flat) é mais rápida e não perde recall; 0 desliga.
+# nprobes/refine_factor ajustam recall × latência nas buscas com índice.
+VECTOR_INDEX_TYPE = os.getenv("RAG_VECTOR_INDEX_TYPE", "IVF_PQ").upper()
+RECIPES_INDEX_MIN_ROWS = int(os.getenv("RAG_RECIPES_INDEX_MIN_ROWS", "5000"))
+SEMANTIC_CACHE_INDEX_MIN_ROWS = int(os.getenv("RAG_SEMANTIC_CACHE_INDEX_MIN_ROWS", "5000"))
+VECTOR_INDEX_NPROBES = int(os.getenv("RAG_VECTOR_NPROBES", "20"))
+VECTOR_INDEX_REFINE_FACTOR = int(os.getenv("RAG_VECTOR_REFINE_FACTOR", "10"))
+# A cada quantas gravações no cache semântico o índice dele é reavaliado.
+SEMANTIC_CACHE_INDEX_CHECK_EVERY = int(os.getenv("RAG_SEMANTIC_CACHE_INDEX_CHECK_EVERY", "200"))
+# Índices escalares do cache semântico usados pelo prefilter da busca vetorial
+# (status/documents_hash têm poucos valores distintos → BITMAP).
+SEMANTIC_CACHE_SCALAR_INDEXES = {
+    "status": "BITMAP",
+    "documents_hash": "BITMAP",
+    "question_key": "BTREE",
+}
+
+# Intervalo (s) da checagem dos documentos em segundo plano: uma mudança
+# dispara a reindexação incremental sem reiniciar o container; 0 desliga.
+DOCUMENTS_WATCH_INTERVAL_S = float(os.getenv("RAG_DOCUMENTS_WATCH_INTERVAL_S", "30"))
+
+# Controle de admissão da etapa de LLM: gerações simultâneas, tamanho da fila
+# de espera e quanto tempo um pedido espera por uma vaga antes de ser recusado.
+LLM_MAX_IN_FLIGHT = int(os.getenv("RAG_LLM_MAX_IN_FLIGHT", "4"))
+LLM_MAX_WAITING = int(os.getenv("RAG_LLM_MAX_WAITING", "16"))
+LLM_WAIT_TIMEOUT_S = float(os.getenv("RAG_LLM_WAIT_TIMEOUT_S", "30"))
+LLM_BUSY_MESSAGE = (
+    "O assistente está recebendo muitas perguntas neste momento. "
+    "Por favor, tente novamente em instantes."
+)
+# Perguntas idênticas (mesma chave normalizada e mesmos documentos) que chegam
+# enquanto outra igual está sendo respondida esperam e reaproveitam a resposta.
+SINGLE_FLIGHT_ENABLED = os.getenv("RAG_SINGLE_FLIGHT", "1") != "0"
+
 # Configuração do cache semântico
 # Promoção por FREQUÊNCIA de repetição (não há avaliação/rating do usuário no
 # produto). Apenas entradas "trusted" podem ser servidas para o usuário.
@@ -70,6 +156,12 @@ SEMANTIC_CACHE_FREQUENCY_PROMOTION_THRESHOLD = 3
 # para sempre sem nenhuma chance de reavaliação.
 SEMANTIC_CACHE_TTL_DAYS_TRUSTED = 60
 SEMANTIC_CACHE_TTL_DAYS_CANDIDATE = 14
+# Contagem de frequência fora do caminho da resposta: as repetições vão para
+# uma fila em segundo plano, agrupadas por pergunta, e são gravadas em lote
+# (um merge_insert por flush). RAG_FREQUENCY_ASYNC=0 volta ao modo síncrono.
+SEMANTIC_CACHE_FREQUENCY_ASYNC = os.getenv("RAG_FREQUENCY_ASYNC", "1") != "0"
+SEMANTIC_CACHE_FREQUENCY_FLUSH_INTERVAL_S = float(os.getenv("RAG_FREQUENCY_FLUSH_INTERVAL_S", "2.0"))
+SEMANTIC_CACHE_FREQUENCY_MAX_BATCH = int(os.getenv("RAG_FREQUENCY_MAX_BATCH", "64"))
 
 # Similaridade mínima (cosseno) para considerar a pergunta dentro do domínio dos documentos.
 # Aplicada quando a pergunta já contém pelo menos uma palavra-chave acadêmica.
@@ -106,6 +198,12 @@ _DOMAIN_KEYWORDS: frozenset = frozenset({
 })
 
 # ── Melhoria 2: Detecção de Ambiguidade Temporal ──────────────────────────────
+# Identificador de período letivo nos documentos (ex.: "2026.2").
+_PERIOD_RE = re.compile(r"\b(20\d{2}\.[1-4])\b")
+# Períodos encontrados na última indexação, gravados ao lado de documents_hash.json
+# para que o esclarecimento temporal não precise varrer a tabela recipes.
+AVAILABLE_PERIODS_FILE_NAME = "available_periods.json"
+
 # Palavras que indicam que a pergunta envolve um prazo/data.
 _TEMPORAL_TRIGGERS: frozenset = frozenset({
     "período", "prazo", "submissão", "entrega", "data", "quando",
@@ -130,11 +228,20 @@ class ChatbotService:
     _instance: Optional['ChatbotService'] = None
     _agent: Optional[Agent] = None
     _initialized: bool = False
+    # Chat web e webhook chamam get_service() de threads diferentes: sem trava,
+    # duas primeiras requisições simultâneas montariam dois serviços e rodariam
+    # duas reindexações no mesmo diretório LanceDB.
+    _instance_lock = threading.Lock()
+    _init_lock = threading.RLock()
+    # Aquecimento (thread própria) e consultas disputam a carga do reranker.
+    _reranker_lock = threading.Lock()
     
     def __new__(cls, persist_history: bool = True) -> 'ChatbotService':
         """Implementa padrão Singleton."""
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
     
     def __init__(self, persist_history: bool = True):
@@ -145,7 +252,11 @@ class ChatbotService:
             persist_history: Se True, armazena histórico de conversas em SQLite.
                            Se False, usa apenas memória RAM (mais rápido, sem persistência).
         """
-        if not self._initialized:
+        if self._initialized:
+            return
+        with ChatbotService._init_lock:
+            if self._initialized:
+                return
             # Atributos de estado
             self.model: Optional[Any] = None            # modelo primário (MariTalk)
             self.model_fallback: Optional[Any] = None   # modelo fallback (Gemini)
@@ -158,6 +269,7 @@ class ChatbotService:
             self._initialized_at: Optional[datetime] = None
             self._last_question_at: Optional[datetime] = None
             self._last_latency: Optional[float] = None
+            self._latency_sum: float = 0.0
             self._total_questions: int = 0
             self._setup_service()
             self._initialized = True
@@ -223,34 +335,80 @@ class ChatbotService:
         combined = "|".join(hash_data)
         return hashlib.sha256(combined.encode()).hexdigest()
     
-    def _should_reindex_documents(self, document_files: List[Path], cache_dir: Path) -> bool:
+    @staticmethod
+    def _compute_file_fingerprints(document_files: List[Path]) -> Dict[str, str]:
+        """Hash de conteúdo (sha256) por arquivo, usado na reindexação incremental."""
+        fingerprints: Dict[str, str] = {}
+        for doc_file in sorted(document_files, key=lambda x: x.name):
+            if doc_file.exists():
+                fingerprints[doc_file.name] = hashlib.sha256(doc_file.read_bytes()).hexdigest()
+        return fingerprints
+
+    def _plan_reindex(self, document_files: List[Path], cache_dir: Path) -> Dict[str, Any]:
         """
-        Verifica se os documentos precisam ser reindexados.
-        Retorna True se houver mudanças ou se o hash não existir.
+        Decide como atualizar o índice a partir de documents_hash.json.
+
+        Retorna ``{"mode": "none" | "incremental" | "full", ...}``. No modo
+        incremental, ``changed``/``added``/``removed`` listam os arquivos (por
+        nome) cujo conteúdo mudou, que surgiram ou que sumiram, e
+        ``previous_hash`` é o hash global do índice anterior (usado para
+        preservar as entradas do cache semântico não afetadas).
+
+        Reindexação completa quando não há metadados, quando eles são do
+        formato antigo (sem hash por arquivo) ou quando a versão do pipeline mudou.
         """
         hash_file = cache_dir / "documents_hash.json"
         current_hash = self._compute_documents_hash(document_files)
-        
+
         if not hash_file.exists():
             logger.info("🔄 Hash de documentos não encontrado. Indexação necessária.")
-            return True
-        
+            return {"mode": "full"}
+
         try:
             with open(hash_file, 'r') as f:
                 cached_data = json.load(f)
-                cached_hash = cached_data.get('hash', '')
-                
-            if cached_hash != current_hash:
-                logger.info("🔄 Documentos modificados detectados. Reindexação necessária.")
-                return True
-            else:
-                logger.info("✅ Documentos não modificados. Usando cache existente.")
-                return False
-                
         except Exception as e:
             logger.warning(f"⚠️  Erro ao ler hash de cache: {e}. Forçando reindexação.")
-            return True
-    
+            return {"mode": "full"}
+
+        cached_hash = cached_data.get('hash', '')
+        if cached_hash == current_hash:
+            logger.info("✅ Documentos não modificados. Usando cache existente.")
+            return {"mode": "none"}
+
+        previous_files = cached_data.get('files')
+        if (
+            cached_data.get('pipeline_version') != INDEX_PIPELINE_VERSION
+            or not isinstance(previous_files, dict)
+        ):
+            logger.info("🔄 Índice de versão anterior detectado. Reindexação completa necessária.")
+            return {"mode": "full"}
+
+        current_files = self._compute_file_fingerprints(document_files)
+        changed = sorted(
+            name for name, digest in current_files.items()
+            if name in previous_files and previous_files[name] != digest
+        )
+        added = sorted(name for name in current_files if name not in previous_files)
+        removed = sorted(name for name in previous_files if name not in current_files)
+
+        if not (changed or added or removed):
+            # Só mtime mudou (ex.: checkout/cópia no deploy): conteúdo idêntico.
+            logger.info("✅ Conteúdo dos documentos inalterado. Usando cache existente.")
+            return {"mode": "none", "refresh_hash": True, "previous_hash": cached_hash}
+
+        logger.info(
+            "🔄 Reindexação incremental: alterados=%s, novos=%s, removidos=%s",
+            changed, added, removed,
+        )
+        return {
+            "mode": "incremental",
+            "changed": changed,
+            "added": added,
+            "removed": removed,
+            "previous_hash": cached_hash,
+        }
+
     def _save_documents_hash(self, document_files: List[Path], cache_dir: Path):
         """Salva o hash atual dos documentos para futuras verificações."""
         hash_file = cache_dir / "documents_hash.json"
@@ -260,13 +418,121 @@ class ChatbotService:
             with open(hash_file, 'w') as f:
                 json.dump({
                     'hash': current_hash,
+                    'pipeline_version': INDEX_PIPELINE_VERSION,
                     'timestamp': datetime.utcnow().isoformat(),
-                    'documents': [str(f.name) for f in document_files]
+                    'documents': [str(f.name) for f in document_files],
+                    'files': self._compute_file_fingerprints(document_files),
                 }, f, indent=2)
+            self._documents_hash_memo = current_hash
             logger.info(f"💾 Hash de documentos salvo: {current_hash[:8]}...")
         except Exception as e:
             logger.warning(f"⚠️  Erro ao salvar hash: {e}")
     
+    @staticmethod
+    def _sql_literal(value: str) -> str:
+        """Literal de string para filtros ``where``/``delete`` do LanceDB."""
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _apply_incremental_reindex(
+        self, plan: Dict[str, Any], existing_files: List[Path], cache_dir: Path
+    ) -> None:
+        """
+        Atualiza a tabela recipes só para os arquivos do plano de ``_plan_reindex``.
+
+        Os chunks dos arquivos alterados/novos são embedados ANTES de qualquer
+        escrita: se o Ollama falhar, a tabela continua intacta. Depois apagam-se
+        os chunks antigos (``source`` alterado ou removido), entram os novos e o
+        índice BM25, os períodos e o cache semântico são atualizados.
+        """
+        stale_sources = list(plan.get("changed", [])) + list(plan.get("removed", []))
+        to_index_names = set(plan.get("changed", [])) | set(plan.get("added", []))
+        to_index = [f for f in existing_files if f.name in to_index_names]
+
+        rows: List[dict] = []
+        if to_index:
+            rows, _ = self._build_index_rows(to_index)
+            if not rows:
+                raise ValueError("Nenhum chunk gerado para os documentos alterados.")
+
+        table = self._get_table_pool().get("recipes")
+        for source in stale_sources:
+            table.delete(f"source = {self._sql_literal(source)}")
+        if rows:
+            table.add(rows)
+
+        self._refresh_keyword_index()
+        self._ensure_vector_index("recipes")
+        self._save_available_periods(self._scan_available_periods() or set())
+        self._save_documents_hash(existing_files, cache_dir)
+        self._invalidate_cache_for_sources(
+            stale_sources, plan.get("previous_hash", ""), self._compute_documents_hash(existing_files)
+        )
+        print(
+            f"✅ Reindexação incremental concluída: {len(rows)} chunks de {len(to_index)} arquivo(s), "
+            f"{len(stale_sources)} fonte(s) substituída(s)/removida(s)."
+        )
+
+    def _invalidate_cache_for_sources(
+        self, stale_sources: List[str], previous_hash: str, current_hash: str
+    ) -> int:
+        """
+        Invalida só as entradas do cache semântico que citaram fontes alteradas.
+
+        Entradas da versão anterior dos documentos cujas ``sources`` tocam
+        ``stale_sources`` (ou que não registraram fontes) são apagadas; as demais
+        são regravadas com o ``documents_hash`` atual e continuam servindo —
+        exceto as cuja pergunta já tem entrada em ``current_hash`` (documentos
+        que voltaram a uma versão anterior): essas são apagadas para a chave
+        ``(question_key, documents_hash)`` continuar única.
+        Retorna quantas entradas foram removidas (fail-open: 0 em erro).
+        """
+        table = getattr(self, "_cache_table", None)
+        if table is None or not previous_hash or previous_hash == current_hash:
+            return 0
+        try:
+            where_previous = f"documents_hash = {self._sql_literal(previous_hash)}"
+            data = table.to_arrow()
+            if "sources" not in data.column_names:
+                return 0
+            stale = set(stale_sources)
+            question_keys = data.column("question_key").to_pylist()
+            hashes = data.column("documents_hash").to_pylist()
+            already_current = {k for k, h in zip(question_keys, hashes) if h == current_hash}
+            doomed: List[str] = []
+            for question_key, documents_hash, raw_sources in zip(
+                question_keys, hashes, data.column("sources").to_pylist(),
+            ):
+                if documents_hash != previous_hash:
+                    continue
+                if question_key in already_current:
+                    doomed.append(question_key)
+                    continue
+                try:
+                    sources = set(json.loads(raw_sources or "[]"))
+                except (TypeError, ValueError):
+                    sources = set()
+                if stale and (not sources or sources & stale):
+                    doomed.append(question_key)
+
+            if doomed:
+                keys = ", ".join(self._sql_literal(k) for k in doomed)
+                table.delete(f"{where_previous} AND question_key IN ({keys})")
+            table.update(where=where_previous, values={"documents_hash": current_hash})
+
+            mirror = self._loaded_cache_mirror()
+            if mirror is not None:
+                for question_key in doomed:
+                    mirror.remove((question_key, previous_hash))
+                mirror.retag(previous_hash, current_hash)
+            logger.info(
+                "🧹 Cache semântico: %d entrada(s) invalidada(s) por fontes alteradas %s.",
+                len(doomed), sorted(stale),
+            )
+            return len(doomed)
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao invalidar cache semântico por fonte: {e}")
+            return 0
+
     def _setup_service(self) -> None:
         """Configura todos os componentes do serviço RAG baseado no script funcional."""
         logger.info("=== CONFIGURANDO AGENTE RAG ===")
@@ -361,7 +627,8 @@ class ChatbotService:
 
         # Verificar se precisa reindexar documentos usando sistema de hash
         cache_dir = Path(self.db_url).parent
-        should_reindex = self._should_reindex_documents(self.document_files, cache_dir)
+        reindex_plan = self._plan_reindex(self.document_files, cache_dir)
+        should_reindex = reindex_plan["mode"] == "full"
 
         vector_db_path = Path(self.db_url) / "recipes.lance"
         has_existing_data = False
@@ -375,6 +642,7 @@ class ChatbotService:
                     shutil.rmtree(vector_db_path)
                 else:
                     vector_db_path.unlink()
+                self._get_table_pool().invalidate("recipes")
                 print("🗑️ Tabela vetorial recipes removida para reindexação limpa.")
             except Exception as cleanup_err:
                 logger.warning(f"⚠️  Falha ao limpar arquivos da tabela vetorial: {cleanup_err}")
@@ -383,10 +651,7 @@ class ChatbotService:
             """Remove o cache semântico ao reindexar: embeddings antigos (sem prefixo de
             tarefa) seriam incompatíveis com o novo índice e não devem ser servidos."""
             try:
-                import lancedb
-                cache_db = lancedb.connect(self.db_url)
-                if SEMANTIC_CACHE_TABLE_NAME in cache_db.table_names():
-                    cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                if self._get_table_pool().drop_table(SEMANTIC_CACHE_TABLE_NAME):
                     print("🗑️ Cache semântico removido para reindexação limpa.")
             except Exception as cache_err:
                 logger.warning(f"⚠️  Falha ao limpar cache semântico: {cache_err}")
@@ -418,9 +683,7 @@ class ChatbotService:
             print("📚 Verificando se a base de conhecimento possui dados...")
             try:
                 # Verificar se há documentos na tabela
-                import lancedb
-                db = lancedb.connect(self.db_url)
-                table = db.open_table("recipes")
+                table = self._get_table_pool().get("recipes")
                 doc_count = table.count_rows()
                 
                 if doc_count > 0:
@@ -468,6 +731,13 @@ class ChatbotService:
 
         self._knowledge_loaded = has_existing_data
 
+        # Índice BM25 do ranking esparso: montado uma vez por versão do índice
+        # vetorial (boot ou reindexação), nunca por pergunta.
+        self._keyword_index = None
+        if has_existing_data:
+            self._refresh_keyword_index()
+            self._get_available_periods()
+
         # 5. Configurar SQLite apenas se persist_history=True
         db = None
         if self.persist_history:
@@ -490,33 +760,161 @@ class ChatbotService:
         print("7. Configurando cache semântico...")
         self._setup_semantic_cache()
 
+        existing_files = [f for f in self.document_files if f.exists()]
+        if has_existing_data and reindex_plan["mode"] == "incremental":
+            print("8. Reindexação incremental dos documentos alterados...")
+            try:
+                self._apply_incremental_reindex(reindex_plan, existing_files, cache_dir)
+            except Exception as e:
+                # Nada foi gravado se o embedding falhou: o índice anterior segue
+                # servindo. O hash memorizado continua o da versão indexada (o
+                # cache não é marcado com uma versão que não está no índice) e o
+                # observador, partindo dele, vê a mudança e tenta de novo.
+                logger.error(f"❌ Reindexação incremental falhou: {e}")
+                self._documents_hash_memo = reindex_plan["previous_hash"]
+        elif has_existing_data and reindex_plan.get("refresh_hash"):
+            self._save_documents_hash(existing_files, cache_dir)
+            self._invalidate_cache_for_sources(
+                [], reindex_plan["previous_hash"], self._compute_documents_hash(existing_files)
+            )
+
+        if has_existing_data:
+            self._ensure_vector_index("recipes")
+            self._start_document_watcher()
+        self._ensure_vector_index(SEMANTIC_CACHE_TABLE_NAME)
+
         print("✅ Serviço configurado com sucesso!")
         print("=" * 50)
 
+    def _get_table_pool(self) -> LanceTablePool:
+        """Conexão LanceDB e handles de tabela compartilhados entre as perguntas."""
+        pool = getattr(self, "_table_pool", None)
+        if pool is None or pool.uri != self.db_url:
+            pool = LanceTablePool(self.db_url)
+            self._table_pool = pool
+        return pool
+
+    def _ensure_vector_index(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """Cria/otimiza o índice ANN da tabela quando ela passa do limiar de linhas.
+
+        Fail-open: sem índice a busca continua exata, só mais lenta.
+        """
+        min_rows = (
+            RECIPES_INDEX_MIN_ROWS if table_name == "recipes" else SEMANTIC_CACHE_INDEX_MIN_ROWS
+        )
+        states = getattr(self, "_vector_index_state", None)
+        if states is None:
+            states = self._vector_index_state = {}
+        try:
+            table = self._get_table_pool().get_if_exists(table_name)
+            if table is None:
+                return None
+            state = ensure_vector_index(table, min_rows=min_rows, index_type=VECTOR_INDEX_TYPE)
+            state["checked_at"] = datetime.utcnow().isoformat()
+            states[table_name] = state
+            return state
+        except Exception as e:
+            logger.warning("⚠️ Falha ao criar/otimizar índice vetorial de '%s': %s", table_name, e)
+            states[table_name] = {"action": "error", "error": str(e)}
+            return None
+
+    def get_vector_index_status(self) -> Dict[str, Any]:
+        """Estado dos índices ANN das tabelas recipes e semantic_cache."""
+        tables: Dict[str, Any] = {}
+        last_checks = getattr(self, "_vector_index_state", None) or {}
+        for table_name, min_rows in (
+            ("recipes", RECIPES_INDEX_MIN_ROWS),
+            (SEMANTIC_CACHE_TABLE_NAME, SEMANTIC_CACHE_INDEX_MIN_ROWS),
+        ):
+            entry: Dict[str, Any] = {"min_rows": min_rows, "last_check": last_checks.get(table_name)}
+            try:
+                table = self._get_table_pool().get_if_exists(table_name) if hasattr(self, "db_url") else None
+                entry["exists"] = table is not None
+                if table is not None:
+                    entry["rows"] = table.count_rows()
+                    entry["index"] = vector_index_info(table)
+                    entry["search_mode"] = "ann" if entry["index"] else "flat"
+                    entry["scalar_indexes"] = sorted(
+                        column
+                        for index in table.list_indices()
+                        for column in list(getattr(index, "columns", []))
+                        if column != "vector"
+                    )
+            except Exception as e:
+                entry["error"] = str(e)
+            tables[table_name] = entry
+        return {
+            "index_type": VECTOR_INDEX_TYPE,
+            "nprobes": VECTOR_INDEX_NPROBES,
+            "refine_factor": VECTOR_INDEX_REFINE_FACTOR,
+            "tables": tables,
+        }
+
+    def _vector_search(self, table: Any, vector: List[float]) -> Any:
+        """``table.search`` com nprobes/refine_factor (ignorados em tabelas sem índice)."""
+        return tune_vector_query(
+            table.search(vector), VECTOR_INDEX_NPROBES, VECTOR_INDEX_REFINE_FACTOR
+        )
+
     def _setup_semantic_cache(self) -> None:
+        """
+        Configura o cache semântico: abre/valida a tabela no LanceDB (durável) e
+        carrega o espelho em memória que atende as leituras.
+        """
+        self._open_semantic_cache_table()
+        self._reload_cache_mirror()
+
+    def _get_cache_mirror(self) -> SemanticCacheMirror:
+        mirror = getattr(self, "_cache_mirror", None)
+        if mirror is None:
+            mirror = self._cache_mirror = SemanticCacheMirror()
+        return mirror
+
+    def _loaded_cache_mirror(self) -> Optional[SemanticCacheMirror]:
+        """Espelho pronto para leitura; None faz as leituras irem ao LanceDB."""
+        mirror = getattr(self, "_cache_mirror", None)
+        return mirror if mirror is not None and mirror.loaded else None
+
+    def _reload_cache_mirror(self) -> None:
+        """Recarrega o espelho a partir da tabela (boot/migração do cache)."""
+        mirror = self._get_cache_mirror()
+        try:
+            if getattr(self, "_cache_db", None) is None:
+                mirror.clear()
+                mirror.loaded = False
+                return
+            table = getattr(self, "_cache_table", None)
+            mirror.load(table.to_arrow().to_pylist() if table is not None else ())
+            logger.info("🧠 Espelho em memória do cache semântico: %d entradas.", len(mirror))
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao carregar espelho do cache semântico: {e}")
+            mirror.clear()
+            mirror.loaded = False
+
+    def _open_semantic_cache_table(self) -> None:
         """
         Configura a tabela de cache semântico no LanceDB.
         Armazena perguntas anteriores com seus embeddings e respostas.
         Verifica compatibilidade dos embeddings existentes.
         """
         try:
-            import lancedb
-            
-            self._cache_db = lancedb.connect(self.db_url)
+            pool = self._get_table_pool()
+            self._cache_db = pool.connection()
             
             # Verificar se a tabela já existe
-            existing_tables = self._cache_db.table_names()
+            existing_tables = pool.table_names()
             
             if SEMANTIC_CACHE_TABLE_NAME not in existing_tables:
                 # Criar tabela com schema inicial (será criada no primeiro insert)
                 logger.info("📦 Tabela de cache semântico será criada no primeiro uso.")
                 self._cache_table = None
             else:
-                self._cache_table = self._cache_db.open_table(SEMANTIC_CACHE_TABLE_NAME)
+                self._cache_table = pool.get(SEMANTIC_CACHE_TABLE_NAME)
                 cache_count = self._cache_table.count_rows()
                 required_columns = {
                     "question",
                     "answer",
+                    "sources",
                     "vector",
                     "question_key",
                     "documents_hash",
@@ -532,13 +930,13 @@ class ChatbotService:
                     df = self._cache_table.to_pandas()
                     if not required_columns.issubset(set(df.columns)):
                         logger.warning("⚠️ Cache semântico com schema antigo detectado. Recriando tabela...")
-                        self._cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                        pool.drop_table(SEMANTIC_CACHE_TABLE_NAME)
                         self._cache_table = None
                         logger.info("🗑️ Cache semântico antigo removido para migração de schema.")
                         return
                 except Exception as schema_err:
                     logger.warning(f"⚠️ Erro ao validar schema do cache: {schema_err}. Recriando...")
-                    self._cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                    pool.drop_table(SEMANTIC_CACHE_TABLE_NAME)
                     self._cache_table = None
                     return
 
@@ -552,14 +950,15 @@ class ChatbotService:
                         # Se a norma não for aproximadamente 1.0, os embeddings são incompatíveis
                         if not np.isclose(norm, 1.0, atol=0.1):
                             logger.warning(f"⚠️ Embeddings do cache são incompatíveis (norma={norm:.4f}). Limpando cache...")
-                            self._cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                            pool.drop_table(SEMANTIC_CACHE_TABLE_NAME)
                             self._cache_table = None
                             logger.info("🗑️ Cache semântico antigo removido. Será recriado com novos embeddings.")
                         else:
                             logger.info(f"✅ Cache semântico carregado com {cache_count} entradas (embeddings compatíveis).")
+                            self._ensure_cache_scalar_indexes()
                     except Exception as check_err:
                         logger.warning(f"⚠️ Erro ao verificar cache: {check_err}. Recriando...")
-                        self._cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                        pool.drop_table(SEMANTIC_CACHE_TABLE_NAME)
                         self._cache_table = None
                 else:
                     logger.info(f"✅ Cache semântico carregado (vazio).")
@@ -581,8 +980,26 @@ class ChatbotService:
         prefix = "search_document: " if input_type == "document" else "search_query: "
         return prefix + text
 
+    def _get_embedding_cache(self) -> BoundedLRUCache:
+        """Cache LRU de embeddings, criado sob demanda (sobrevive entre perguntas)."""
+        cache = getattr(self, "_embedding_cache", None)
+        if cache is None:
+            cache = BoundedLRUCache(EMBEDDING_CACHE_MAX_ENTRIES)
+            self._embedding_cache = cache
+        return cache
+
+    def _embedding_cache_key(self, text: str, input_type: str) -> tuple[str, str, str]:
+        """Chave (embedder, prefixo de tarefa, texto normalizado) do cache de embeddings.
+
+        O prefixo entra na chave porque o mesmo texto gera vetores diferentes como
+        ``search_query:`` e ``search_document:`` no nomic-embed-text.
+        """
+        embedder_id = str(getattr(self.embedder, "id", type(self.embedder).__name__))
+        prefix = self._apply_embedding_prefix("", input_type)
+        return embedder_id, prefix, " ".join((text or "").split())
+
     def _get_question_embedding(
-        self, question: str, input_type: str = "query"
+        self, question: str, input_type: str = "query", use_cache: bool = True
     ) -> Optional[List[float]]:
         """
         Gera embedding para um texto usando o embedder configurado.
@@ -592,6 +1009,11 @@ class ChatbotService:
         ``"query"`` → ``search_query:`` (consultas) e ``"document"`` →
         ``search_document:`` (chunks indexados). Os prefixos são obrigatórios para
         recuperação assimétrica e só são aplicados quando o embedder é o nomic.
+
+        Resultados ficam no cache LRU de embeddings: a mesma pergunta é embeddada
+        por várias etapas do ``ask_question`` e só a primeira vai ao Ollama.
+        ``use_cache=False`` é usado na indexação, para que os chunks não expulsem
+        as perguntas do cache.
         """
         try:
             if self.embedder is None:
@@ -599,6 +1021,16 @@ class ChatbotService:
 
             text = self._apply_embedding_prefix(question, input_type)
 
+            cache = self._get_embedding_cache() if use_cache else None
+            if cache is not None and cache.max_entries <= 0:
+                cache = None
+            cache_key = None
+            if cache is not None:
+                cache_key = self._embedding_cache_key(question, input_type)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return list(cached)
+
             # GeminiEmbedder usa método get_embedding
             if hasattr(self.embedder, 'get_embedding'):
                 embedding = self.embedder.get_embedding(text)
@@ -622,20 +1054,87 @@ class ChatbotService:
                 embedding_array = embedding_array / norm
 
             result = embedding_array.tolist()
-            return result if result else None
+            if not result:
+                return None
+            if cache is not None:
+                cache.put(cache_key, tuple(result))
+            return result
             
         except Exception as e:
             logger.warning(f"Erro ao gerar embedding: {e}")
             return None
 
     def _get_current_documents_hash(self) -> str:
-        """Retorna hash dos documentos atualmente ativos no serviço."""
+        """
+        Retorna hash dos documentos atualmente ativos no serviço.
+
+        Memorizado: é chamado em toda pergunta (busca e contagem do cache) e não
+        deve tocar o disco. Quem o atualiza é ``_save_documents_hash`` (boot e
+        reindexação disparada pelo observador de documentos).
+        """
+        memo = getattr(self, "_documents_hash_memo", None)
+        if memo is not None:
+            return memo
         if not hasattr(self, "document_files"):
             return ""
         existing_files = [f for f in self.document_files if f.exists()]
-        if not existing_files:
-            return ""
-        return self._compute_documents_hash(existing_files)
+        memo = self._compute_documents_hash(existing_files) if existing_files else ""
+        self._documents_hash_memo = memo
+        return memo
+
+    def _list_watched_documents(self) -> List[Path]:
+        """Markdown atuais das pastas dos documentos indexados (inclui arquivos novos)."""
+        folders = sorted({f.parent for f in getattr(self, "document_files", [])})
+        files = [
+            f for folder in folders if folder.exists()
+            for f in list(folder.glob("*.md")) + list(folder.glob("*.MD"))
+        ]
+        return sorted(set(files), key=lambda p: p.name.lower())
+
+    def _scan_documents_fingerprint(self) -> str:
+        """Hash de nome/tamanho/mtime dos documentos no disco (usado pelo observador)."""
+        files = self._list_watched_documents()
+        return self._compute_documents_hash(files) if files else ""
+
+    def _start_document_watcher(self) -> Optional[DocumentWatcher]:
+        """Inicia a checagem periódica dos documentos (RAG_DOCUMENTS_WATCH_INTERVAL_S)."""
+        if DOCUMENTS_WATCH_INTERVAL_S <= 0:
+            return None
+        watcher = getattr(self, "_document_watcher", None)
+        if watcher is None:
+            watcher = DocumentWatcher(
+                fingerprint_fn=self._scan_documents_fingerprint,
+                on_change=self._reload_changed_documents,
+                interval=DOCUMENTS_WATCH_INTERVAL_S,
+            )
+            atexit.register(watcher.stop)
+            self._document_watcher = watcher
+        return watcher.start(self._get_current_documents_hash())
+
+    def _reload_changed_documents(self, fingerprint: str) -> None:
+        """
+        Callback do observador: reindexa em segundo plano os documentos que
+        mudaram. Se a reindexação falhar, o hash memorizado continua o da versão
+        indexada (o cache segue consistente) e o observador tenta de novo.
+        """
+        files = self._list_watched_documents()
+        cache_dir = Path(self.db_url).parent
+        plan = self._plan_reindex(files, cache_dir)
+        if plan["mode"] == "full":
+            logger.warning(
+                "⚠️ Documentos alterados exigem reindexação completa; reinicie o serviço para aplicá-la."
+            )
+            return
+        if plan["mode"] == "incremental":
+            logger.info("📝 Documentos alterados detectados; reindexando em segundo plano.")
+            self._apply_incremental_reindex(plan, files, cache_dir)
+        elif plan.get("refresh_hash"):
+            self._save_documents_hash(files, cache_dir)
+            self._invalidate_cache_for_sources([], plan["previous_hash"], fingerprint)
+        else:
+            self._documents_hash_memo = fingerprint
+        # Só depois de indexada: uma falha acima não publica a lista nova.
+        self.document_files = files
 
     @staticmethod
     def _normalize_question_for_key(question: str) -> str:
@@ -672,11 +1171,17 @@ class ChatbotService:
         answer: str,
         question_embedding: List[float],
         existing_entry: Optional[Dict[str, Any]],
+        sources: Optional[List[str]] = None,
+        repetitions: int = 1,
     ) -> Dict[str, Any]:
         """Monta payload canônico da entrada de cache semântico.
 
         O TTL é renovado (sliding) a cada repetição: enquanto a pergunta continuar
         sendo feita, a entrada não expira; se parar de ser feita, expira normalmente.
+
+        ``sources`` são os arquivos citados pela resposta (usados na invalidação
+        por documento); se None, mantém as fontes já gravadas na entrada.
+        ``repetitions`` > 1 quando várias ocorrências foram agrupadas num lote.
         """
         now_utc = datetime.now(timezone.utc)
         documents_hash = self._get_current_documents_hash()
@@ -685,7 +1190,7 @@ class ChatbotService:
         ).hexdigest()
 
         previous_hit_count = int(existing_entry.get("hit_count", 0)) if existing_entry else 0
-        new_hit_count = previous_hit_count + 1
+        new_hit_count = previous_hit_count + max(1, int(repetitions))
         status = self._compute_frequency_status(new_hit_count)
 
         ttl_days = (
@@ -695,9 +1200,15 @@ class ChatbotService:
         )
         expires_at = (now_utc + timedelta(days=ttl_days)).isoformat()
 
+        if sources is None:
+            serialized_sources = (existing_entry or {}).get("sources") or "[]"
+        else:
+            serialized_sources = json.dumps(sorted(set(sources)), ensure_ascii=False)
+
         return {
             "question": question,
             "answer": answer,
+            "sources": serialized_sources,
             "vector": question_embedding,
             "question_key": question_key,
             "documents_hash": documents_hash,
@@ -715,6 +1226,10 @@ class ChatbotService:
         Busca entrada exata por chave de pergunta e versão dos documentos.
         """
         try:
+            mirror = self._loaded_cache_mirror()
+            if mirror is not None:
+                return mirror.get(question_key, documents_hash)
+
             if self._cache_table is None:
                 return None
 
@@ -740,33 +1255,104 @@ class ChatbotService:
         """
         Insere ou atualiza uma entrada de cache usando question_key + documents_hash.
         """
+        return self._upsert_cache_entries([cache_entry])
+
+    def _upsert_cache_entries(self, cache_entries: List[Dict[str, Any]]) -> bool:
+        """
+        Insere ou atualiza várias entradas numa única escrita (``merge_insert``
+        por question_key + documents_hash) — uma versão nova da tabela por lote.
+        """
         try:
             if self._cache_db is None:
                 return False
+            if not cache_entries:
+                return True
 
             if self._cache_table is None:
-                import lancedb
-
-                self._cache_table = self._cache_db.create_table(
+                self._cache_table = self._get_table_pool().register(
                     SEMANTIC_CACHE_TABLE_NAME,
-                    data=[cache_entry],
-                    mode="overwrite",
+                    self._cache_db.create_table(
+                        SEMANTIC_CACHE_TABLE_NAME,
+                        data=cache_entries,
+                        mode="overwrite",
+                    ),
                 )
                 logger.info("📦 Tabela de cache semântico criada.")
-                return True
-
-            question_key = str(cache_entry.get("question_key", ""))
-            documents_hash = str(cache_entry.get("documents_hash", ""))
-            if question_key and documents_hash:
-                self._cache_table.delete(
-                    f"question_key = '{question_key}' AND documents_hash = '{documents_hash}'"
+                self._ensure_cache_scalar_indexes()
+            else:
+                (
+                    self._cache_table.merge_insert(["question_key", "documents_hash"])
+                    .when_matched_update_all()
+                    .when_not_matched_insert_all()
+                    .execute(cache_entries)
                 )
-            self._cache_table.add([cache_entry])
+
+            for cache_entry in cache_entries:
+                self._mirror_cache_write(cache_entry)
+
+            writes = getattr(self, "_cache_writes_since_index_check", 0) + len(cache_entries)
+            if SEMANTIC_CACHE_INDEX_CHECK_EVERY > 0 and writes >= SEMANTIC_CACHE_INDEX_CHECK_EVERY:
+                self._ensure_vector_index(SEMANTIC_CACHE_TABLE_NAME)
+                writes = 0
+            self._cache_writes_since_index_check = writes
             return True
         except Exception as e:
             logger.warning(f"Erro no upsert do cache: {e}")
             return False
 
+    def _ensure_cache_scalar_indexes(self) -> None:
+        """Cria os índices escalares do prefilter (fail-open: sem eles o
+        ``where`` continua correto, só varre as colunas)."""
+        try:
+            if self._cache_table is not None:
+                ensure_scalar_indexes(self._cache_table, SEMANTIC_CACHE_SCALAR_INDEXES)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao criar índices escalares do cache semântico: %s", e)
+
+    def _mirror_cache_write(self, cache_entry: Dict[str, Any]) -> None:
+        """Write-through: repete no espelho a gravação já persistida no LanceDB."""
+        mirror = self._loaded_cache_mirror()
+        if mirror is not None:
+            mirror.upsert(cache_entry)
+
+    def _nearest_cache_entries(
+        self,
+        question_embedding: List[float],
+        limit: int = 20,
+        status: Optional[str] = None,
+        documents_hash: Optional[str] = None,
+        valid_at: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Entradas mais próximas (cosseno): do espelho em memória ou, sem ele, do LanceDB.
+
+        Os filtros (``status``, ``documents_hash``, ``expires_at > valid_at``)
+        são aplicados ANTES do top-``limit`` (prefilter): com muitas entradas
+        candidate/expiradas/de outra versão dos documentos perto da pergunta,
+        um pós-filtro descartaria os 20 vizinhos e perderia o hit trusted.
+        """
+        mirror = self._loaded_cache_mirror()
+        if mirror is not None:
+            return mirror.search(
+                question_embedding,
+                limit=limit,
+                status=status,
+                documents_hash=documents_hash,
+                valid_at=valid_at,
+            )
+        query = self._vector_search(self._cache_table, question_embedding).metric("cosine")
+        clauses = []
+        if status is not None:
+            clauses.append(f"status = {self._sql_literal(status)}")
+        if documents_hash is not None:
+            clauses.append(f"documents_hash = {self._sql_literal(documents_hash)}")
+        if valid_at is not None:
+            # expires_at é ISO-8601 UTC (mesmo formato/offset): a ordem lexicográfica é a cronológica.
+            clauses.append(f"expires_at > {self._sql_literal(valid_at.astimezone(timezone.utc).isoformat())}")
+        if clauses:
+            query = query.where(" AND ".join(clauses), prefilter=True)
+        return query.limit(limit).to_list()
+
     def _is_cache_entry_serving_eligible(
         self, entry: Dict[str, Any], similarity: float, current_documents_hash: str
     ) -> bool:
@@ -810,14 +1396,24 @@ class ChatbotService:
             if not question_embedding:
                 return None
             
-            # Buscar no cache usando similaridade de cosseno
-            # metric="cosine" retorna distância de cosseno: distance = 1 - cosine_similarity
-            results = self._cache_table.search(question_embedding).metric("cosine").limit(20).to_list()
+            current_documents_hash = self._get_current_documents_hash()
+            if not current_documents_hash:
+                return None
+
+            # Buscar no cache usando similaridade de cosseno, só entre entradas
+            # servíveis (prefilter). metric="cosine" retorna distância de
+            # cosseno: distance = 1 - cosine_similarity
+            results = self._nearest_cache_entries(
+                question_embedding,
+                limit=20,
+                status="trusted",
+                documents_hash=current_documents_hash,
+                valid_at=datetime.now(timezone.utc),
+            )
             
             if not results:
                 return None
 
-            current_documents_hash = self._get_current_documents_hash()
             for candidate in results:
                 cosine_distance = candidate.get("_distance", 1.0)
                 similarity = max(0.0, min(1.0, 1 - cosine_distance))
@@ -875,8 +1471,8 @@ class ChatbotService:
             if self._cache_table is None:
                 return None
 
-            results = (
-                self._cache_table.search(question_embedding).metric("cosine").limit(20).to_list()
+            results = self._nearest_cache_entries(
+                question_embedding, limit=20, documents_hash=current_documents_hash
             )
             for candidate in results:
                 cosine_distance = candidate.get("_distance", 1.0)
@@ -891,7 +1487,9 @@ class ChatbotService:
             logger.warning(f"Erro ao buscar entrada similar no cache: {e}")
             return None
 
-    def _track_question_frequency(self, question: str, answer: str) -> Optional[Dict[str, Any]]:
+    def _track_question_frequency(
+        self, question: str, answer: str, sources: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Registra automaticamente toda pergunta respondida (cache hit ou geração
         nova pelo modelo) e incrementa a contagem de repetições.
@@ -907,6 +1505,9 @@ class ChatbotService:
         entrada é promovida a "trusted" e passa a ser servida do cache para
         perguntas semanticamente similares.
 
+        Versão síncrona (grava na hora); ``ask_question`` usa
+        ``_record_question_frequency``, que enfileira e grava em lote.
+
         Returns:
             O cache_entry persistido, ou None se o cache semântico estiver
             desabilitado ou a operação falhar (fail-open: nunca interrompe o
@@ -916,61 +1517,194 @@ class ChatbotService:
             if self._cache_db is None:
                 return None
 
-            normalized_question = (question or "").strip()
-            normalized_answer = (answer or "").strip()
-            if not normalized_question or not normalized_answer:
+            cache_entry = self._prepare_frequency_entry(question, answer, sources)
+            if cache_entry is None:
                 return None
+            if self._upsert_cache_entry(cache_entry):
+                return cache_entry
+            return None
 
-            question_embedding = self._get_question_embedding(normalized_question)
-            if question_embedding is None:
-                return None
+        except Exception as e:
+            logger.warning(f"Erro ao registrar frequência no cache semântico: {e}")
+            return None
+
+    def _prepare_frequency_entry(
+        self,
+        question: str,
+        answer: str,
+        sources: Optional[List[str]] = None,
+        repetitions: int = 1,
+        pending: Optional[Dict[tuple, Dict[str, Any]]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Calcula a entrada de cache resultante de ``repetitions`` ocorrências da
+        pergunta, sem gravar. ``pending`` são entradas já calculadas no mesmo
+        lote (ainda não gravadas): têm precedência sobre o que está no cache.
+        """
+        normalized_question = (question or "").strip()
+        normalized_answer = (answer or "").strip()
+        if not normalized_question or not normalized_answer:
+            return None
 
-            documents_hash = self._get_current_documents_hash()
+        question_embedding = self._get_question_embedding(normalized_question)
+        if question_embedding is None:
+            return None
+
+        documents_hash = self._get_current_documents_hash()
+        pending = pending if pending is not None else {}
 
-            # 1. Tenta achar uma entrada semanticamente equivalente já existente
-            #    (qualquer redação) — é ela que acumula a repetição.
+        # 1. Tenta achar uma entrada semanticamente equivalente já existente
+        #    (qualquer redação) — é ela que acumula a repetição. Entradas do
+        #    lote corrente vêm primeiro: têm o hit_count mais recente.
+        existing_entry = self._find_similar_pending_entry(
+            question_embedding, documents_hash, pending
+        )
+        if existing_entry is None:
             existing_entry = self._find_similar_cache_entry(question_embedding, documents_hash)
 
-            # 2. Sem entrada similar: cai para o match exato por question_key
-            #    (cobre o caso de reforçar a MESMA entrada que acabou de ser criada).
+        # 2. Sem entrada similar: cai para o match exato por question_key
+        #    (cobre o caso de reforçar a MESMA entrada que acabou de ser criada).
+        if existing_entry is None:
+            question_key = hashlib.sha256(
+                self._normalize_question_for_key(normalized_question).encode("utf-8")
+            ).hexdigest()
+            existing_entry = pending.get((question_key, documents_hash))
             if existing_entry is None:
-                question_key = hashlib.sha256(
-                    self._normalize_question_for_key(normalized_question).encode("utf-8")
-                ).hexdigest()
                 existing_entry = self._find_cache_entry_by_question_key(question_key, documents_hash)
-
-            # A entrada persistida é ancorada na pergunta/vetor ORIGINAIS (quando já
-            # existir uma similar) — evita que o vetor represente uma "média" de
-            # redações e vá gradualmente "derivando" para fora do tópico original.
-            anchor_question = existing_entry["question"] if existing_entry else normalized_question
-            anchor_embedding = (
-                np.array(existing_entry["vector"], dtype=np.float32).tolist()
-                if existing_entry
-                else question_embedding
+        else:
+            existing_entry = pending.get(
+                (existing_entry.get("question_key"), documents_hash), existing_entry
             )
 
-            cache_entry = self._build_cache_entry(
-                question=anchor_question,
-                answer=normalized_answer,
-                question_embedding=anchor_embedding,
-                existing_entry=existing_entry,
-            )
+        # A entrada persistida é ancorada na pergunta/vetor ORIGINAIS (quando já
+        # existir uma similar) — evita que o vetor represente uma "média" de
+        # redações e vá gradualmente "derivando" para fora do tópico original.
+        anchor_question = existing_entry["question"] if existing_entry else normalized_question
+        anchor_embedding = (
+            np.array(existing_entry["vector"], dtype=np.float32).tolist()
+            if existing_entry
+            else question_embedding
+        )
 
-            saved = self._upsert_cache_entry(cache_entry)
-            if saved:
-                logger.info(
-                    "💾 Frequência do cache atualizada: status=%s, hit_count=%d, pergunta original='%s...', pergunta recebida='%s...'",
-                    cache_entry["status"],
-                    cache_entry["hit_count"],
-                    anchor_question[:50],
-                    normalized_question[:50],
-                )
-                return cache_entry
+        cache_entry = self._build_cache_entry(
+            question=anchor_question,
+            answer=normalized_answer,
+            question_embedding=anchor_embedding,
+            existing_entry=existing_entry,
+            sources=sources,
+            repetitions=repetitions,
+        )
+        logger.info(
+            "💾 Frequência do cache atualizada: status=%s, hit_count=%d, pergunta original='%s...', pergunta recebida='%s...'",
+            cache_entry["status"],
+            cache_entry["hit_count"],
+            anchor_question[:50],
+            normalized_question[:50],
+        )
+        return cache_entry
+
+    @staticmethod
+    def _find_similar_pending_entry(
+        question_embedding: List[float],
+        documents_hash: str,
+        pending: Dict[tuple, Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """Entrada do lote corrente mais próxima acima do threshold de similaridade."""
+        if not pending:
             return None
+        query = np.asarray(question_embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        best, best_similarity = None, SEMANTIC_CACHE_SIMILARITY_THRESHOLD
+        for (_, entry_hash), entry in pending.items():
+            if entry_hash != documents_hash:
+                continue
+            vector = np.asarray(entry["vector"], dtype=np.float32)
+            similarity = float(vector @ query) / ((float(np.linalg.norm(vector)) or 1.0) * query_norm)
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return best
+
+    def _get_frequency_queue(self) -> CoalescingBatchQueue:
+        """Fila em segundo plano da contagem de frequência (criada sob demanda)."""
+        queue = getattr(self, "_frequency_queue", None)
+        if queue is None:
+            queue = CoalescingBatchQueue(
+                flush_fn=self._flush_frequency_batch,
+                merge_fn=self._merge_frequency_items,
+                max_batch=SEMANTIC_CACHE_FREQUENCY_MAX_BATCH,
+                flush_interval=SEMANTIC_CACHE_FREQUENCY_FLUSH_INTERVAL_S,
+                name="rag-frequency-flush",
+            ).start()
+            atexit.register(queue.stop)
+            self._frequency_queue = queue
+        return queue
+
+    @staticmethod
+    def _merge_frequency_items(previous: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """Junta duas ocorrências da mesma pergunta: primeira redação, resposta mais
+        recente, contagem somada."""
+        return {
+            "question": previous["question"],
+            "answer": new["answer"],
+            "sources": new["sources"] if new["sources"] is not None else previous["sources"],
+            "repetitions": previous["repetitions"] + new["repetitions"],
+        }
+
+    def _record_question_frequency(
+        self, question: str, answer: str, sources: Optional[List[str]] = None
+    ) -> None:
+        """Enfileira a repetição da pergunta (ou grava na hora no modo síncrono).
 
+        Só o modo síncrono conta como ``cache_bookkeeping`` (a gravação roda na
+        pergunta); no assíncrono a gravação é medida no flush, em ``cache_flush``.
+        """
+        if not SEMANTIC_CACHE_FREQUENCY_ASYNC:
+            with rag_metrics.time("cache_bookkeeping"):
+                self._track_question_frequency(question, answer, sources=sources)
+            return
+        try:
+            if getattr(self, "_cache_db", None) is None:
+                return
+            normalized_question = (question or "").strip()
+            if not normalized_question or not (answer or "").strip():
+                return
+            self._get_frequency_queue().submit(
+                self._normalize_question_for_key(normalized_question),
+                {
+                    "question": normalized_question,
+                    "answer": answer,
+                    "sources": sources,
+                    "repetitions": 1,
+                },
+            )
         except Exception as e:
-            logger.warning(f"Erro ao registrar frequência no cache semântico: {e}")
-            return None
+            logger.warning(f"Erro ao enfileirar frequência do cache semântico: {e}")
+
+    def _flush_frequency_batch(self, items: List[Dict[str, Any]]) -> None:
+        """Calcula as entradas do lote e grava todas com um único merge_insert."""
+        with rag_metrics.time("cache_flush"):
+            pending: Dict[tuple, Dict[str, Any]] = {}
+            for item in items:
+                try:
+                    cache_entry = self._prepare_frequency_entry(
+                        item["question"],
+                        item["answer"],
+                        item["sources"],
+                        repetitions=item["repetitions"],
+                        pending=pending,
+                    )
+                except Exception as e:
+                    logger.warning(f"Erro ao registrar frequência no cache semântico: {e}")
+                    continue
+                if cache_entry is not None:
+                    pending[(cache_entry["question_key"], cache_entry["documents_hash"])] = cache_entry
+            if pending and not self._upsert_cache_entries(list(pending.values())):
+                raise RuntimeError("falha ao gravar lote de frequência no cache semântico")
+
+    def flush_question_frequency(self) -> int:
+        """Grava imediatamente as repetições pendentes na fila (ex.: shutdown/testes)."""
+        queue = getattr(self, "_frequency_queue", None)
+        return queue.flush() if queue is not None else 0
 
     def _get_agent(self, session_id: str) -> Agent:
         """
@@ -1179,29 +1913,110 @@ class ChatbotService:
 
         return result
 
-    def _index_documents_fine_grained(
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embeda um lote de textos (já com prefixo de tarefa) numa única chamada.
+
+        Usa ``/api/embed`` com lista de entradas quando o embedder é o Ollama;
+        para os demais (ou se a chamada em lote falhar), embeda item a item.
+        """
+        client = getattr(self.embedder, "client", None)
+        if client is not None and hasattr(client, "embed"):
+            try:
+                kwargs: Dict[str, Any] = {}
+                if getattr(self.embedder, "options", None) is not None:
+                    kwargs["options"] = self.embedder.options
+                if getattr(self.embedder, "dimensions", None) is not None:
+                    kwargs["dimensions"] = self.embedder.dimensions
+                response = client.embed(input=texts, model=self.embedder.id, **kwargs)
+                embeddings = list(response["embeddings"])
+                if len(embeddings) == len(texts):
+                    return [list(e) if e is not None and len(e) else None for e in embeddings]
+                logger.warning(
+                    "⚠️ Embedding em lote devolveu %d vetores para %d textos; refazendo item a item.",
+                    len(embeddings), len(texts),
+                )
+            except Exception as e:
+                logger.warning("⚠️ Embedding em lote falhou (%s); refazendo item a item.", e)
+
+        results: List[Optional[List[float]]] = []
+        for text in texts:
+            try:
+                if hasattr(self.embedder, "get_embedding"):
+                    embedding = self.embedder.get_embedding(text)
+                else:
+                    embedding = self.embedder.embed(text)
+                if hasattr(embedding, "tolist"):
+                    embedding = embedding.tolist()
+                results.append(list(embedding) if embedding else None)
+            except Exception as e:
+                logger.warning(f"Erro ao gerar embedding: {e}")
+                results.append(None)
+        return results
+
+    def _embed_documents_batched(self, chunks: List[str]) -> List[Optional[List[float]]]:
+        """Embeda os chunks da indexação em lotes, com concorrência limitada.
+
+        Lotes de ``INDEX_EMBED_BATCH_SIZE`` chunks, no máximo
+        ``INDEX_EMBED_CONCURRENCY`` em voo. A matriz inteira é normalizada (L2)
+        de uma vez com NumPy. Devolve um vetor por chunk, na mesma ordem, ou
+        ``None`` para os que falharam (dimensão divergente ou erro do embedder).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if not chunks or self.embedder is None:
+            return [None] * len(chunks)
+
+        texts = [self._apply_embedding_prefix(c, "document") for c in chunks]
+        batch_size = max(1, INDEX_EMBED_BATCH_SIZE)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        start = time.perf_counter()
+        raw: List[Optional[List[float]]] = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, INDEX_EMBED_CONCURRENCY)) as executor:
+            # map preserva a ordem dos lotes
+            for batch_vectors in executor.map(self._embed_batch, batches):
+                raw.extend(batch_vectors)
+                done += len(batch_vectors)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"   ⚙️  Embeddings: {done}/{len(texts)} chunks "
+                    f"({done / elapsed if elapsed > 0 else 0:.1f} chunks/s)"
+                )
+
+        expected_dim = getattr(self.embedder, "dimensions", None)
+        if not expected_dim:
+            expected_dim = next((len(v) for v in raw if v), 0)
+        valid = [i for i, v in enumerate(raw) if v and len(v) == expected_dim]
+        vectors: List[Optional[List[float]]] = [None] * len(raw)
+        if valid:
+            matrix = np.asarray([raw[i] for i in valid], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+            for row, i in zip(matrix.tolist(), valid):
+                vectors[i] = row
+
+        elapsed = time.perf_counter() - start
+        failed = len(raw) - len(valid)
+        logger.info(
+            "📈 Embeddings da indexação: %d chunks em %.1fs (%.1f chunks/s, lote=%d, concorrência=%d, falhas=%d)",
+            len(valid), elapsed, len(valid) / elapsed if elapsed > 0 else 0.0,
+            batch_size, INDEX_EMBED_CONCURRENCY, failed,
+        )
+        return vectors
+
+    def _build_index_rows(
         self,
         files: List[Path],
         chunk_size: int = 800,
         overlap: int = 150,
-    ) -> None:
-        """Indexa documentos com chunking fino (800 chars / 150 overlap) direto no LanceDB.
-
-        Utiliza _split_with_section_context para preservar o cabeçalho da seção
-        pai em cada chunk (Melhoria 1 — Contextual Chunking).
-        """
-        import lancedb
+    ) -> tuple[List[dict], set]:
+        """Gera as linhas da tabela recipes (chunk + embedding) e os períodos letivos
+        encontrados, sem escrever nada no LanceDB."""
         import uuid
 
-        db = lancedb.connect(self.db_url)
-
-        # Garante que a tabela existe com o esquema correto
-        try:
-            table = db.open_table("recipes")
-        except Exception:
-            table = None
-
-        all_rows: List[dict] = []
+        periods: set = set()
+        pending: List[tuple[str, Path, int, str, str]] = []
 
         for doc_file in files:
             doc_name = f"{doc_file.stem} Document"
@@ -1212,31 +2027,52 @@ class ChatbotService:
             print(f"   📄 {doc_file.name}: {len(section_chunks)} chunks contextuais (chunk_size={chunk_size})")
 
             for i, (sec_header, chunk) in enumerate(section_chunks):
-                embedding = self._get_question_embedding(chunk, input_type="document")
-                if not embedding:
-                    continue
-                # Normalizar
-                arr = np.array(embedding, dtype=np.float32)
-                norm = np.linalg.norm(arr)
-                if norm > 0:
-                    arr = arr / norm
-
-                payload = json.dumps({
-                    "name": doc_name,
-                    "meta_data": {
-                        "chunk": i + 1,
-                        "chunk_size": len(chunk),
-                        "source": doc_file.name,
-                        "section": sec_header,
-                    },
-                    "content": chunk,
-                }, ensure_ascii=False)
-
-                all_rows.append({
-                    "vector": arr.tolist(),
-                    "id": str(uuid.uuid4()),
-                    "payload": payload,
-                })
+                periods.update(_PERIOD_RE.findall(chunk))
+                pending.append((doc_name, doc_file, i, sec_header, chunk))
+
+        vectors = self._embed_documents_batched([chunk for *_, chunk in pending])
+
+        all_rows: List[dict] = []
+        for (doc_name, doc_file, i, sec_header, chunk), vector in zip(pending, vectors):
+            if vector is None:
+                continue
+            payload = json.dumps({
+                "name": doc_name,
+                "meta_data": {
+                    "chunk": i + 1,
+                    "chunk_size": len(chunk),
+                    "source": doc_file.name,
+                    "section": sec_header,
+                },
+                "content": chunk,
+            }, ensure_ascii=False)
+
+            all_rows.append({
+                "vector": vector,
+                "id": str(uuid.uuid4()),
+                "payload": payload,
+                "source": doc_file.name,
+            })
+
+        return all_rows, periods
+
+    def _index_documents_fine_grained(
+        self,
+        files: List[Path],
+        chunk_size: int = 800,
+        overlap: int = 150,
+    ) -> None:
+        """Indexa documentos com chunking fino (800 chars / 150 overlap) direto no LanceDB.
+
+        Utiliza _split_with_section_context para preservar o cabeçalho da seção
+        pai em cada chunk (Melhoria 1 — Contextual Chunking).
+        """
+        pool = self._get_table_pool()
+
+        # Garante que a tabela existe com o esquema correto
+        table = pool.get_if_exists("recipes")
+
+        all_rows, periods = self._build_index_rows(files, chunk_size, overlap)
 
         if not all_rows:
             raise ValueError("Nenhum chunk gerado — verifique os documentos.")
@@ -1249,8 +2085,14 @@ class ChatbotService:
                 pa.field("vector", pa.list_(pa.float32(), list_size=768)),
                 pa.field("id", pa.string()),
                 pa.field("payload", pa.string()),
+                pa.field("source", pa.string()),
             ])
-            db.create_table("recipes", data=all_rows, schema=schema)
+            pool.register(
+                "recipes",
+                pool.connection().create_table("recipes", data=all_rows, schema=schema),
+            )
+
+        self._save_available_periods(periods)
 
         total = len(all_rows)
         print(f"✅ Reindexação concluída: {total} chunks inseridos no LanceDB.")
@@ -1284,32 +2126,112 @@ class ChatbotService:
         "sobre", "entre", "quando", "onde", "isso", "esta", "esse", "este",
     }
 
-    def _keyword_search(self, question: str, table, top_k: int = 5) -> List[str]:
-        """Busca por palavras-chave no payload como complemento ao semântico."""
+    @staticmethod
+    def _payload_content(payload: Any) -> str:
+        """Extrai o texto do chunk do payload JSON gravado na tabela recipes."""
         try:
-            expanded = self._expand_query(question)
-            raw_words = [w.strip(".,?!:;()[]").lower() for w in expanded.split()]
-            keywords = [
-                w for w in raw_words
-                if len(w) >= 3 and w not in self._PT_STOP_WORDS
-            ]
-            df = table.to_pandas()
-            scored: List[tuple[int, str]] = []
-            for _, row in df.iterrows():
-                p = json.loads(row["payload"]) if isinstance(row["payload"], str) else row["payload"]
-                content = p.get("content", "")
-                content_lower = content.lower()
-                score = sum(1 for kw in keywords if kw in content_lower)
-                if score > 0:
-                    scored.append((score, content))
-            scored.sort(key=lambda x: x[0], reverse=True)
-            return [c for _, c in scored[:top_k]]
-        except Exception:
-            return []
+            p = json.loads(payload) if isinstance(payload, str) else (payload or {})
+        except (TypeError, ValueError):
+            return ""
+        return (p.get("content", "") or "").strip()
 
     @staticmethod
-    def _rrf_fuse(rankings: List[List[str]], k: int = 60) -> List[str]:
-        """Funde múltiplas listas ordenadas via Reciprocal Rank Fusion.
+    def _payload_source(payload: Any) -> str:
+        """Arquivo de origem do chunk (``meta_data.source``) no payload JSON."""
+        try:
+            p = json.loads(payload) if isinstance(payload, str) else (payload or {})
+        except (TypeError, ValueError):
+            return ""
+        return str((p.get("meta_data") or {}).get("source", "") or "")
+
+    def _sources_for_chunks(self, chunks: List[str]) -> List[str]:
+        """Arquivos de origem dos chunks recuperados, na ordem de aparição.
+
+        Um mesmo texto pode estar em mais de um documento (cabeçalhos, trechos
+        repetidos): todos entram, para a invalidação do cache alcançar cada um.
+        """
+        chunk_sources = getattr(self, "_chunk_sources", None) or {}
+        sources: List[str] = []
+        for chunk in chunks:
+            for source in chunk_sources.get(chunk, ()):
+                if source not in sources:
+                    sources.append(source)
+        return sources
+
+    def _build_keyword_index(self, table) -> Optional[BM25Index]:
+        """Monta o índice BM25 a partir da tabela recipes (uma leitura completa).
+
+        Chamado ao fim da indexação/boot; as perguntas só consultam o índice
+        pronto, sem tocar no LanceDB.
+        """
+        try:
+            start = time.perf_counter()
+            data = table.to_arrow()
+            ids = data.column("id").to_pylist()
+            payloads = data.column("payload").to_pylist()
+            index = BM25Index(stop_words=self._PT_STOP_WORDS).build(
+                (str(chunk_id), self._payload_content(payload))
+                for chunk_id, payload in zip(ids, payloads)
+            )
+            self._keyword_index = index
+            chunk_sources: Dict[str, List[str]] = {}
+            for payload in payloads:
+                source = self._payload_source(payload)
+                if not source:
+                    continue
+                known = chunk_sources.setdefault(self._payload_content(payload), [])
+                if source not in known:
+                    known.append(source)
+            self._chunk_sources = chunk_sources
+            logger.info(
+                "🔎 Índice BM25 montado: %d chunks, %d termos (%.0f ms).",
+                len(index),
+                index.vocabulary_size,
+                (time.perf_counter() - start) * 1000,
+            )
+            return index
+        except Exception as e:
+            logger.warning("⚠️ Falha ao montar índice BM25: %s", e)
+            self._keyword_index = None
+            return None
+
+    def _refresh_keyword_index(self) -> Optional[BM25Index]:
+        """Remonta o índice BM25 a partir da tabela recipes atual."""
+        try:
+            table = self._get_table_pool().get("recipes")
+        except Exception as e:
+            logger.warning("⚠️ Tabela recipes indisponível para o índice BM25: %s", e)
+            self._keyword_index = None
+            return None
+        return self._build_keyword_index(table)
+
+    def _keyword_search(self, question: str, table=None, top_k: int = 5) -> List[str]:
+        """Ranking esparso (BM25) como complemento ao semântico.
+
+        Consulta o índice invertido em memória; ``table`` só é usada para montar
+        o índice sob demanda caso ele ainda não exista.
+        """
+        try:
+            index = getattr(self, "_keyword_index", None)
+            if index is None:
+                if table is None:
+                    return []
+                index = self._build_keyword_index(table)
+                if index is None:
+                    return []
+            expanded = self._expand_query(question)
+            results: List[str] = []
+            for chunk_id, _score in index.search(expanded, top_k=top_k):
+                content = index.get_content(chunk_id)
+                if content:
+                    results.append(content)
+            return results
+        except Exception:
+            return []
+
+    @staticmethod
+    def _rrf_fuse(rankings: List[List[str]], k: int = 60) -> List[str]:
+        """Funde múltiplas listas ordenadas via Reciprocal Rank Fusion.
 
         RRF(d) = Σ_r 1/(k + rank_r(d)). Combina rankings denso (semântico) e esparso
         (keyword) sem precisar calibrar scores: recompensa documentos bem posicionados
@@ -1323,38 +2245,129 @@ class ChatbotService:
                 scores[text] = scores.get(text, 0.0) + 1.0 / (k + rank + 1)
         return [t for t, _ in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)]
 
-    def _get_reranker(self):
+    def _get_reranker(self, allow_export: bool = False):
         """Carrega o cross-encoder de reranking sob demanda (singleton, fail-open).
 
         Retorna ``None`` se o reranker estiver desabilitado ou indisponível — nesse
         caso o pipeline mantém a ordenação da fusão RRF.
+
+        Com ``RERANKER_BACKEND=onnx``, a exportação/quantização (minutos de CPU)
+        só roda com ``allow_export`` — no aquecimento disparado no boot, nunca
+        na pergunta de um usuário. Enquanto o modelo exportado não existe, a
+        consulta usa o PyTorch sem fixar a escolha, e o aquecimento troca para
+        o ONNX ao terminar.
         """
         if getattr(self, "_reranker_loaded", False):
             return self._reranker
 
-        self._reranker_loaded = True
-        self._reranker = None
+        with ChatbotService._reranker_lock:
+            if getattr(self, "_reranker_loaded", False):
+                return self._reranker
 
-        if os.getenv("RERANKER_ENABLED", "true").strip().lower() in ("0", "false", "no"):
-            logger.info("ℹ️ Reranker desabilitado (RERANKER_ENABLED).")
-            return None
+            if os.getenv("RERANKER_ENABLED", "true").strip().lower() in ("0", "false", "no"):
+                logger.info("ℹ️ Reranker desabilitado (RERANKER_ENABLED).")
+                self._reranker = None
+                self._reranker_loaded = True
+                return None
 
-        model_name = os.getenv("RERANKER_MODEL", RERANKER_MODEL_DEFAULT)
-        try:
-            from sentence_transformers import CrossEncoder
-            logger.info("🔁 Carregando reranker cross-encoder: %s ...", model_name)
-            self._reranker = CrossEncoder(model_name)
-            logger.info("✅ Reranker carregado.")
-        except Exception as e:
-            logger.warning(
-                "⚠️ Reranker indisponível (%s). Mantendo ordenação por RRF.", e
-            )
-            self._reranker = None
-        return self._reranker
+            model_name = os.getenv("RERANKER_MODEL", RERANKER_MODEL_DEFAULT)
+            self._reranker_info = {"model": model_name, "backend": None, "threads": RERANKER_THREADS}
+
+            def load_torch_reranker():
+                if getattr(self, "_torch_reranker", None) is None:
+                    from sentence_transformers import CrossEncoder
+                    if RERANKER_THREADS > 0:
+                        import torch
+                        torch.set_num_threads(RERANKER_THREADS)
+                    logger.info("🔁 Carregando reranker cross-encoder: %s ...", model_name)
+                    self._torch_reranker = CrossEncoder(model_name)
+                return self._torch_reranker
+
+            final = True
+            if RERANKER_BACKEND == "onnx":
+                try:
+                    reranker, meta = load_onnx_reranker(
+                        model_name,
+                        Path(self.db_url).parent / RERANKER_ONNX_DIR_NAME,
+                        reference_factory=load_torch_reranker,
+                        threads=RERANKER_THREADS,
+                        export=allow_export,
+                    )
+                    if meta is None:
+                        # Sem exportação ainda: PyTorch provisório até o aquecimento.
+                        final = False
+                        if not getattr(self, "_reranker_export_pending_logged", False):
+                            self._reranker_export_pending_logged = True
+                            logger.warning(
+                                "⚠️ Reranker ONNX ainda não exportado (a exportação roda no "
+                                "aquecimento do boot). Usando PyTorch por enquanto."
+                            )
+                    else:
+                        self._reranker_info["parity"] = meta.get("parity")
+                        if reranker is not None:
+                            self._reranker = reranker
+                            self._reranker_info["backend"] = "onnx-int8"
+                            self._reranker_loaded = True
+                            logger.info("✅ Reranker ONNX int8 carregado.")
+                            return self._reranker
+                        logger.warning("⚠️ Reranker ONNX reprovado na paridade com o PyTorch. Usando PyTorch.")
+                except Exception as e:
+                    logger.warning("⚠️ Reranker ONNX indisponível (%s). Usando PyTorch.", e)
+
+            try:
+                self._reranker = load_torch_reranker()
+                self._reranker_info["backend"] = "torch"
+                logger.info("✅ Reranker carregado.")
+            except Exception as e:
+                logger.warning(
+                    "⚠️ Reranker indisponível (%s). Mantendo ordenação por RRF.", e
+                )
+                self._reranker = None
+            self._reranker_loaded = final
+            return self._reranker
+
+    def _get_rerank_score_cache(self) -> BoundedLRUCache:
+        cache = getattr(self, "_rerank_score_cache", None)
+        if cache is None:
+            cache = self._rerank_score_cache = BoundedLRUCache(RERANK_SCORE_CACHE_MAX_ENTRIES)
+        return cache
+
+    def _get_rerank_totals(self) -> Dict[str, int]:
+        totals = getattr(self, "_rerank_totals", None)
+        if totals is None:
+            totals = self._rerank_totals = {
+                "requests": 0, "candidates": 0, "pairs_scored": 0, "adaptive_shrunk": 0,
+            }
+        return totals
 
-    def _rerank(self, question: str, candidates: List[str], top_n: int) -> List[str]:
+    def _reranker_cache_id(self, reranker: Any) -> str:
+        """Modelo + backend: notas do ONNX int8 e do PyTorch não se misturam."""
+        info = getattr(self, "_reranker_info", None) or {}
+        if info.get("model"):
+            return f"{info.get('backend')}:{info['model']}"
+        return type(reranker).__name__
+
+    @staticmethod
+    def _rankings_agree(dense: List[str], sparse: List[str]) -> bool:
+        """True quando denso e esparso concordam nos primeiros resultados."""
+        if len(dense) < RERANK_AGREEMENT_TOP or len(sparse) < RERANK_AGREEMENT_TOP:
+            return False
+        overlap = set(dense[:RERANK_AGREEMENT_TOP]) & set(sparse[:RERANK_AGREEMENT_TOP])
+        return len(overlap) >= RERANK_AGREEMENT_MIN_OVERLAP
+
+    def _rerank(
+        self,
+        question: str,
+        candidates: List[str],
+        top_n: int,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
         """Reordena candidatos com o cross-encoder e devolve os ``top_n`` melhores.
 
+        Notas já calculadas para a mesma pergunta normalizada, trecho e modelo
+        vêm do cache LRU; só os pares restantes vão ao modelo. ``stats`` (se
+        informado) recebe quantos pares foram avaliados e quantos vieram do cache.
+
         Se o reranker não estiver disponível, devolve os candidatos na ordem recebida.
         """
         if not candidates:
@@ -1363,8 +2376,33 @@ class ChatbotService:
         if reranker is None:
             return candidates[:top_n]
         try:
-            pairs = [(question, c) for c in candidates]
-            scores = reranker.predict(pairs)
+            cache = self._get_rerank_score_cache()
+            question_key = self._normalize_question_for_key(question)
+            model_id = self._reranker_cache_id(reranker)
+            keys = [
+                (question_key, hashlib.sha1(c.encode("utf-8")).hexdigest(), model_id)
+                for c in candidates
+            ]
+            scores: List[Optional[float]] = [cache.get(key) for key in keys]
+            missing = [i for i, score in enumerate(scores) if score is None]
+            if missing:
+                fresh = reranker.predict([(question, candidates[i]) for i in missing])
+                for i, score in zip(missing, fresh):
+                    scores[i] = float(score)
+                    cache.put(keys[i], scores[i])
+
+            totals = self._get_rerank_totals()
+            totals["requests"] += 1
+            totals["candidates"] += len(candidates)
+            totals["pairs_scored"] += len(missing)
+            if stats is not None:
+                stats["candidates"] = len(candidates)
+                stats["pairs_scored"] = len(missing)
+                stats["cached"] = len(candidates) - len(missing)
+            logger.info(
+                "🔁 Reranking: %d candidatos, %d pares avaliados, %d do cache.",
+                len(candidates), len(missing), len(candidates) - len(missing),
+            )
             ranked = [
                 c for _, c in sorted(
                     zip(scores, candidates), key=lambda x: float(x[0]), reverse=True
@@ -1375,44 +2413,93 @@ class ChatbotService:
             logger.warning("⚠️ Falha no reranking (%s). Mantendo ordem RRF.", e)
             return candidates[:top_n]
 
-    def _retrieve_context(self, question: str, top_k: int = 10) -> List[str]:
+    def _dense_search(
+        self, question: str, limit: int = RETRIEVER_FANOUT
+    ) -> Optional[List[dict]]:
+        """Busca vetorial única na tabela recipes, compartilhada por gate de domínio
+        e recuperação de contexto.
+
+        Sem índice ANN a busca é exata (flat), então os primeiros resultados do
+        fan-out são os mesmos que uma busca top-5 devolveria: o score de domínio
+        calculado sobre eles não muda (com índice, ``refine_factor`` reordena os
+        candidatos pelo vetor completo e mantém o topo estável). Usa o embedding
+        da pergunta original; a expansão de siglas fica no ranking esparso
+        (BM25), onde os termos literais fazem diferença.
+
+        Retorna ``None`` em falha técnica (embedding/tabela/busca) e ``[]`` quando
+        a busca roda mas não encontra nada — o gate de domínio trata os dois casos
+        de forma diferente.
+        """
+        if not self._knowledge_loaded or self.vector_db is None or self.embedder is None:
+            return None
+
+        question_embedding = self._get_question_embedding(question)
+        if not question_embedding:
+            logger.warning("⚠️ Embedding não gerado para a busca vetorial.")
+            return None
+
+        try:
+            table = self._get_table_pool().get("recipes")
+        except Exception as e:
+            logger.error("❌ Tabela 'recipes' indisponível para a busca vetorial: %s", e)
+            return None
+
+        # Tenta cosine primeiro; tabelas hybrid podem não suportar override de métrica
+        for attempt, kwargs in enumerate([
+            {"metric": "cosine"},
+            {},  # fallback: métrica padrão da tabela
+        ]):
+            try:
+                search = self._vector_search(table, question_embedding)
+                if "metric" in kwargs:
+                    search = search.metric(kwargs["metric"])
+                results = search.limit(limit).to_list()
+                logger.debug(
+                    "Busca vetorial (tentativa %d, metric=%s) retornou %d resultados.",
+                    attempt + 1,
+                    kwargs.get("metric", "default"),
+                    len(results),
+                )
+                return results
+            except Exception as e:
+                logger.warning(
+                    "⚠️ Busca vetorial (tentativa %d, metric=%s) falhou: %s",
+                    attempt + 1,
+                    kwargs.get("metric", "default"),
+                    e,
+                )
+        return None
+
+    def _retrieve_context(
+        self,
+        question: str,
+        top_k: int = 10,
+        dense_results: Optional[List[dict]] = None,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
         """Recuperação híbrida: semântica + keyword fundidas por RRF e reordenadas
-        por cross-encoder (com expansão de siglas acadêmicas)."""
+        por cross-encoder (com expansão de siglas acadêmicas no ranking esparso).
+
+        ``dense_results`` reaproveita a busca vetorial já feita pelo gate de
+        domínio (ver ``_dense_search``); sem ele, a busca é feita aqui.
+        ``stats`` recebe o tamanho do pool e os pares avaliados pelo reranker.
+        """
         try:
             if not self._knowledge_loaded or self.vector_db is None:
                 return []
 
-            expanded_question = self._expand_query(question)
-            question_embedding = self._get_question_embedding(expanded_question)
-            if not question_embedding:
-                return []
-
-            import lancedb
-            db = lancedb.connect(self.db_url)
-            table = db.open_table("recipes")
-
             # Fan-out por recuperador (alimenta a fusão e o reranker)
             fanout = max(top_k, RETRIEVER_FANOUT)
 
             # Ranking denso (semântico)
-            semantic_results = []
-            for kwargs in [{"metric": "cosine"}, {}]:
-                try:
-                    search = table.search(question_embedding)
-                    if "metric" in kwargs:
-                        search = search.metric(kwargs["metric"])
-                    semantic_results = search.limit(fanout).to_list()
-                    break
-                except Exception:
-                    continue
+            semantic_results = dense_results
+            if semantic_results is None:
+                with rag_metrics.time("dense_search"):
+                    semantic_results = self._dense_search(question, limit=fanout) or []
 
             def _extract(r: dict) -> str:
-                content = r.get("content") or r.get("text") or ""
-                if not content:
-                    payload = r.get("payload")
-                    p = json.loads(payload) if isinstance(payload, str) else (payload or {})
-                    content = p.get("content", "")
-                return content.strip()
+                content = (r.get("content") or r.get("text") or "").strip()
+                return content or self._payload_content(r.get("payload"))
 
             semantic_ranking: List[str] = []
             seen: set = set()
@@ -1423,16 +2510,29 @@ class ChatbotService:
                     semantic_ranking.append(c)
 
             # Ranking esparso (keyword)
-            keyword_ranking = self._keyword_search(question, table, top_k=fanout)
+            with rag_metrics.time("keyword_search"):
+                keyword_ranking = self._keyword_search(
+                    question, self._get_table_pool().get_if_exists("recipes"), top_k=fanout
+                )
 
             # Fusão por Reciprocal Rank Fusion
-            fused = self._rrf_fuse([semantic_ranking, keyword_ranking])
+            with rag_metrics.time("rrf"):
+                fused = self._rrf_fuse([semantic_ranking, keyword_ranking])
             if not fused:
                 return []
 
             # Reordenação por cross-encoder; corta para o top-N final
-            candidates = fused[:RERANK_CANDIDATE_POOL]
-            return self._rerank(question, candidates, top_n=top_k)
+            pool = RERANK_CANDIDATE_POOL
+            if RERANK_ADAPTIVE_POOL and self._rankings_agree(semantic_ranking, keyword_ranking):
+                pool = max(top_k, min(pool, RERANK_ADAPTIVE_POOL_SIZE))
+            candidates = fused[:pool]
+            if pool < RERANK_CANDIDATE_POOL:
+                self._get_rerank_totals()["adaptive_shrunk"] += 1
+            if stats is not None:
+                stats["pool"] = len(candidates)
+                stats["adaptive"] = pool < RERANK_CANDIDATE_POOL
+            with rag_metrics.time("rerank"):
+                return self._rerank(question, candidates, top_n=top_k, stats=stats)
         except Exception as e:
             logger.warning("⚠️ Erro ao recuperar contexto: %s", e)
             return []
@@ -1461,38 +2561,69 @@ class ChatbotService:
         has_entity  = any(e in q_lower for e in _TEMPORAL_ENTITIES)
         return has_trigger and not has_entity
 
-    def _get_available_periods(self) -> List[str]:
-        """
-        Escaneia os documentos indexados e retorna os identificadores de período
-        letivo encontrados nos conteúdos (ex.: '2026.2', '2026.3').
+    def _save_available_periods(self, periods: Any) -> None:
+        """Guarda os períodos letivos indexados em memória e ao lado de documents_hash.json."""
+        self._available_periods = sorted(set(periods))
+        periods_file = Path(self.db_url).parent / AVAILABLE_PERIODS_FILE_NAME
+        try:
+            with open(periods_file, "w") as f:
+                json.dump({
+                    "periods": self._available_periods,
+                    "timestamp": datetime.utcnow().isoformat(),
+                }, f, indent=2)
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao salvar índice de períodos: {e}")
 
-        Usado pela detecção de ambiguidade temporal para montar a pergunta de
-        esclarecimento com os períodos reais disponíveis nos documentos.
-        """
-        import re
-        import lancedb
+    def _load_available_periods(self) -> List[str]:
+        """Carrega o índice de períodos do disco; sem ele (índice anterior a esse
+        arquivo), varre a tabela recipes uma única vez e grava o resultado."""
+        periods_file = Path(self.db_url).parent / AVAILABLE_PERIODS_FILE_NAME
+        try:
+            with open(periods_file, "r") as f:
+                self._available_periods = sorted(set(json.load(f).get("periods", [])))
+                return self._available_periods
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️  Índice de períodos ilegível ({e}). Recalculando...")
+
+        if self.vector_db is None:
+            return []
+        found = self._scan_available_periods()
+        if found is None:
+            return []
+        self._save_available_periods(found)
+        return self._available_periods
 
-        period_re = re.compile(r"\b(20\d{2}\.[1-4])\b")
+    def _scan_available_periods(self) -> Optional[set]:
+        """Varre a tabela recipes atrás de períodos letivos (None em erro)."""
         found: set = set()
         try:
-            if self.vector_db is None:
-                return []
-            db = lancedb.connect(self.db_url)
-            table = db.open_table("recipes")
-            df = table.to_pandas()
-            for row in df.itertuples():
-                payload = row.payload if hasattr(row, "payload") else None
-                if not payload:
-                    continue
-                p = json.loads(payload) if isinstance(payload, str) else payload
-                content = p.get("content", "")
-                for m in period_re.findall(content):
-                    found.add(m)
-        except Exception:
-            pass
-        return sorted(found)
+            table = self._get_table_pool().get("recipes")
+            for payload in table.to_arrow().column("payload").to_pylist():
+                found.update(_PERIOD_RE.findall(self._payload_content(payload)))
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao montar índice de períodos: {e}")
+            return None
+        return found
 
-    def _is_question_in_domain(self, question: str) -> tuple[bool, float]:
+    def _get_available_periods(self) -> List[str]:
+        """
+        Retorna os identificadores de período letivo encontrados nos documentos
+        indexados (ex.: '2026.2', '2026.3').
+
+        Usado pela detecção de ambiguidade temporal para montar a pergunta de
+        esclarecimento com os períodos reais disponíveis nos documentos. Os
+        períodos são extraídos durante a indexação e servidos da memória.
+        """
+        periods = getattr(self, "_available_periods", None)
+        if periods is None:
+            periods = self._load_available_periods()
+        return list(periods)
+
+    def _is_question_in_domain(
+        self, question: str, dense_results: Optional[List[dict]] = None
+    ) -> tuple[bool, float]:
         """
         Verifica se a pergunta é relevante para o domínio dos documentos carregados.
 
@@ -1502,6 +2633,9 @@ class ChatbotService:
 
         O score combinado precisa superar o limiar correspondente ao tipo de pergunta.
         Em caso de falha técnica, loga o erro explicitamente e permite a passagem.
+
+        ``dense_results`` é o fan-out de ``_dense_search`` já calculado pelo
+        ``ask_question`` — a mesma busca depois alimenta ``_retrieve_context``.
         """
         try:
             if not self._knowledge_loaded or self.vector_db is None or self.embedder is None:
@@ -1524,55 +2658,17 @@ class ChatbotService:
             )
 
             # --- Camada 2: busca vetorial -----------------------------------------
-            question_embedding = self._get_question_embedding(question)
-            if not question_embedding:
-                logger.warning("⚠️ Embedding não gerado. Verificação de domínio ignorada.")
-                return True, 1.0
-
-            import lancedb
-
-            try:
-                db = lancedb.connect(self.db_url)
-            except Exception as e:
-                logger.error("❌ Falha ao conectar no LanceDB para verificação de domínio: %s", e)
-                return True, 1.0
-
-            try:
-                table = db.open_table("recipes")
-            except Exception as e:
-                logger.error("❌ Tabela 'recipes' não encontrada para verificação de domínio: %s", e)
-                return True, 1.0
-
-            # Tenta cosine primeiro; tabelas hybrid podem não suportar override de métrica
-            results = None
-            for attempt, kwargs in enumerate([
-                {"metric": "cosine"},
-                {},  # fallback: métrica padrão da tabela
-            ]):
-                try:
-                    search = table.search(question_embedding)
-                    if "metric" in kwargs:
-                        search = search.metric(kwargs["metric"])
-                    results = search.limit(5).to_list()
-                    logger.debug(
-                        "Busca vetorial (tentativa %d, metric=%s) retornou %d resultados.",
-                        attempt + 1,
-                        kwargs.get("metric", "default"),
-                        len(results),
-                    )
-                    break
-                except Exception as e:
-                    logger.warning(
-                        "⚠️ Busca vetorial (tentativa %d, metric=%s) falhou: %s",
-                        attempt + 1,
-                        kwargs.get("metric", "default"),
-                        e,
-                    )
+            results = dense_results
+            if results is None:
+                results = self._dense_search(question, limit=5)
 
             if results is None:
-                logger.error("❌ Todas as tentativas de busca vetorial falharam. Pergunta permitida por padrão.")
+                logger.error("❌ Busca vetorial indisponível. Pergunta permitida por padrão.")
                 return True, 1.0
 
+            # O score usa só os primeiros resultados (melhor + média dos top-3);
+            # um fan-out maior vindo de ``_dense_search`` não altera o cálculo.
+            results = results[:5]
             if not results:
                 logger.info("❌ Nenhum chunk retornado. Pergunta considerada fora do domínio.")
                 return False, 0.0
@@ -1604,7 +2700,9 @@ class ChatbotService:
             logger.error("❌ Erro inesperado em _is_question_in_domain: %s", e, exc_info=True)
             return True, 1.0  # Fail-open: não bloquear o serviço por bug interno
 
-    def ask_question(self, question: str, session_id: str = None, stream: bool = False) -> Dict[str, Any]:
+    def ask_question(
+        self, question: str, session_id: str = None, stream: bool = False
+    ) -> Union[Dict[str, Any], Iterator[Dict[str, Any]]]:
         """
         Executa uma pergunta e retorna um payload estruturado para a interface.
         
@@ -1616,154 +2714,100 @@ class ChatbotService:
         Args:
             question: Pergunta do usuário
             session_id: ID da sessão do usuário (obrigatório para isolamento)
-            stream: Se True, habilita streaming (futuro suporte)
+            stream: Se True, devolve o gerador de eventos de ``ask_question_stream``
+                (tokens conforme chegam do modelo) em vez do payload final
             
         Returns:
             Dict com resposta, latência, fontes e metadados
         """
+        if stream:
+            return self.ask_question_stream(question, session_id=session_id)
+
         if not self._initialized:
             raise RuntimeError("Serviço não inicializado. Chame initialize() primeiro.")
 
-        normalized_question = (question or "").strip()
-        if not normalized_question:
-            return {
-                "success": False,
-                "error": "Pergunta vazia. Por favor, digite uma pergunta sobre o PPC.",
-            }
-
-        try:
-            logger.info("Pergunta recebida: %s (Session: %s)", normalized_question[:150], session_id)
-            start = time.perf_counter()
-            
-            # 1. Verificar cache semântico primeiro
-            cached_result = self._search_cache(normalized_question)
-            if cached_result:
-                latency = time.perf_counter() - start
-                self._last_question_at = datetime.utcnow()
-                self._last_latency = latency
-                self._total_questions += 1
+        start = time.perf_counter()
+        result = self._ask_question(question, session_id)
+        self._observe_question(result, start)
+        return result
 
-                # Repetição da pergunta conta pra frequência mesmo servindo do cache
-                # (sliding TTL — a entrada continua "viva" enquanto for repetida).
-                self._track_question_frequency(normalized_question, cached_result["answer"])
+    def _record_answer_latency(self, latency: float) -> None:
+        """Atualiza as métricas internas de perguntas respondidas."""
+        self._last_question_at = datetime.utcnow()
+        self._last_latency = latency
+        self._latency_sum = getattr(self, "_latency_sum", 0.0) + latency
+        self._total_questions += 1
 
-                return {
-                    "success": True,
-                    "answer": cached_result["answer"],
-                    "method": "cache",
-                    "latency": latency,
-                    "question": normalized_question,
-                    "cache_info": {
-                        "original_question": cached_result["original_question"],
-                        "similarity": cached_result["similarity"],
-                        "cached_at": cached_result["cached_at"],
-                        "status": cached_result.get("status"),
-                        "hit_count": cached_result.get("hit_count"),
-                    }
-                }
-            
-            # 2. Cache MISS - Verificar se a pergunta precisa de esclarecimento temporal
-            if self._needs_temporal_clarification(normalized_question):
-                logger.info(
-                    "🕐 Ambiguidade temporal detectada. Solicitando esclarecimento: '%s...'",
-                    normalized_question[:60],
-                )
-                # Descobre quais períodos estão disponíveis nos documentos indexados
-                available_periods = self._get_available_periods()
-                if available_periods:
-                    period_list = ", ".join(available_periods)
-                    clarification = (
-                        f"Para qual **período letivo** você deseja as informações?\n\n"
-                        f"Períodos disponíveis nos documentos: **{period_list}**\n\n"
-                        f"Por favor, especifique o período (ex.: *2026.2*) para que eu possa "
-                        f"te dar uma resposta precisa."
-                    )
-                else:
-                    clarification = (
-                        "Para qual **período letivo** você deseja as informações? "
-                        "(ex.: 2026.2, 2026.3 ou 2026.4)\n\n"
-                        "Especificar o período me ajuda a encontrar os prazos corretos."
-                    )
-                return {
-                    "success": True,
-                    "answer": clarification,
-                    "method": "clarification",
-                    "needs_clarification": True,
-                    "question": normalized_question,
-                }
+    @staticmethod
+    def _observe_question(result: Dict[str, Any], start: float) -> None:
+        """Latência ponta a ponta e contador por resultado (cache, agent, recusa...)."""
+        rag_metrics.observe("total", time.perf_counter() - start)
+        if result.get("success"):
+            outcome = result.get("method") or "answer"
+        else:
+            outcome = result.get("error") if result.get("error") in ("out_of_domain", "busy") else "error"
+        rag_metrics.count_question(outcome)
 
-            # 3. Verificar se a pergunta pertence ao domínio dos documentos
-            is_in_domain, domain_similarity = self._is_question_in_domain(normalized_question)
-            if not is_in_domain:
-                logger.info(
-                    "🚫 Pergunta fora do domínio (similaridade=%.2f%%). Recusada: '%s...'",
-                    domain_similarity * 100,
-                    normalized_question[:60],
-                )
-                return {
-                    "success": False,
-                    "error": "out_of_domain",
-                    "message": (
-                        "Desculpe, só consigo responder perguntas relacionadas aos documentos "
-                        "acadêmicos disponíveis, como o PPC, regulamentos, TCC, ACG e FAQ do "
-                        "curso de Sistemas de Informação. "
-                        "Sua pergunta não parece estar relacionada a esse conteúdo."
-                    ),
-                    "domain_similarity": domain_similarity,
-                    "question": normalized_question,
-                }
+    def _ask_question(self, question: str, session_id: Optional[str]) -> Dict[str, Any]:
+        normalized_question = (question or "").strip()
+        if not normalized_question:
+            return self._empty_question_result()
 
-            # 4. Dentro do domínio - RAG manual: busca chunks + injeção no prompt
-            context_chunks = self._retrieve_context(normalized_question)
-            context_text = "\n\n---\n\n".join(context_chunks) if context_chunks else ""
+        if not SINGLE_FLIGHT_ENABLED:
+            return self._answer_question(normalized_question, session_id)
 
-            if context_text:
-                augmented_prompt = (
-                    "Use EXCLUSIVAMENTE os trechos abaixo para responder. "
-                    "Se a informação não estiver nos trechos, diga claramente que não encontrou.\n\n"
-                    f"TRECHOS DOS DOCUMENTOS:\n{context_text}\n\n"
-                    f"PERGUNTA: {normalized_question}"
-                )
-            else:
-                augmented_prompt = (
-                    f"Responda com base nos documentos acadêmicos do curso de Sistemas de Informação da FASI/UFPA.\n"
-                    f"PERGUNTA: {normalized_question}"
-                )
+        start = time.perf_counter()
+        key = (
+            self._normalize_question_for_key(normalized_question),
+            self._get_current_documents_hash(),
+        )
+        result, shared = self._get_single_flight().do(
+            key, lambda: self._answer_question(normalized_question, session_id)
+        )
+        if not shared:
+            return result
+        return self._coalesced_result(normalized_question, result, start)
+
+    def _get_single_flight(self) -> SingleFlight:
+        flight = getattr(self, "_single_flight", None)
+        if flight is None:
+            with ChatbotService._init_lock:
+                flight = getattr(self, "_single_flight", None)
+                if flight is None:
+                    flight = self._single_flight = SingleFlight()
+        return flight
+
+    def _coalesced_result(
+        self, normalized_question: str, result: Dict[str, Any], start: float
+    ) -> Dict[str, Any]:
+        """Cópia da resposta de uma pergunta idêntica que estava em andamento."""
+        result = dict(result)
+        result["question"] = normalized_question
+        result["coalesced"] = True
+        if result.get("success") and result.get("method") in ("agent", "cache"):
+            latency = time.perf_counter() - start
+            result["latency"] = latency
+            self._record_answer_latency(latency)
+            # Cada aluno conta como uma repetição para a promoção a "trusted".
+            self._record_question_frequency(
+                normalized_question, result["answer"], sources=result.get("sources")
+            )
+        logger.info("🔗 Pergunta idêntica em andamento; resposta compartilhada: '%s...'", normalized_question[:60])
+        return result
 
-            response = None
-            model_used = "desconhecido"
+    def _answer_question(self, normalized_question: str, session_id: Optional[str]) -> Dict[str, Any]:
+        """Pipeline completo (cache → recuperação → LLM) de uma pergunta."""
+        try:
+            logger.info("Pergunta recebida: %s (Session: %s)", normalized_question[:150], session_id)
+            start = time.perf_counter()
 
-            # ── Tenta o modelo primário (sabiazinho) ──────────────────────────
-            if self.model is not None:
-                try:
-                    agent = self._get_agent(session_id)
-                    response = agent.run(augmented_prompt, stream=stream)
-                    model_used = MARITALK_MODEL
-                except Exception as primary_err:
-                    logger.warning(
-                        "⚠️  Modelo primário '%s' falhou: %s. Tentando fallback Gemini...",
-                        MARITALK_MODEL, primary_err,
-                    )
-                    response = None
+            prepared = self._prepare_question(normalized_question, start)
+            if prepared.get("result") is not None:
+                return prepared["result"]
 
-            # ── Fallback: Gemini ──────────────────────────────────────────────
-            if response is None and self.model_fallback is not None:
-                try:
-                    fallback_agent = self._get_fallback_agent(session_id)
-                    response = fallback_agent.run(augmented_prompt, stream=stream)
-                    model_used = GEMINI_MODEL
-                    logger.info("✅ Resposta obtida via fallback Gemini.")
-                except Exception as fallback_err:
-                    raise RuntimeError(
-                        f"Ambos os modelos falharam. "
-                        f"Primário ({MARITALK_MODEL}): ver log. "
-                        f"Fallback ({GEMINI_MODEL}): {fallback_err}"
-                    ) from fallback_err
-
-            if response is None:
-                raise RuntimeError("Nenhum modelo disponível para processar a pergunta.")
+            with self._get_llm_limiter().slot():
+                response, model_used = self._run_agents(prepared["prompt"], session_id)
 
-            latency = time.perf_counter() - start
             logger.info("Modelo utilizado: %s", model_used)
 
             # Extrair resposta de texto
@@ -1779,49 +2823,383 @@ class ChatbotService:
             if isinstance(answer_text, list):
                 answer_text = "\n".join(str(part) for part in answer_text if part)
 
-            answer_text = str(answer_text).strip()
-            if not answer_text:
-                raise ValueError("Resposta vazia gerada pelo modelo.")
+            result = self._finish_answer(
+                normalized_question, answer_text, prepared["context_chunks"], start
+            )
+            if prepared.get("rerank"):
+                result["rerank"] = prepared["rerank"]
+            return result
+
+        except AdmissionRejected as rejected:
+            return self._busy_result(normalized_question, rejected)
+        except Exception as exc:
+            logger.exception("Erro ao processar pergunta: %s", exc)
+            return {
+                "success": False,
+                "error": str(exc),
+            }
 
-            answer_text = self._post_process_answer(answer_text)
-            sources = []
+    def _run_agents(self, augmented_prompt: str, session_id: Optional[str]) -> tuple[Any, str]:
+        """Roda o prompt no modelo primário e, se ele falhar, no fallback."""
+        response = None
+        model_used = "desconhecido"
+
+        # ── Tenta o modelo primário (sabiazinho) ──────────────────────────
+        if self.model is not None:
+            try:
+                with rag_metrics.time("llm_primary"):
+                    agent = self._get_agent(session_id)
+                    response = agent.run(augmented_prompt)
+                model_used = MARITALK_MODEL
+            except Exception as primary_err:
+                logger.warning(
+                    "⚠️  Modelo primário '%s' falhou: %s. Tentando fallback Gemini...",
+                    MARITALK_MODEL, primary_err,
+                )
+                response = None
 
-            # Atualizar métricas internas
-            self._last_question_at = datetime.utcnow()
-            self._last_latency = latency
-            self._total_questions += 1
+        # ── Fallback: Gemini ──────────────────────────────────────────────
+        if response is None and self.model_fallback is not None:
+            try:
+                with rag_metrics.time("llm_fallback"):
+                    fallback_agent = self._get_fallback_agent(session_id)
+                    response = fallback_agent.run(augmented_prompt)
+                model_used = GEMINI_MODEL
+                logger.info("✅ Resposta obtida via fallback Gemini.")
+            except Exception as fallback_err:
+                raise RuntimeError(
+                    f"Ambos os modelos falharam. "
+                    f"Primário ({MARITALK_MODEL}): ver log. "
+                    f"Fallback ({GEMINI_MODEL}): {fallback_err}"
+                ) from fallback_err
+
+        if response is None:
+            raise RuntimeError("Nenhum modelo disponível para processar a pergunta.")
+        return response, model_used
+
+    def _get_llm_limiter(self) -> AdmissionLimiter:
+        """Limitador de gerações simultâneas no LLM (criado uma vez, sob trava)."""
+        limiter = getattr(self, "_llm_limiter", None)
+        if limiter is None:
+            with ChatbotService._init_lock:
+                limiter = getattr(self, "_llm_limiter", None)
+                if limiter is None:
+                    limiter = self._llm_limiter = AdmissionLimiter(
+                        max_in_flight=LLM_MAX_IN_FLIGHT,
+                        max_waiting=LLM_MAX_WAITING,
+                        wait_timeout=LLM_WAIT_TIMEOUT_S,
+                    )
+        return limiter
 
-            logger.info("Resposta gerada em %.2fs (processamento incluído)", latency)
+    @staticmethod
+    def _busy_result(normalized_question: str, rejected: AdmissionRejected) -> Dict[str, Any]:
+        logger.warning(
+            "🚦 Pergunta recusada pelo controle de admissão (%s): '%s...'",
+            rejected.reason, normalized_question[:60],
+        )
+        return {
+            "success": False,
+            "error": "busy",
+            "reason": rejected.reason,
+            "message": LLM_BUSY_MESSAGE,
+            "question": normalized_question,
+        }
 
-            # Cache semântico alimentado automaticamente por FREQUÊNCIA de repetição
-            # (não há rating do usuário no produto): toda pergunta respondida pelo
-            # modelo é registrada; ao atingir o limiar de repetições vira "trusted"
-            # e passa a ser servida do cache para perguntas similares.
-            self._track_question_frequency(normalized_question, answer_text)
+    def ask_question_stream(
+        self, question: str, session_id: str = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Versão em streaming de ``ask_question`` (ver ``_stream_question_events``)."""
+        start = time.perf_counter()
+        for event in self._stream_question_events(question, session_id):
+            if event["event"] in ("done", "error"):
+                self._observe_question(event["result"], start)
+            yield event
+
+    def _stream_question_events(
+        self, question: str, session_id: str = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Versão em streaming de ``ask_question``: gera eventos conforme o modelo
+        produz a resposta, para que o primeiro token chegue ao aluno sem esperar
+        a completion inteira.
+
+        Eventos:
+            ``{"event": "token", "content": "..."}`` — trecho de texto (cache,
+            esclarecimento e resposta do modelo);
+            ``{"event": "done", "result": {...}}`` — payload final, o mesmo de
+            ``ask_question`` (resposta completa pós-processada, fontes, latência,
+            ``time_to_first_token``);
+            ``{"event": "error", "result": {"success": False, ...}}``.
+
+        O fallback para o Gemini só acontece se o primário falhar ANTES do
+        primeiro token; depois disso o erro é repassado. O cache semântico
+        recebe o texto completo ao final, como no modo sem streaming.
+        """
+        if not self._initialized:
+            raise RuntimeError("Serviço não inicializado. Chame initialize() primeiro.")
 
+        normalized_question = (question or "").strip()
+        if not normalized_question:
+            yield {"event": "done", "result": self._empty_question_result()}
+            return
 
-            result = {
+        try:
+            logger.info("Pergunta recebida (stream): %s (Session: %s)", normalized_question[:150], session_id)
+            start = time.perf_counter()
+
+            prepared = self._prepare_question(normalized_question, start)
+            result = prepared.get("result")
+            if result is not None:
+                if result.get("success") and result.get("answer"):
+                    yield {"event": "token", "content": result["answer"]}
+                yield {"event": "done", "result": result}
+                return
+
+            agents = []
+            if self.model is not None:
+                agents.append((MARITALK_MODEL, "llm_primary", self._get_agent))
+            if self.model_fallback is not None:
+                agents.append((GEMINI_MODEL, "llm_fallback", self._get_fallback_agent))
+            if not agents:
+                raise RuntimeError("Nenhum modelo disponível para processar a pergunta.")
+
+            parts: List[str] = []
+            time_to_first_token: Optional[float] = None
+            model_used: Optional[str] = None
+            # A vaga é liberada quando o gerador termina ou é fechado pelo cliente.
+            with self._get_llm_limiter().slot():
+                for attempt, (model_name, stage, build_agent) in enumerate(agents):
+                    # Só o tempo gasto no modelo (criar o agente e puxar cada
+                    # evento) entra na etapa — não o tempo em que o gerador fica
+                    # suspenso no `yield` esperando o cliente SSE ler.
+                    llm_seconds = 0.0
+                    try:
+                        t0 = time.perf_counter()
+                        agent = build_agent(session_id)
+                        events = iter(agent.run(prepared["prompt"], stream=True))
+                        llm_seconds += time.perf_counter() - t0
+                        while True:
+                            t0 = time.perf_counter()
+                            try:
+                                event = next(events)
+                            except StopIteration:
+                                break
+                            finally:
+                                llm_seconds += time.perf_counter() - t0
+                            text = self._stream_event_text(event)
+                            if not text:
+                                continue
+                            if time_to_first_token is None:
+                                time_to_first_token = time.perf_counter() - start
+                                logger.info(
+                                    "⚡ Primeiro token em %.2fs (%s).", time_to_first_token, model_name
+                                )
+                            parts.append(text)
+                            yield {"event": "token", "content": text}
+                        model_used = model_name
+                        break
+                    except Exception as model_err:
+                        # Com tokens já enviados não dá para trocar de modelo no meio.
+                        if parts or attempt == len(agents) - 1:
+                            raise
+                        logger.warning(
+                            "⚠️  Modelo '%s' falhou antes do primeiro token: %s. Tentando fallback...",
+                            model_name, model_err,
+                        )
+                    finally:
+                        rag_metrics.observe(stage, llm_seconds)
+
+            logger.info("Modelo utilizado: %s", model_used)
+            result = self._finish_answer(
+                normalized_question, "".join(parts), prepared["context_chunks"], start
+            )
+            result["time_to_first_token"] = time_to_first_token
+            if prepared.get("rerank"):
+                result["rerank"] = prepared["rerank"]
+            yield {"event": "done", "result": result}
+
+        except AdmissionRejected as rejected:
+            yield {"event": "done", "result": self._busy_result(normalized_question, rejected)}
+        except Exception as exc:
+            logger.exception("Erro ao processar pergunta (stream): %s", exc)
+            yield {"event": "error", "result": {"success": False, "error": str(exc)}}
+
+    @staticmethod
+    def _stream_event_text(event: Any) -> str:
+        """Texto de um evento de ``Agent.run(stream=True)`` (só eventos de conteúdo)."""
+        if isinstance(event, str):
+            return event
+        event_name = getattr(event, "event", None)
+        if event_name is not None and event_name != "RunContent":
+            return ""
+        content = getattr(event, "content", None)
+        return content if isinstance(content, str) else ""
+
+    @staticmethod
+    def _empty_question_result() -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": "Pergunta vazia. Por favor, digite uma pergunta sobre o PPC.",
+        }
+
+    def _prepare_question(self, normalized_question: str, start: float) -> Dict[str, Any]:
+        """
+        Etapas anteriores ao modelo, comuns ao modo normal e ao streaming.
+
+        Retorna ``{"result": {...}}`` quando a pergunta já foi resolvida (cache,
+        esclarecimento temporal, fora do domínio) ou ``{"prompt": ...,
+        "context_chunks": [...]}`` para seguir ao LLM.
+        """
+        # 1. Verificar cache semântico primeiro
+        with rag_metrics.time("cache_lookup"):
+            cached_result = self._search_cache(normalized_question)
+        if cached_result:
+            latency = time.perf_counter() - start
+            self._record_answer_latency(latency)
+
+            # Repetição da pergunta conta pra frequência mesmo servindo do cache
+            # (sliding TTL — a entrada continua "viva" enquanto for repetida).
+            self._record_question_frequency(normalized_question, cached_result["answer"])
+
+            return {"result": {
                 "success": True,
-                "answer": answer_text,
-                "method": "agent",
+                "answer": cached_result["answer"],
+                "method": "cache",
                 "latency": latency,
                 "question": normalized_question,
-            }
-            
-            # Adicionar fontes se encontradas
-            if sources:
-                result["sources"] = sources
-                logger.info(f"Fontes utilizadas: {', '.join(sources)}")
-            
-            return result
+                "cache_info": {
+                    "original_question": cached_result["original_question"],
+                    "similarity": cached_result["similarity"],
+                    "cached_at": cached_result["cached_at"],
+                    "status": cached_result.get("status"),
+                    "hit_count": cached_result.get("hit_count"),
+                }
+            }}
 
-        except Exception as exc:
-            logger.exception("Erro ao processar pergunta: %s", exc)
-            return {
+        # 2. Cache MISS - Verificar se a pergunta precisa de esclarecimento temporal
+        with rag_metrics.time("temporal_check"):
+            needs_clarification = self._needs_temporal_clarification(normalized_question)
+        if needs_clarification:
+            logger.info(
+                "🕐 Ambiguidade temporal detectada. Solicitando esclarecimento: '%s...'",
+                normalized_question[:60],
+            )
+            # Descobre quais períodos estão disponíveis nos documentos indexados
+            available_periods = self._get_available_periods()
+            if available_periods:
+                period_list = ", ".join(available_periods)
+                clarification = (
+                    f"Para qual **período letivo** você deseja as informações?\n\n"
+                    f"Períodos disponíveis nos documentos: **{period_list}**\n\n"
+                    f"Por favor, especifique o período (ex.: *2026.2*) para que eu possa "
+                    f"te dar uma resposta precisa."
+                )
+            else:
+                clarification = (
+                    "Para qual **período letivo** você deseja as informações? "
+                    "(ex.: 2026.2, 2026.3 ou 2026.4)\n\n"
+                    "Especificar o período me ajuda a encontrar os prazos corretos."
+                )
+            return {"result": {
+                "success": True,
+                "answer": clarification,
+                "method": "clarification",
+                "needs_clarification": True,
+                "question": normalized_question,
+            }}
+
+        # 3. Verificar se a pergunta pertence ao domínio dos documentos.
+        #    Uma única busca vetorial (fan-out completo) serve ao gate de
+        #    domínio e ao ranking denso da recuperação.
+        with rag_metrics.time("dense_search"):
+            dense_results = self._dense_search(normalized_question, limit=RETRIEVER_FANOUT)
+        with rag_metrics.time("domain_gate"):
+            is_in_domain, domain_similarity = self._is_question_in_domain(
+                normalized_question, dense_results=dense_results
+            )
+        if not is_in_domain:
+            logger.info(
+                "🚫 Pergunta fora do domínio (similaridade=%.2f%%). Recusada: '%s...'",
+                domain_similarity * 100,
+                normalized_question[:60],
+            )
+            return {"result": {
                 "success": False,
-                "error": str(exc),
-            }
-    
+                "error": "out_of_domain",
+                "message": (
+                    "Desculpe, só consigo responder perguntas relacionadas aos documentos "
+                    "acadêmicos disponíveis, como o PPC, regulamentos, TCC, ACG e FAQ do "
+                    "curso de Sistemas de Informação. "
+                    "Sua pergunta não parece estar relacionada a esse conteúdo."
+                ),
+                "domain_similarity": domain_similarity,
+                "question": normalized_question,
+            }}
+
+        # 4. Dentro do domínio - RAG manual: busca chunks + injeção no prompt
+        rerank_stats: Dict[str, Any] = {}
+        context_chunks = self._retrieve_context(
+            normalized_question, dense_results=dense_results, stats=rerank_stats
+        )
+        context_text = "\n\n---\n\n".join(context_chunks) if context_chunks else ""
+
+        if context_text:
+            augmented_prompt = (
+                "Use EXCLUSIVAMENTE os trechos abaixo para responder. "
+                "Se a informação não estiver nos trechos, diga claramente que não encontrou.\n\n"
+                f"TRECHOS DOS DOCUMENTOS:\n{context_text}\n\n"
+                f"PERGUNTA: {normalized_question}"
+            )
+        else:
+            augmented_prompt = (
+                f"Responda com base nos documentos acadêmicos do curso de Sistemas de Informação da FASI/UFPA.\n"
+                f"PERGUNTA: {normalized_question}"
+            )
+        return {"prompt": augmented_prompt, "context_chunks": context_chunks, "rerank": rerank_stats}
+
+    def _finish_answer(
+        self,
+        normalized_question: str,
+        answer_text: Any,
+        context_chunks: List[str],
+        start: float,
+    ) -> Dict[str, Any]:
+        """Pós-processa a resposta do modelo, atualiza métricas e alimenta o cache."""
+        latency = time.perf_counter() - start
+
+        answer_text = str(answer_text).strip()
+        if not answer_text:
+            raise ValueError("Resposta vazia gerada pelo modelo.")
+
+        answer_text = self._post_process_answer(answer_text)
+        sources = self._sources_for_chunks(context_chunks)
+
+        # Atualizar métricas internas
+        self._record_answer_latency(latency)
+
+        logger.info("Resposta gerada em %.2fs (processamento incluído)", latency)
+
+        # Cache semântico alimentado automaticamente por FREQUÊNCIA de repetição
+        # (não há rating do usuário no produto): toda pergunta respondida pelo
+        # modelo é registrada; ao atingir o limiar de repetições vira "trusted"
+        # e passa a ser servida do cache para perguntas similares.
+        self._record_question_frequency(normalized_question, answer_text, sources=sources)
+
+        result = {
+            "success": True,
+            "answer": answer_text,
+            "method": "agent",
+            "latency": latency,
+            "question": normalized_question,
+        }
+
+        # Adicionar fontes se encontradas
+        if sources:
+            result["sources"] = sources
+            logger.info(f"Fontes utilizadas: {', '.join(sources)}")
+
+        return result
+
     def get_conversation_history(self, session_id: str = None, limit: int = 10) -> list:
         """
         Obtém histórico de conversas.
@@ -1906,10 +3284,9 @@ class ChatbotService:
         try:
             if self._cache_db is not None:
                 # Dropar e recriar a tabela
-                existing_tables = self._cache_db.table_names()
-                if SEMANTIC_CACHE_TABLE_NAME in existing_tables:
-                    self._cache_db.drop_table(SEMANTIC_CACHE_TABLE_NAME)
+                if self._get_table_pool().drop_table(SEMANTIC_CACHE_TABLE_NAME):
                     self._cache_table = None
+                    self._get_cache_mirror().clear()
                     logger.info("🗑️ Cache semântico limpo com sucesso.")
                     return True
             return False
@@ -1939,6 +3316,7 @@ class ChatbotService:
                     "trusted_entries": trusted_entries,
                     "candidate_entries": candidate_entries,
                     "similarity_threshold": SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+                    "mirror": self._get_cache_mirror().stats(),
                 }
             return {
                 "enabled": self._cache_db is not None,
@@ -1950,6 +3328,28 @@ class ChatbotService:
         except Exception:
             return {"enabled": False, "entries": 0, "trusted_entries": 0, "candidate_entries": 0}
 
+    def warm_up(self, question: str = "Qual a carga horária de ACC?") -> Dict[str, Any]:
+        """
+        Aquece o pipeline com uma consulta fictícia: embedding no Ollama, busca
+        vetorial, índice BM25 e carga do cross-encoder. Não chama o LLM nem
+        alimenta o cache semântico. Retorna o tempo de cada etapa (em segundos).
+        """
+        timings: Dict[str, Any] = {}
+        start = time.perf_counter()
+        self._get_question_embedding(question)
+        timings["embedding"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self._get_reranker(allow_export=True)
+        timings["reranker_load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunks = self._retrieve_context(question, top_k=3)
+        timings["retrieval"] = time.perf_counter() - start
+        timings["chunks"] = len(chunks)
+        logger.info("🔥 RAG aquecido: %s", {k: round(v, 3) if isinstance(v, float) else v for k, v in timings.items()})
+        return timings
+
     def get_status(self) -> Dict[str, Any]:
         """
         Obtém status do serviço.
@@ -1968,13 +3368,36 @@ class ChatbotService:
             "persist_history": self.persist_history,
             "sqlite_enabled": self.db is not None,
             "semantic_cache": cache_stats,
+            "frequency_queue": (
+                self._frequency_queue.stats()
+                if getattr(self, "_frequency_queue", None) is not None
+                else None
+            ),
+            "embedding_cache": self._get_embedding_cache().stats(),
+            "document_watcher": (
+                self._document_watcher.stats()
+                if getattr(self, "_document_watcher", None) is not None
+                else None
+            ),
+            "llm_admission": self._get_llm_limiter().stats(),
+            "single_flight": self._get_single_flight().stats(),
+            "reranker": getattr(self, "_reranker_info", None),
+            "rerank": {
+                **self._get_rerank_totals(),
+                "score_cache": self._get_rerank_score_cache().stats(),
+            },
+            "lancedb_handles": self._get_table_pool().stats() if hasattr(self, "db_url") else None,
             "max_results": self.knowledge.max_results if self.knowledge else None,
             "document_files": [f.name for f in self.document_files] if hasattr(self, "document_files") else [],
             "documents_exist": any(f.exists() for f in self.document_files) if hasattr(self, "document_files") else False,
             "total_questions": self._total_questions,
             "last_question_at": self._last_question_at.isoformat() if self._last_question_at else None,
             "last_latency": self._last_latency,
-            "avg_latency": self._last_latency / max(self._total_questions, 1) if self._last_latency else None,
+            "avg_latency": (
+                getattr(self, "_latency_sum", 0.0) / self._total_questions
+                if self._total_questions else None
+            ),
+            "stage_latency": rag_metrics.summary(),
         }
 
 
@@ -0,0 +1,226 @@
+"""Espelho em memória do cache semântico (matriz NumPy float32 + dicionário).
+
+O cache semântico tem poucas centenas/milhares de entradas, mas cada pergunta
+fazia até três consultas ao LanceDB: a busca de serving (``_search_cache``), a
+busca de paráfrase para a contagem de frequência e um ``to_pandas()`` completo
+para o match exato por ``question_key``. O espelho guarda os vetores
+normalizados numa matriz contígua (similaridade de cosseno = um produto
+matriz-vetor) e as entradas num dicionário indexado por
+``(question_key, documents_hash)``.
+
+O LanceDB continua sendo o armazenamento durável: o serviço grava primeiro na
+tabela e só então atualiza o espelho (write-through), e o espelho é recarregado
+da tabela no boot.
+
+``status``, ``documents_hash`` e ``expires_at`` ficam também em arrays NumPy
+paralelos às linhas da matriz, para que ``search`` aplique os filtros de
+elegibilidade ANTES de escolher os vizinhos (prefilter): candidatas mais
+próximas não empurram as entradas trusted elegíveis para fora do top-N.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+CacheKey = Tuple[str, str]
+
+
+def _epoch(value: Any) -> float:
+    """``expires_at`` ISO → segundos desde epoch (``-inf`` se ausente/inválido)."""
+    if not value or not isinstance(value, str):
+        return float("-inf")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return float("-inf")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class SemanticCacheMirror:
+    """Cópia em memória das entradas do cache, com busca vetorial exata."""
+
+    def __init__(self, initial_capacity: int = 64) -> None:
+        self._lock = threading.RLock()
+        self._initial_capacity = max(1, initial_capacity)
+        self._matrix: Optional[np.ndarray] = None
+        self._status = np.empty(0, dtype=object)
+        self._hashes = np.empty(0, dtype=object)
+        self._expires = np.empty(0, dtype=np.float64)
+        self._entries: List[Dict[str, Any]] = []
+        self._row_by_key: Dict[CacheKey, int] = {}
+        self.loaded = False
+        self.searches = 0
+
+    @staticmethod
+    def _key(entry: Dict[str, Any]) -> CacheKey:
+        return (str(entry.get("question_key", "")), str(entry.get("documents_hash", "")))
+
+    @staticmethod
+    def _unit(vector: Any) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def _ensure_capacity(self, dimension: int) -> None:
+        if self._matrix is None or self._matrix.shape[1] != dimension:
+            self._matrix = np.zeros((self._initial_capacity, dimension), dtype=np.float32)
+            self._status = np.empty(self._initial_capacity, dtype=object)
+            self._hashes = np.empty(self._initial_capacity, dtype=object)
+            self._expires = np.full(self._initial_capacity, float("-inf"))
+            return
+        if len(self._entries) < self._matrix.shape[0]:
+            return
+        size = self._matrix.shape[0]
+        grown = np.zeros((size * 2, dimension), dtype=np.float32)
+        grown[:size] = self._matrix
+        self._matrix = grown
+        self._status = np.concatenate([self._status, np.empty(size, dtype=object)])
+        self._hashes = np.concatenate([self._hashes, np.empty(size, dtype=object)])
+        self._expires = np.concatenate([self._expires, np.full(size, float("-inf"))])
+
+    def _set_attributes(self, row: int, entry: Dict[str, Any]) -> None:
+        self._status[row] = entry.get("status")
+        self._hashes[row] = entry.get("documents_hash", "")
+        self._expires[row] = _epoch(entry.get("expires_at"))
+
+    def load(self, entries: Iterable[Dict[str, Any]]) -> "SemanticCacheMirror":
+        """Substitui o conteúdo pelas entradas lidas da tabela."""
+        with self._lock:
+            self._matrix = None
+            self._entries = []
+            self._row_by_key = {}
+            for entry in entries:
+                self.upsert(entry)
+            self.loaded = True
+            return self
+
+    def clear(self) -> None:
+        self.load(())
+
+    def upsert(self, entry: Dict[str, Any]) -> None:
+        vector = self._unit(entry.get("vector", ()))
+        if vector.size == 0:
+            return
+        stored = dict(entry)
+        stored["vector"] = vector.tolist()
+        key = self._key(stored)
+        with self._lock:
+            row = self._row_by_key.get(key)
+            if row is None or self._matrix is None or self._matrix.shape[1] != vector.size:
+                if self._matrix is not None and self._matrix.shape[1] != vector.size:
+                    # Dimensão mudou (novo embedder): o conteúdo antigo é inútil.
+                    self._entries, self._row_by_key, self._matrix = [], {}, None
+                self._ensure_capacity(vector.size)
+                row = len(self._entries)
+                self._entries.append(stored)
+                self._row_by_key[key] = row
+            else:
+                self._entries[row] = stored
+            self._matrix[row] = vector
+            self._set_attributes(row, stored)
+
+    def remove(self, key: CacheKey) -> bool:
+        """Remove a entrada (troca com a última linha: O(1))."""
+        with self._lock:
+            row = self._row_by_key.pop(key, None)
+            if row is None:
+                return False
+            last = len(self._entries) - 1
+            if row != last:
+                moved = self._entries[last]
+                self._entries[row] = moved
+                self._matrix[row] = self._matrix[last]
+                self._set_attributes(row, moved)
+                self._row_by_key[self._key(moved)] = row
+            self._entries.pop()
+            return True
+
+    def retag(self, previous_hash: str, current_hash: str) -> int:
+        """Move as entradas de ``previous_hash`` para ``current_hash``.
+
+        Se a pergunta já tem entrada em ``current_hash``, a de ``previous_hash``
+        é removida (a chave não pode apontar para duas linhas).
+        """
+        with self._lock:
+            for entry in [e for e in self._entries if e.get("documents_hash") == previous_hash]:
+                if (str(entry.get("question_key", "")), current_hash) in self._row_by_key:
+                    self.remove(self._key(entry))
+            moved = 0
+            for row, entry in enumerate(self._entries):
+                if entry.get("documents_hash") != previous_hash:
+                    continue
+                self._row_by_key.pop(self._key(entry), None)
+                entry["documents_hash"] = current_hash
+                self._hashes[row] = current_hash
+                self._row_by_key[self._key(entry)] = row
+                moved += 1
+            return moved
+
+    def get(self, question_key: str, documents_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._row_by_key.get((question_key, documents_hash))
+            return dict(self._entries[row]) if row is not None else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._entries]
+
+    def search(
+        self,
+        vector: Any,
+        limit: int = 20,
+        status: Optional[str] = None,
+        documents_hash: Optional[str] = None,
+        valid_at: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Entradas mais próximas por cosseno, no formato de ``to_list()`` do
+        LanceDB (``_distance`` = 1 − similaridade).
+
+        ``status``/``documents_hash`` (igualdade) e ``valid_at`` (``expires_at``
+        posterior) filtram as linhas antes da escolha dos vizinhos.
+        """
+        query = self._unit(vector)
+        with self._lock:
+            self.searches += 1
+            n = len(self._entries)
+            if n == 0 or limit <= 0 or self._matrix is None or self._matrix.shape[1] != query.size:
+                return []
+            mask = np.ones(n, dtype=bool)
+            if status is not None:
+                mask &= self._status[:n] == status
+            if documents_hash is not None:
+                mask &= self._hashes[:n] == documents_hash
+            if valid_at is not None:
+                mask &= self._expires[:n] > valid_at.timestamp()
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return []
+            similarities = self._matrix[rows] @ query
+            k = min(limit, rows.size)
+            best = np.argpartition(-similarities, k - 1)[:k]
+            best = best[np.argsort(-similarities[best])]
+            similarities = dict(zip(rows[best].tolist(), similarities[best].tolist()))
+            top = list(similarities)
+            results = []
+            for row in top:
+                hit = dict(self._entries[row])
+                hit["_distance"] = float(1.0 - similarities[row])
+                results.append(hit)
+            return results
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "entries": len(self._entries),
+                "capacity": 0 if self._matrix is None else int(self._matrix.shape[0]),
+                "searches": self.searches,
+            }
@@ -0,0 +1,76 @@
+"""Coalescência de chamadas idênticas em andamento (single-flight).
+
+Na semana de matrícula dezenas de alunos mandam a mesma pergunta ("qual o
+prazo de matrícula 2026.2") em poucos segundos, antes de ela repetir o
+suficiente para virar "trusted" no cache semântico. Com ``SingleFlight.do``,
+a primeira chamada para uma chave executa a função (líder) e as que chegam
+enquanto ela roda só esperam e recebem o mesmo resultado — ou a mesma
+exceção. Assim que o líder termina, a chave é liberada: nada é guardado
+depois disso (o cache semântico continua responsável por isso).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Executa ``fn`` uma única vez por chave enquanto houver chamada ativa."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.shared = 0
+        self.peak_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Retorna ``(resultado, compartilhado)``; ``compartilhado`` é True para
+        quem recebeu o resultado de outra chamada."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+                self.peak_waiters = max(self.peak_waiters, call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "peak_waiters": self.peak_waiters,
+            }
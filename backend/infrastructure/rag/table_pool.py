@@ -0,0 +1,101 @@
+"""Conexão LanceDB e handles de tabela de longa duração para o serviço RAG.
+
+Antes, cada pergunta fazia ``lancedb.connect`` + ``open_table("recipes")`` em
+três pontos diferentes (gate de domínio, recuperação, períodos), relendo o
+manifest da tabela a cada vez. O pool mantém uma conexão e um handle por
+tabela; quem troca os dados por baixo (reindexação, drop do cache semântico)
+chama ``invalidate``/``register`` para que o próximo acesso veja a versão nova.
+
+Os contadores (conexões, aberturas, reaproveitamentos, refreshes) aparecem em
+``ChatbotService.get_status()``.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class LanceTablePool:
+    """Conexão única + cache de handles por nome de tabela, thread-safe."""
+
+    def __init__(self, uri: str) -> None:
+        self.uri = uri
+        self._lock = threading.RLock()
+        self._connection: Any = None
+        self._tables: Dict[str, Any] = {}
+        self.connects = 0
+        self.opens = 0
+        self.reuses = 0
+        self.refreshes = 0
+
+    def connection(self) -> Any:
+        with self._lock:
+            if self._connection is None:
+                import lancedb
+
+                self._connection = lancedb.connect(self.uri)
+                self.connects += 1
+            return self._connection
+
+    def table_names(self) -> List[str]:
+        db = self.connection()
+        if hasattr(db, "list_tables"):
+            listed = db.list_tables()
+            return list(getattr(listed, "tables", listed))
+        return list(db.table_names())
+
+    def get(self, name: str) -> Any:
+        """Devolve o handle da tabela, abrindo-o na primeira vez.
+
+        Propaga a exceção do LanceDB se a tabela não existir.
+        """
+        with self._lock:
+            table = self._tables.get(name)
+            if table is not None:
+                self.reuses += 1
+                return table
+            table = self.connection().open_table(name)
+            self._tables[name] = table
+            self.opens += 1
+            return table
+
+    def get_if_exists(self, name: str) -> Optional[Any]:
+        try:
+            return self.get(name)
+        except Exception:
+            return None
+
+    def register(self, name: str, table: Any) -> Any:
+        """Adota um handle recém-criado (``create_table``) como o handle corrente."""
+        with self._lock:
+            if name in self._tables:
+                self.refreshes += 1
+            self._tables[name] = table
+            return table
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Descarta o(s) handle(s); o próximo ``get`` reabre a versão atual."""
+        with self._lock:
+            names = [name] if name is not None else list(self._tables)
+            for table_name in names:
+                if self._tables.pop(table_name, None) is not None:
+                    self.refreshes += 1
+
+    def drop_table(self, name: str) -> bool:
+        with self._lock:
+            self.invalidate(name)
+            if name not in self.table_names():
+                return False
+            self.connection().drop_table(name)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uri": self.uri,
+                "open_tables": sorted(self._tables),
+                "connects": self.connects,
+                "opens": self.opens,
+                "reuses": self.reuses,
+                "refreshes": self.refreshes,
+            }
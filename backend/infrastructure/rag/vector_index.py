@@ -0,0 +1,151 @@
+"""Índices ANN (IVF-PQ / HNSW) das tabelas vetoriais do RAG.
+
+Sem índice, ``table.search(vetor)`` no LanceDB é uma varredura exata de todas
+as linhas: ótimo enquanto ``recipes`` e ``semantic_cache`` têm poucos milhares
+de linhas, mas a latência cresce linearmente com novos regulamentos e com o
+cache acumulado ao longo dos semestres. Aqui o índice só é criado quando a
+tabela passa de um limiar configurável (abaixo disso a busca exata é mais
+rápida e não perde recall) e, depois de criado, é otimizado quando a fração
+de linhas fora do índice cresce — linhas novas continuam sendo encontradas,
+mas por varredura exata.
+
+Na consulta, ``nprobes`` (partições IVF visitadas) e ``refine_factor``
+(candidatos extras reordenados com o vetor completo) equilibram recall e
+latência; sem índice, os dois são ignorados pelo LanceDB.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_INDEX_TYPES = ("IVF_PQ", "IVF_HNSW_SQ")
+
+
+def _num_sub_vectors(dimension: int) -> int:
+    """Maior divisor de ``dimension`` que não passa de dimension/16 (768 → 48)."""
+    target = max(1, dimension // 16)
+    for candidate in range(target, 0, -1):
+        if dimension % candidate == 0:
+            return candidate
+    return 1
+
+
+def _vector_dimension(table: Any, column: str) -> Optional[int]:
+    try:
+        field_type = table.schema.field(column).type
+        return int(field_type.list_size) if getattr(field_type, "list_size", -1) > 0 else None
+    except Exception:
+        return None
+
+
+def vector_index_info(table: Any, column: str = "vector") -> Optional[Dict[str, Any]]:
+    """Descreve o índice vetorial de ``column`` (None se não houver)."""
+    for index in table.list_indices():
+        if column not in list(getattr(index, "columns", [])):
+            continue
+        info: Dict[str, Any] = {"name": index.name, "index_type": str(index.index_type)}
+        try:
+            stats = table.index_stats(index.name)
+            info["num_indexed_rows"] = int(stats.num_indexed_rows)
+            info["num_unindexed_rows"] = int(stats.num_unindexed_rows)
+            info["distance_type"] = getattr(stats, "distance_type", None)
+        except Exception:
+            pass
+        return info
+    return None
+
+
+def ensure_vector_index(
+    table: Any,
+    *,
+    min_rows: int,
+    index_type: str = "IVF_PQ",
+    metric: str = "cosine",
+    column: str = "vector",
+    max_unindexed_ratio: float = 0.1,
+) -> Dict[str, Any]:
+    """
+    Cria o índice ANN quando a tabela passa de ``min_rows`` linhas; se ele já
+    existe e mais de ``max_unindexed_ratio`` das linhas está fora dele, chama
+    ``optimize()`` para incorporá-las.
+
+    Retorna o estado da tabela com ``action`` em ``disabled``,
+    ``below_threshold``, ``up_to_date``, ``created`` ou ``optimized``.
+    """
+    index_type = (index_type or "IVF_PQ").upper()
+    rows = int(table.count_rows())
+    state: Dict[str, Any] = {"rows": rows, "min_rows": min_rows, "index_type": index_type}
+
+    if min_rows <= 0 or index_type not in SUPPORTED_INDEX_TYPES:
+        state["action"] = "disabled"
+        state["index"] = vector_index_info(table, column)
+        return state
+
+    info = vector_index_info(table, column)
+    if info is None:
+        if rows < min_rows:
+            state["action"] = "below_threshold"
+            state["index"] = None
+            return state
+
+        kwargs: Dict[str, Any] = {
+            "metric": metric,
+            "vector_column_name": column,
+            "index_type": index_type,
+            "num_partitions": max(1, int(math.sqrt(rows))),
+            "replace": True,
+        }
+        dimension = _vector_dimension(table, column)
+        if index_type == "IVF_PQ" and dimension:
+            kwargs["num_sub_vectors"] = _num_sub_vectors(dimension)
+        table.create_index(**kwargs)
+        state["action"] = "created"
+        state["index"] = vector_index_info(table, column)
+        logger.info("🧭 Índice %s criado em %d linhas (%s).", index_type, rows, column)
+        return state
+
+    unindexed = int(info.get("num_unindexed_rows", 0) or 0)
+    if rows and unindexed / rows > max_unindexed_ratio:
+        table.optimize()
+        state["action"] = "optimized"
+        state["index"] = vector_index_info(table, column)
+        logger.info("🧭 Índice vetorial otimizado: %d linhas novas incorporadas.", unindexed)
+        return state
+
+    state["action"] = "up_to_date"
+    state["index"] = info
+    return state
+
+
+def tune_vector_query(query: Any, nprobes: int, refine_factor: int) -> Any:
+    """Aplica ``nprobes``/``refine_factor`` a uma busca vetorial do LanceDB."""
+    if nprobes > 0:
+        query = query.nprobes(nprobes)
+    if refine_factor > 0:
+        query = query.refine_factor(refine_factor)
+    return query
+
+
+def ensure_scalar_indexes(table: Any, indexes: Dict[str, str]) -> List[str]:
+    """
+    Cria os índices escalares ausentes (``{coluna: "BTREE" | "BITMAP"}``) e
+    retorna as colunas indexadas agora. São eles que tornam baratos os
+    filtros ``where`` aplicados antes da busca vetorial (prefilter).
+    """
+    indexed = {
+        column
+        for index in table.list_indices()
+        for column in list(getattr(index, "columns", []))
+    }
+    created = []
+    for column, index_type in indexes.items():
+        if column in indexed:
+            continue
+        table.create_scalar_index(column, index_type=index_type, replace=True)
+        created.append(column)
+    if created:
+        logger.info("🧭 Índices escalares criados: %s.", ", ".join(created))
+    return created
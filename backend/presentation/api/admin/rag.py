@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from backend.presentation.dependencies import get_admin_dependency
+
+router = APIRouter()
+
+
+def _initialized_service():
+    """Instância do serviço RAG já inicializada (não dispara a indexação)."""
+    from backend.infrastructure.rag.rag_ppc import ChatbotService
+    service = ChatbotService._instance
+    if service is None or not service._initialized:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Serviço RAG ainda não inicializado")
+    return service
+
+
+@router.get("/rag/vector-indexes")
+async def vector_indexes(_: str = Depends(get_admin_dependency)):
+    service = _initialized_service()
+    try:
+        return await asyncio.to_thread(service.get_vector_index_status)
+    except Exception as e:
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
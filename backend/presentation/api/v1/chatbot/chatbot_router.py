@@ -40,9 +40,10 @@ async def chatbot_message(req: ChatbotRequest) -> ChatbotResponse:
         from backend.infrastructure.chatbot.chatbot_service import (
             get_or_create_session,
             process_message,
+            save_session,
         )
 
-        session = get_or_create_session(req.session_id)
+        session = await asyncio.to_thread(get_or_create_session, req.session_id)
 
         # Primeira mensagem (sessão nova): ignorar o texto e enviar boas-vindas
         if req.session_id != session.session_id:
@@ -55,6 +56,7 @@ async def chatbot_message(req: ChatbotRequest) -> ChatbotResponse:
             )
 
         result = await asyncio.to_thread(process_message, session, req.message)
+        await asyncio.to_thread(save_session, session)
 
         return ChatbotResponse(
             session_id=session.session_id,
@@ -76,7 +78,7 @@ async def chatbot_start() -> ChatbotResponse:
     try:
         from backend.infrastructure.chatbot.chatbot_service import get_or_create_session
 
-        session = get_or_create_session(None)
+        session = await asyncio.to_thread(get_or_create_session, None)
         return ChatbotResponse(
             session_id=session.session_id,
             response=WELCOME_MESSAGE,
@@ -93,7 +95,16 @@ async def chatbot_start() -> ChatbotResponse:
 
 @router.get("/chatbot/health", summary="Status do chatbot")
 async def chatbot_health() -> dict:
-    return {"status": "ok", "service": "Diretor Virtual Chatbot"}
+    from backend.infrastructure.chatbot.session_store import get_session_store
+    from backend.infrastructure.chatwoot.webhook_dedup import get_seen_index
+    from backend.infrastructure.chatwoot.webhook_queue import get_webhook_queue
+    return {
+        "status": "ok",
+        "service": "Diretor Virtual Chatbot",
+        "sessions": get_session_store().stats(),
+        "webhook_queue": get_webhook_queue().stats(),
+        "webhook_dedup": get_seen_index().stats(),
+    }
 
 
 @router.get("/chatbot/chatwoot-check", summary="Diagnóstico da conexão com o Chatwoot")
@@ -106,7 +117,7 @@ async def chatwoot_check() -> dict:
     return check_connection()
 
 
-def _deliver(conversation_id: int, text: str, options: list[str] | None) -> None:
+async def _deliver(conversation_id: int, text: str, options: list[str] | None) -> None:
     """
     Entrega a resposta do bot na conversa do Chatwoot.
 
@@ -114,12 +125,18 @@ def _deliver(conversation_id: int, text: str, options: list[str] | None) -> None
     botões (evita a bolha extra só com "Escolha uma opção:"). Se o canal não
     aceitar botões — o WhatsApp varia conforme o provedor —, cai para texto puro,
     que continua legível porque a resposta já embute o menu numerado.
+
+    Usa o cliente HTTP assíncrono compartilhado (conexão reaproveitada), sem
+    ocupar uma thread do pool por mensagem.
     """
-    from backend.infrastructure.chatwoot.chatwoot_service import send_message, send_quick_replies
+    from backend.infrastructure.chatwoot.chatwoot_service import (
+        send_message_async,
+        send_quick_replies_async,
+    )
 
     if options:
         try:
-            send_quick_replies(conversation_id, options, content=text)
+            await send_quick_replies_async(conversation_id, options, content=text)
             return
         except Exception as exc:
             logger.warning(
@@ -127,7 +144,7 @@ def _deliver(conversation_id: int, text: str, options: list[str] | None) -> None
                 conversation_id, exc,
             )
 
-    send_message(conversation_id, text)
+    await send_message_async(conversation_id, text)
 
 
 def _webhook_autenticado(request: Request) -> bool:
@@ -168,6 +185,14 @@ async def chatwoot_webhook(request: Request) -> dict:
     O `token` é obrigatório para que o reconhecimento de contato por telefone
     seja ativado — ver `_webhook_autenticado`.
 
+    Reentregas do mesmo evento (mesmo id de mensagem) são descartadas antes de
+    qualquer trabalho — ver `webhook_dedup`.
+
+    Responde assim que o evento é validado e enfileirado (`queued` + `job_id`):
+    o fluxo do bot e a entrega da resposta rodam depois, na fila do webhook
+    (`webhook_queue`), em ordem por conversa — um LLM lento não segura a
+    requisição do Chatwoot.
+
     Sempre responde 200 (mesmo em erro interno) para não disparar retries
     agressivos do Chatwoot — falhas são apenas logadas.
     """
@@ -188,29 +213,103 @@ async def chatwoot_webhook(request: Request) -> dict:
 
     conversation = payload.get("conversation") or {}
     conversation_id = conversation.get("id") or payload.get("conversation_id")
-    content = (payload.get("content") or "").strip()
 
     if not conversation_id:
         return {"ok": False, "error": "conversation_id ausente no payload"}
 
+    chave = None
+    marcada = False
+    try:
+        from backend.config.settings import settings
+        from backend.infrastructure.chatwoot.webhook_dedup import get_seen_index, message_key
+        from backend.infrastructure.chatwoot.webhook_queue import QueueFull, get_webhook_queue
+
+        # Só roda o bot nos inboxes configurados (site + WhatsApp) — outros canais
+        # (ex.: e-mail) na mesma conta ficam de fora.
+        inbox_id = conversation.get("inbox_id") or payload.get("inbox", {}).get("id")
+        if inbox_id and inbox_id not in settings.chatwoot_bot_inbox_ids:
+            return {"ok": True, "skipped": f"inbox {inbox_id} não é um inbox do chatbot"}
+
+        # Reentrega do Chatwoot: já processada (ou na fila) — não roda de novo.
+        chave = message_key(payload)
+        if chave is not None:
+            vistas = get_seen_index()
+            nova = (
+                await asyncio.to_thread(vistas.check_and_mark, chave)
+                if vistas.backend is not None
+                else vistas.check_and_mark(chave)
+            )
+            if not nova:
+                logger.info("Webhook do Chatwoot: reentrega descartada (mensagem %s)", chave)
+                return {"ok": True, "skipped": "mensagem duplicada"}
+            marcada = True
+
+        conversation_id = int(conversation_id)
+        job = get_webhook_queue().submit(
+            conversation_id,
+            lambda: _processar_evento(payload, conversation_id, inbox_id, autenticado),
+        )
+        return {"ok": True, "queued": True, "job_id": job.job_id}
+    except QueueFull as exc:
+        logger.error("Webhook do Chatwoot: evento descartado (conversation_id=%s): %s", conversation_id, exc)
+        if marcada:
+            await _esquecer_mensagem(chave)
+        return {"ok": False, "error": "fila cheia"}
+    except Exception as exc:
+        logger.error("Erro no webhook do Chatwoot (conversation_id=%s): %s", conversation_id, exc, exc_info=True)
+        if marcada:
+            await _esquecer_mensagem(chave)
+        return {"ok": False, "error": str(exc)}
+
+
+async def _esquecer_mensagem(chave: str) -> None:
+    """
+    Desmarca uma mensagem que não chegou à fila: a reentrega do Chatwoot deve
+    ser aceita. Com backend compartilhado (banco) roda fora do event loop,
+    como o `check_and_mark`.
+    """
+    from backend.infrastructure.chatwoot.webhook_dedup import get_seen_index
+
+    vistas = get_seen_index()
+    if vistas.backend is not None:
+        await asyncio.to_thread(vistas.forget, chave)
+    else:
+        vistas.forget(chave)
+
+
+async def _processar_evento(payload: dict, conversation_id: int, inbox_id, autenticado: bool) -> dict:
+    """
+    Roda o fluxo do bot para um evento já validado e entrega a resposta.
+
+    Executado pela fila do webhook, um evento por vez por conversa. O dict
+    retornado é o resultado do job (o que antes voltava na resposta HTTP).
+
+    A fila ordena só dentro deste processo; com vários workers o bloqueio da
+    conversa no store de sessões garante o mesmo entre processos. A sessão é
+    gravada de volta no fim, qualquer que seja o caminho.
+    """
+    content = (payload.get("content") or "").strip()
+    session = None
+    bloqueada = False
     try:
         from backend.config.settings import settings
         from backend.infrastructure.chatbot.chatbot_service import (
             ChatState,
             get_or_create_session_by_conversation,
+            lock_conversation,
             process_message,
             reset_session_for_conversation,
             start_session,
         )
         from backend.infrastructure.chatwoot.chatwoot_payload import extrair_contato
 
-        # Só roda o bot nos inboxes configurados (site + WhatsApp) — outros canais
-        # (ex.: e-mail) na mesma conta ficam de fora.
-        inbox_id = conversation.get("inbox_id") or payload.get("inbox", {}).get("id")
-        if inbox_id and inbox_id not in settings.chatwoot_bot_inbox_ids:
-            return {"ok": True, "skipped": f"inbox {inbox_id} não é um inbox do chatbot"}
-
-        session, is_new = get_or_create_session_by_conversation(int(conversation_id))
+        bloqueada = await asyncio.to_thread(lock_conversation, conversation_id)
+        if not bloqueada:
+            logger.warning(
+                "Webhook do Chatwoot: bloqueio da conversa %s não obtido no prazo — seguindo sem ele",
+                conversation_id,
+            )
+        session, is_new = await asyncio.to_thread(get_or_create_session_by_conversation, conversation_id)
 
         # Identidade do canal (no WhatsApp, o telefone). Leitura pura de dict,
         # feita em toda mensagem porque nem todo payload traz os mesmos campos —
@@ -242,29 +341,42 @@ async def chatwoot_webhook(request: Request) -> dict:
         # significa um novo atendimento — recomeça em vez de ficar mudo até o TTL.
         # Passa pelo reconhecimento de novo, e o ticket gerado será outro.
         if session.state == ChatState.ENDED:
-            session = reset_session_for_conversation(int(conversation_id))
+            session = await asyncio.to_thread(reset_session_for_conversation, conversation_id)
             session.welcomed = True
             abertura = await asyncio.to_thread(start_session, session)
-            await asyncio.to_thread(
-                _deliver, int(conversation_id), abertura["response"], abertura.get("options"),
-            )
+            await _deliver(conversation_id, abertura["response"], abertura.get("options"))
             return {"ok": True, "action": "novo atendimento iniciado"}
 
         if is_new or not session.welcomed:
             session.welcomed = True
             abertura = await asyncio.to_thread(start_session, session)
-            await asyncio.to_thread(
-                _deliver, int(conversation_id), abertura["response"], abertura.get("options"),
-            )
+            await _deliver(conversation_id, abertura["response"], abertura.get("options"))
             return {"ok": True, "action": abertura["action"]}
 
         result = await asyncio.to_thread(process_message, session, content)
 
-        await asyncio.to_thread(
-            _deliver, int(conversation_id), result["response"], result.get("options"),
-        )
+        await _deliver(conversation_id, result["response"], result.get("options"))
 
         return {"ok": True, "state": result["state"].value if hasattr(result["state"], "value") else result["state"]}
     except Exception as exc:
         logger.error("Erro no webhook do Chatwoot (conversation_id=%s): %s", conversation_id, exc, exc_info=True)
         return {"ok": False, "error": str(exc)}
+    finally:
+        await _liberar_conversa(conversation_id, session, bloqueada)
+
+
+async def _liberar_conversa(conversation_id: int, session, bloqueada: bool) -> None:
+    """Grava a sessão de volta no store e solta o bloqueio da conversa."""
+    from backend.infrastructure.chatbot.chatbot_service import (
+        save_conversation_session,
+        unlock_conversation,
+    )
+
+    try:
+        if session is not None:
+            await asyncio.to_thread(save_conversation_session, conversation_id, session)
+    except Exception as exc:
+        logger.error("Falha ao gravar a sessão da conversa %s: %s", conversation_id, exc)
+    finally:
+        if bloqueada:
+            await asyncio.to_thread(unlock_conversation, conversation_id)
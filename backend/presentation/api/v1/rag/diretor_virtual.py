@@ -1,24 +1,68 @@
 from __future__ import annotations
 
 import asyncio
+import json
+from typing import Any, Dict, Iterator
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from backend.presentation.schemas.forms import ChatRequest, ChatResponse
 
 router = APIRouter()
 
 
+def _resposta(result: Dict[str, Any]) -> str:
+    if not result.get("success"):
+        return result.get("message") or result.get("error") or "Não foi possível responder."
+    return result["answer"]
+
+
 @router.post("/diretor-virtual/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
         from backend.infrastructure.rag.rag_ppc import get_service
         service = get_service()
         result = await asyncio.to_thread(service.ask_question, request.mensagem)
-        if not result.get("success"):
-            resposta = result.get("message") or result.get("error") or "Não foi possível responder."
-        else:
-            resposta = result["answer"]
-        return ChatResponse(resposta=resposta)
+        return ChatResponse(resposta=_resposta(result))
+    except Exception as e:
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Diretor Virtual indisponível: {e}")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_events(events: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """Converte os eventos de ``ask_question_stream`` em Server-Sent Events.
+
+    ``token`` traz cada trecho da resposta; ``done`` traz a resposta completa
+    (pós-processada) e as fontes, no formato do ``ChatResponse``.
+    """
+    try:
+        for item in events:
+            if item["event"] == "token":
+                yield _sse("token", {"content": item["content"]})
+                continue
+            result = item["result"]
+            yield _sse(item["event"], {
+                "resposta": _resposta(result),
+                "fontes": result.get("sources", []),
+            })
+    except Exception as e:
+        yield _sse("error", {"resposta": f"Diretor Virtual indisponível: {e}", "fontes": []})
+
+
+@router.post("/diretor-virtual/chat/stream")
+async def chat_stream(request: ChatRequest):
+    try:
+        from backend.infrastructure.rag.rag_ppc import get_service
+        service = await asyncio.to_thread(get_service)
     except Exception as e:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Diretor Virtual indisponível: {e}")
+    # Gerador síncrono: o Starlette o consome num threadpool, sem bloquear o loop.
+    return StreamingResponse(
+        _sse_events(service.ask_question_stream(request.mensagem, session_id=request.session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
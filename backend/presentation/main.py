@@ -7,7 +7,7 @@ from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from backend.config.settings import settings
 
@@ -32,8 +32,27 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Scheduler não iniciado: {e}")
 
+    if settings.rag_prewarm:
+        from backend.infrastructure.rag.prewarm import start_prewarm
+        start_prewarm()
+        logger.info("Pré-aquecimento do RAG iniciado em segundo plano.")
+    else:
+        from backend.infrastructure.rag.prewarm import start_reranker_export
+        if start_reranker_export():
+            logger.info("Exportação do reranker ONNX iniciada em segundo plano.")
+
+    from backend.infrastructure.chatbot.session_store import start_session_sweeper, stop_session_sweeper
+    from backend.infrastructure.chatwoot.chatwoot_service import close_clients, open_async_client
+    from backend.infrastructure.chatwoot.webhook_queue import get_webhook_queue
+    await open_async_client()
+    get_webhook_queue().start()
+    start_session_sweeper()
+
     yield
-    # Shutdown (sem ação necessária)
+    # Shutdown: termina os eventos do webhook em andamento antes de fechar o pool HTTP.
+    await stop_session_sweeper()
+    await get_webhook_queue().stop()
+    await close_clients()
 
 
 app = FastAPI(
@@ -77,6 +96,7 @@ from backend.presentation.api.v1.rag import diretor_virtual
 from backend.presentation.api.v1.ofertas import disciplinas
 from backend.presentation.api.v1 import config as config_router
 from backend.presentation.api.admin import alertas, lancamentos, periodos_submissao as periodos_admin, funcionarios as funcionarios_admin
+from backend.presentation.api.admin import rag as rag_admin
 from backend.presentation.api.v1.chatbot import chatbot_router
 
 # Formulários
@@ -111,6 +131,7 @@ app.include_router(alertas.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(lancamentos.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(periodos_admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(funcionarios_admin.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(rag_admin.router, prefix="/api/admin", tags=["Admin"])
 
 # Chatbot
 app.include_router(chatbot_router.router, prefix="/api/v1", tags=["Chatbot"])
@@ -124,7 +145,31 @@ async def root():
 
 @app.get("/health", tags=["health"])
 async def health():
-    return {"status": "ok", "version": "2.0.0"}
+    from backend.infrastructure.rag.prewarm import readiness
+    rag = readiness()
+    if rag["state"] in ("pending", "warming"):
+        # 503 mantém o healthcheck do container falhando até o RAG estar quente.
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "version": "2.0.0", "rag": rag},
+        )
+    status = "degraded" if rag["state"] == "failed" else "ok"
+    return {"status": status, "version": "2.0.0", "rag": rag}
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def metrics():
+    """Latência por etapa do pipeline RAG e fila do webhook do Chatwoot, no
+    formato texto do Prometheus."""
+    from backend.infrastructure.chatwoot.webhook_dedup import get_seen_index
+    from backend.infrastructure.chatwoot.webhook_queue import get_webhook_queue
+    from backend.infrastructure.rag.metrics import rag_metrics
+    return PlainTextResponse(
+        rag_metrics.render_prometheus()
+        + get_webhook_queue().render_prometheus()
+        + get_seen_index().render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 @app.exception_handler(RequestValidationError)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do RAG (Diretor Virtual).
+
+Indexa os documentos num diretório temporário com embedder e LLM locais
+determinísticos e mede, para um conjunto de perguntas em JSONL:
+- recall@k e MRR da recuperação (_retrieve_context);
+- latência por etapa do pipeline;
+- vazão de ask_question em cada nível de concorrência.
+
+Uso:
+    python scripts/benchmark_rag.py
+    python scripts/benchmark_rag.py --questions minhas_perguntas.jsonl --concurrency 1,4,8
+    python scripts/benchmark_rag.py --no-reranker --llm-latency-ms 800 --json-out resultado.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.rag_benchmark import (  # noqa: E402
+    build_service,
+    load_questions,
+    run_benchmark,
+)
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _fmt_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:8.1f}"
+
+
+def print_report(report: dict) -> None:
+    retrieval = report["retrieval"]
+    print("\n📊 Recuperação")
+    print(f"   Perguntas avaliadas: {retrieval['questions']}")
+    for k, value in retrieval["recall"].items():
+        print(f"   recall{k}: {value:.3f}" if value is not None else f"   recall{k}: -")
+    if retrieval["mrr"] is not None:
+        print(f"   MRR: {retrieval['mrr']:.3f}")
+        print(f"   Latência média da recuperação: {retrieval['avg_retrieval_ms']:.1f} ms")
+    misses = [q["id"] for q in retrieval["per_question"] if q["rank"] is None]
+    if misses:
+        print(f"   ❌ Sem trecho relevante: {', '.join(misses)}")
+
+    print("\n⏱️  Latência por etapa (recuperação) — p50 / p95 / p99 em ms")
+    for stage, s in report["retrieval_stages"].items():
+        print(f"   {stage:<18} {_fmt_ms(s['p50'])} {_fmt_ms(s['p95'])} {_fmt_ms(s['p99'])}  (n={s['count']})")
+
+    print("\n🚀 Vazão de ask_question")
+    for run in report["throughput"]:
+        print(
+            f"   concorrência {run['concurrency']:>3}: {run['throughput_qps']:.2f} perguntas/s, "
+            f"p50 {_fmt_ms(run['latency_p50_s']).strip()} ms, p95 {_fmt_ms(run['latency_p95_s']).strip()} ms, "
+            f"resultados {run['outcomes']}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline do RAG")
+    parser.add_argument(
+        "--questions", type=Path, default=PROJECT_ROOT / "scripts" / "rag_benchmark_questions.jsonl",
+        help="Arquivo JSONL com perguntas (campos question/expected)",
+    )
+    parser.add_argument("--field", default="question", help="Campo do JSONL com o texto da pergunta")
+    parser.add_argument(
+        "--documents", type=Path, default=PROJECT_ROOT / "resources",
+        help="Pasta com os documentos Markdown a indexar",
+    )
+    parser.add_argument("--k", type=_int_list, default=[1, 3, 5, 10], help="Valores de k (ex.: 1,3,5,10)")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="Níveis de concorrência (ex.: 1,4,8)")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições do conjunto em cada nível")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Latência simulada do LLM stub")
+    parser.add_argument("--no-reranker", action="store_true", help="Desliga o cross-encoder (ordem RRF)")
+    parser.add_argument("--ollama", action="store_true", help="Usa o embedder Ollama real em vez do de hashing")
+    parser.add_argument(
+        "--domain-gate", action="store_true",
+        help="Mantém o gate de domínio com o embedder de hashing (sempre ativo com --ollama)",
+    )
+    parser.add_argument("--json-out", type=Path, help="Grava o relatório completo em JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    documents = sorted(p for p in args.documents.glob("*.md"))
+    if not documents:
+        print(f"❌ Nenhum documento Markdown em {args.documents}")
+        return 1
+    questions = load_questions(args.questions, field=args.field)
+    if not questions:
+        print(f"❌ Nenhuma pergunta com o campo '{args.field}' em {args.questions}")
+        return 1
+
+    embedder = None
+    if args.ollama:
+        import os
+        from agno.knowledge.embedder.ollama import OllamaEmbedder
+        embedder = OllamaEmbedder(
+            id="nomic-embed-text", dimensions=768, host=os.getenv("OLLAMA_HOST", "http://localhost:11434")
+        )
+
+    print(f"📄 {len(documents)} documentos, ❓ {len(questions)} perguntas")
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as work_dir:
+        service = build_service(
+            documents,
+            Path(work_dir),
+            embedder=embedder,
+            llm_latency_s=args.llm_latency_ms / 1000,
+            reranker=not args.no_reranker,
+            domain_gate=args.ollama or args.domain_gate,
+        )
+        report = run_benchmark(
+            service, questions, ks=args.k, concurrency_levels=args.concurrency, repeat=args.repeat
+        )
+
+    print_report(report)
+    if args.json_out:
+        args.json_out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Relatório gravado em {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
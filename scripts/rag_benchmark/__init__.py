@@ -0,0 +1,20 @@
+"""Harness do benchmark offline do RAG (ver ``harness.py``)."""
+from scripts.rag_benchmark.harness import (
+    HashingEmbedder,
+    StubAgent,
+    build_service,
+    evaluate_retrieval,
+    load_questions,
+    measure_throughput,
+    run_benchmark,
+)
+
+__all__ = [
+    "HashingEmbedder",
+    "StubAgent",
+    "build_service",
+    "evaluate_retrieval",
+    "load_questions",
+    "measure_throughput",
+    "run_benchmark",
+]
@@ -0,0 +1,261 @@
+"""Benchmark offline do RAG: qualidade da recuperação, latência e vazão.
+
+Monta um ``ChatbotService`` isolado (fora do singleton) sobre os documentos
+informados, num diretório LanceDB temporário, com um embedder determinístico
+local (``HashingEmbedder``, sem Ollama) e um LLM stub (``StubAgent``, sem
+rede). Sobre um conjunto de perguntas em JSONL mede:
+
+- recall@k e MRR de ``_retrieve_context`` — uma pergunta acerta quando algum
+  trecho recuperado contém um dos textos de ``expected``;
+- latência por etapa (``rag_metrics``) e vazão de ``ask_question`` com
+  concorrência configurável (como o ``asyncio.to_thread`` do FastAPI).
+
+Os números absolutos com o embedder de hashing não são os de produção; o
+objetivo é comparar mudanças de chunking, fan-out e reranking na mesma base.
+Formato de cada linha do JSONL::
+
+    {"id": "q01", "question": "Qual a carga horária do estágio?", "expected": ["320 horas"]}
+
+Fica em ``scripts/`` (e não em ``backend/``) porque traz os dublês de teste
+(embedder e LLM) e monta o serviço fora do singleton — nada disso deve ir
+para a imagem de produção.
+
+Uso: ``python scripts/benchmark_rag.py --help``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.infrastructure.rag.metrics import rag_metrics
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+class HashingEmbedder:
+    """Embedder determinístico: unigramas e bigramas por feature hashing."""
+
+    id = "hashing-embedder"
+
+    def __init__(self, dimensions: int = 768) -> None:
+        self.dimensions = dimensions
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimensions, (1.0 if value >> 63 else -1.0)
+
+    def get_embedding(self, text: str) -> List[float]:
+        tokens = _TOKEN_RE.findall(_normalize_text(text))
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm > 0 else vector).tolist()
+
+
+class StubAgent:
+    """LLM local determinístico: responde com o primeiro trecho do prompt."""
+
+    def __init__(self, latency_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+
+    def run(self, prompt: str, stream: bool = False) -> Any:
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        body = prompt.split("TRECHOS DOS DOCUMENTOS:", 1)[-1]
+        answer = body.split("---", 1)[0].strip()[:400] or "Não encontrei a informação."
+        return SimpleNamespace(content=answer)
+
+
+def load_questions(path: Path, field: str = "question") -> List[Dict[str, Any]]:
+    """Lê o JSONL; linhas sem ``field`` são ignoradas."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get(field):
+                continue
+            questions.append({
+                "id": item.get("id") or item.get("request_id") or f"q{number:03d}",
+                "question": item[field],
+                "expected": list(item.get("expected") or []),
+            })
+    return questions
+
+
+def build_service(
+    documents: Sequence[Path],
+    work_dir: Path,
+    embedder: Any = None,
+    llm_latency_s: float = 0.0,
+    reranker: bool = True,
+    domain_gate: bool = True,
+) -> ChatbotService:
+    """Indexa ``documents`` em ``work_dir`` e devolve um serviço pronto.
+
+    ``domain_gate=False`` aceita toda pergunta como do domínio: os limiares do
+    gate são calibrados para o nomic-embed-text e recusariam quase tudo com o
+    embedder de hashing, medindo a vazão sem passar pelo LLM.
+    """
+    svc = object.__new__(ChatbotService)
+    svc._initialized = True
+    svc._initialized_at = datetime.utcnow()
+    svc._last_question_at = None
+    svc._last_latency = None
+    svc._latency_sum = 0.0
+    svc._total_questions = 0
+    svc.persist_history = False
+    svc.db = None
+    svc.knowledge = None
+    svc.model = object()
+    svc.model_fallback = None
+    svc.embedder = embedder or HashingEmbedder()
+    svc.db_url = str(Path(work_dir) / "lancedb")
+    svc.document_files = [Path(d) for d in documents]
+    Path(svc.db_url).mkdir(parents=True, exist_ok=True)
+
+    svc._index_documents_fine_grained(svc.document_files)
+    svc._save_documents_hash(svc.document_files, Path(work_dir))
+    svc.vector_db = svc._get_table_pool().get("recipes")
+    svc._knowledge_loaded = True
+    svc._keyword_index = None
+    svc._refresh_keyword_index()
+    svc._setup_semantic_cache()
+    if not reranker:
+        svc._reranker_loaded = True
+        svc._reranker = None
+    if not domain_gate:
+        svc._is_question_in_domain = lambda question, dense_results=None: (True, 1.0)
+
+    agent = StubAgent(llm_latency_s)
+    svc._get_agent = lambda session_id: agent
+    return svc
+
+
+def _first_relevant_rank(chunks: Iterable[str], expected: Sequence[str]) -> Optional[int]:
+    targets = [_normalize_text(e) for e in expected if e]
+    for rank, chunk in enumerate(chunks, start=1):
+        text = _normalize_text(chunk)
+        if any(t in text for t in targets):
+            return rank
+    return None
+
+
+def evaluate_retrieval(
+    service: ChatbotService,
+    questions: Sequence[Dict[str, Any]],
+    ks: Sequence[int] = (1, 3, 5, 10),
+) -> Dict[str, Any]:
+    """recall@k e MRR de ``_retrieve_context`` (só perguntas com ``expected``)."""
+    judged = [q for q in questions if q["expected"]]
+    depth = max(ks)
+    ranks: List[Optional[int]] = []
+    per_question = []
+    start = time.perf_counter()
+    for q in judged:
+        chunks = service._retrieve_context(q["question"], top_k=depth)
+        rank = _first_relevant_rank(chunks, q["expected"])
+        ranks.append(rank)
+        per_question.append({"id": q["id"], "rank": rank, "retrieved": len(chunks)})
+    elapsed = time.perf_counter() - start
+
+    total = len(judged)
+    return {
+        "questions": total,
+        "recall": {
+            f"@{k}": (sum(1 for r in ranks if r is not None and r <= k) / total) if total else None
+            for k in ks
+        },
+        "mrr": (sum(1.0 / r for r in ranks if r) / total) if total else None,
+        "avg_retrieval_ms": (elapsed / total * 1000) if total else None,
+        "per_question": per_question,
+    }
+
+
+def measure_throughput(
+    service: ChatbotService,
+    questions: Sequence[Dict[str, Any]],
+    concurrency: int = 1,
+    repeat: int = 1,
+) -> Dict[str, Any]:
+    """Roda ``ask_question`` para todas as perguntas com ``concurrency`` threads."""
+    batch = [q["question"] for q in questions] * max(1, repeat)
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+
+    def run(index_question):
+        index, question = index_question
+        t0 = time.perf_counter()
+        result = service.ask_question(question, session_id=f"bench-{index}")
+        return time.perf_counter() - t0, result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for latency, result in executor.map(run, enumerate(batch)):
+            latencies.append(latency)
+            outcome = result.get("method") if result.get("success") else result.get("error", "error")
+            outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+    wall = time.perf_counter() - start
+
+    values = np.asarray(latencies) if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "concurrency": concurrency,
+        "requests": len(batch),
+        "wall_s": wall,
+        "throughput_qps": len(batch) / wall if wall > 0 else None,
+        "latency_p50_s": float(p50),
+        "latency_p95_s": float(p95),
+        "latency_p99_s": float(p99),
+        "outcomes": outcomes,
+    }
+
+
+def run_benchmark(
+    service: ChatbotService,
+    questions: Sequence[Dict[str, Any]],
+    ks: Sequence[int] = (1, 3, 5, 10),
+    concurrency_levels: Sequence[int] = (1, 4),
+    repeat: int = 1,
+) -> Dict[str, Any]:
+    """Recuperação + vazão em cada nível de concorrência, com latência por etapa."""
+    rag_metrics.reset()
+    retrieval = evaluate_retrieval(service, questions, ks)
+    retrieval_stages = rag_metrics.summary()
+
+    throughput = []
+    for level in concurrency_levels:
+        service.clear_semantic_cache()
+        rag_metrics.reset()
+        report = measure_throughput(service, questions, concurrency=level, repeat=repeat)
+        report["stages"] = rag_metrics.summary()
+        throughput.append(report)
+    service.flush_question_frequency()
+
+    return {
+        "retrieval": retrieval,
+        "retrieval_stages": retrieval_stages,
+        "throughput": throughput,
+    }
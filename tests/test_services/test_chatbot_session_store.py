@@ -0,0 +1,156 @@
+"""Testes do store de sessões do chatbot (memória e banco compartilhado)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.infrastructure.chatbot import chatbot_service as cs
+from backend.infrastructure.chatbot import session_store
+from backend.infrastructure.chatbot.chatbot_service import ChatSession, ChatState
+from backend.infrastructure.chatbot.session_store import DatabaseSessionStore, MemorySessionStore
+from backend.infrastructure.database import repository as repo
+from backend.infrastructure.database.models import ChatbotSessao
+
+
+def test_dumps_is_compact_and_roundtrips():
+    sess = ChatSession(session_id="s1", state=ChatState.MENU, matricula="202312345678")
+    sess.recognized = {"matricula": "1", "nome": "Vitor B", "email": "v@x.br", "telefone": "+5591"}
+
+    data = json.loads(sess.dumps())
+
+    assert "email" not in data and "welcomed" not in data, "campos no padrão ficam de fora"
+    assert data["state"] == "menu"
+    assert data["recognized"] == {"matricula": "1", "nome": "Vitor B", "email": "v@x.br"}
+    volta = ChatSession.loads(sess.dumps())
+    assert volta.state is ChatState.MENU
+    assert volta.matricula == "202312345678"
+    assert volta.last_activity == sess.last_activity
+
+
+def test_memory_lock_is_per_key():
+    store = MemorySessionStore()
+
+    assert store.acquire("conversa", 1, timeout=0)
+    assert not store.acquire("conversa", 1, timeout=0)
+    assert store.acquire("conversa", 2, timeout=0)
+    store.release("conversa", 1)
+    assert store.acquire("conversa", 1, timeout=0)
+
+
+def _sessao(session_id: str, idade_s: float) -> ChatSession:
+    sess = ChatSession(session_id=session_id)
+    sess.last_activity = time.time() - idade_s
+    return sess
+
+
+def test_chat_session_has_no_instance_dict():
+    assert not hasattr(ChatSession(session_id="s"), "__dict__")
+
+
+def test_memory_purge_removes_only_due_sessions():
+    store = MemorySessionStore()
+    store.put("conversa", 1, _sessao("velha", cs.SESSION_TTL_SECONDS + 5))
+    store.put("conversa", 2, _sessao("nova", 0))
+    regravada = _sessao("regravada", cs.SESSION_TTL_SECONDS + 5)
+    store.put("web", "r", regravada)
+    regravada.touch()
+    store.put("web", "r", regravada)  # prazo novo: a entrada antiga do heap fica obsoleta
+
+    assert store.purge_expired() == 1
+    assert store.get("conversa", 1) is None
+    assert store.get("conversa", 2) is not None
+    assert store.get("web", "r") is regravada
+    assert store.stats()["expired"] == 1
+
+
+def test_memory_purge_reschedules_session_touched_without_put():
+    store = MemorySessionStore()
+    sess = _sessao("s", cs.SESSION_TTL_SECONDS + 5)
+    store.put("web", "s", sess)
+    sess.touch()
+
+    assert store.purge_expired() == 0
+    assert store.get("web", "s") is sess
+    assert store.stats()["expiry_heap"] == 1, "reagendada pelo prazo novo"
+
+
+def test_background_sweeper_evicts_expired_sessions(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    monkeypatch.setattr(session_store, "_sweeper", None)
+    store.put("conversa", 1, _sessao("velha", cs.SESSION_TTL_SECONDS + 5))
+
+    async def scenario():
+        session_store.start_session_sweeper(interval=0.01)
+        for _ in range(100):
+            if not len(store):
+                break
+            await asyncio.sleep(0.01)
+        await session_store.stop_session_sweeper()
+
+    asyncio.run(scenario())
+    assert len(store) == 0
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine, tables=[ChatbotSessao.__table__])
+    monkeypatch.setattr(repo, "get_db_session", lambda: Session(engine))
+    monkeypatch.setattr(repo, "_chatbot_sessoes_schema_ready", True)
+    return engine
+
+
+def test_database_store_survives_restart_and_shares_state(banco, monkeypatch):
+    monkeypatch.setattr(session_store, "_store", DatabaseSessionStore())
+    sess, novo = cs.get_or_create_session_by_conversation(9001)
+    assert novo
+    sess.state = ChatState.ASKING_QUESTION
+    sess.ticket_id = "TKT-1"
+    cs.save_conversation_session(9001, sess)
+
+    # Outro worker (ou o mesmo depois de um restart): nada em memória.
+    monkeypatch.setattr(session_store, "_store", DatabaseSessionStore())
+    outra, criada = cs.get_or_create_session_by_conversation(9001)
+
+    assert not criada
+    assert outra.session_id == sess.session_id
+    assert outra.state is ChatState.ASKING_QUESTION
+    assert outra.ticket_id == "TKT-1"
+
+
+def test_database_store_expires_by_ttl(banco):
+    store = DatabaseSessionStore()
+    sess = ChatSession(session_id="velha")
+    sess.last_activity = time.time() - cs.SESSION_TTL_SECONDS - 1
+    store.put("web", "velha", sess)
+
+    assert store.get("web", "velha") is None
+    assert repo.purgar_sessoes_chatbot_expiradas() == 1
+
+
+def test_database_lock_is_exclusive_across_workers(banco):
+    worker_a, worker_b = DatabaseSessionStore(), DatabaseSessionStore()
+
+    assert worker_a.acquire("conversa", 7, timeout=0)
+    assert not worker_b.acquire("conversa", 7, timeout=0)
+    worker_a.put("conversa", 7, ChatSession(session_id="s7"))
+    assert not worker_b.acquire("conversa", 7, timeout=0), "gravar a sessão não solta o bloqueio"
+
+    worker_a.release("conversa", 7)
+    assert worker_b.acquire("conversa", 7, timeout=0)
+    assert worker_b.get("conversa", 7).session_id == "s7"
+
+
+def test_database_lock_lease_expires(banco):
+    morto = DatabaseSessionStore(lock_lease_s=-1)  # lease já vencido: processo que caiu
+    assert morto.acquire("conversa", 8, timeout=0)
+
+    assert DatabaseSessionStore().acquire("conversa", 8, timeout=0)
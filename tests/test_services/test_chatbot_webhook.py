@@ -13,7 +13,9 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from backend.infrastructure.chatbot import chatbot_service as cs
+from backend.infrastructure.chatbot import session_store
 from backend.infrastructure.chatwoot import chatwoot_service as cw
+from backend.infrastructure.chatwoot import webhook_dedup, webhook_queue
 from backend.presentation.api.v1.chatbot.chatbot_router import router
 
 from tests.test_services.test_chatbot_flow import (
@@ -33,27 +35,50 @@ INBOX_ID = 5  # chatwoot_inbox_id_chatweb (default das settings)
 
 @pytest.fixture
 def client(monkeypatch):
+    # Fila nova por teste; o `with` mantém um único event loop vivo entre as
+    # requisições, onde rodam os workers da fila.
+    monkeypatch.setattr(webhook_queue, "_queue", None)
+    monkeypatch.setattr(webhook_dedup, "_index", None)
     app = FastAPI()
     app.include_router(router, prefix="/api/v1")
-    return TestClient(app)
+    with TestClient(app) as c:
+        yield c
+
+
+def _resultado(client: TestClient, resp) -> dict:
+    """Resposta do webhook ou, se o evento foi enfileirado, o resultado do job."""
+    assert resp.status_code == 200
+    body = resp.json()
+    if body.get("queued"):
+        return client.portal.call(webhook_queue.get_webhook_queue().result, body["job_id"])
+    return body
 
 
 @pytest.fixture
 def outbox(monkeypatch) -> list[dict]:
-    """Captura tudo que o bot enviaria ao Chatwoot."""
+    """Captura tudo que o bot enviaria ao Chatwoot.
+
+    O webhook entrega pelas variantes assíncronas; a escalação (que roda no
+    fluxo síncrono do chatbot) usa as síncronas — as duas caem aqui.
+    """
     sent: list[dict] = []
-    monkeypatch.setattr(
-        cw, "send_message",
-        lambda conv, content, private=False: sent.append(
-            {"kind": "note" if private else "text", "conv": conv, "content": content}
-        ),
-    )
-    monkeypatch.setattr(
-        cw, "send_quick_replies",
-        lambda conv, options, content="Escolha uma opção:": sent.append(
-            {"kind": "select", "conv": conv, "content": content, "options": options}
-        ),
-    )
+
+    def send_message(conv, content, private=False):
+        sent.append({"kind": "note" if private else "text", "conv": conv, "content": content})
+
+    def send_quick_replies(conv, options, content="Escolha uma opção:"):
+        sent.append({"kind": "select", "conv": conv, "content": content, "options": options})
+
+    async def send_message_async(conv, content, private=False):
+        send_message(conv, content, private=private)
+
+    async def send_quick_replies_async(conv, options, content="Escolha uma opção:"):
+        cw.send_quick_replies(conv, options, content=content)
+
+    monkeypatch.setattr(cw, "send_message", send_message)
+    monkeypatch.setattr(cw, "send_quick_replies", send_quick_replies)
+    monkeypatch.setattr(cw, "send_message_async", send_message_async)
+    monkeypatch.setattr(cw, "send_quick_replies_async", send_quick_replies_async)
     monkeypatch.setattr(cw, "assign_team", lambda conv, team: sent.append(
         {"kind": "assign", "conv": conv, "team": team}
     ))
@@ -62,8 +87,7 @@ def outbox(monkeypatch) -> list[dict]:
 
 @pytest.fixture(autouse=True)
 def _isolated_sessions(monkeypatch):
-    monkeypatch.setattr(cs, "_sessions_by_conversation", {})
-    monkeypatch.setattr(cs, "_sessions", {})
+    monkeypatch.setattr(session_store, "_store", session_store.MemorySessionStore())
 
 
 @pytest.fixture
@@ -83,8 +107,7 @@ def _say(client: TestClient, text: str, *, inbox_id: int = INBOX_ID) -> dict:
             "conversation": {"id": CONVERSATION_ID, "inbox_id": inbox_id},
         },
     )
-    assert resp.status_code == 200
-    return resp.json()
+    return _resultado(client, resp)
 
 
 def _last(outbox: list[dict]) -> dict:
@@ -175,6 +198,75 @@ def test_fallback_para_texto_puro_quando_canal_nao_aceita_botoes(client, outbox,
     assert "1️⃣  Fazer uma pergunta" in entregue["content"], "menu numerado sobrevive em texto"
 
 
+def test_webhook_confirma_antes_de_processar(client, outbox, rag):
+    """O Chatwoot recebe o 200 com o job enfileirado; a resposta do bot vem depois."""
+    resp = client.post(
+        "/api/v1/chatbot/webhook/chatwoot",
+        json={
+            "event": "message_created",
+            "message_type": "incoming",
+            "content": "oi",
+            "conversation": {"id": CONVERSATION_ID, "inbox_id": INBOX_ID},
+        },
+    )
+
+    assert resp.json()["queued"] is True
+    assert _resultado(client, resp)["action"] == "boas-vindas enviadas"
+    assert "matrícula" in _last(outbox)["content"]
+    assert webhook_queue.get_webhook_queue().stats()["completed"] == 1
+
+
+def test_reentrega_da_mesma_mensagem_nao_e_processada_de_novo(client, outbox, rag):
+    """Retry do Chatwoot (mesmo id de mensagem) não roda o fluxo nem responde duas vezes."""
+    payload = {
+        "id": 123,
+        "account": {"id": 1},
+        "event": "message_created",
+        "message_type": "incoming",
+        "content": "oi",
+        "conversation": {"id": CONVERSATION_ID, "inbox_id": INBOX_ID},
+    }
+
+    primeira = client.post("/api/v1/chatbot/webhook/chatwoot", json=payload)
+    assert _resultado(client, primeira)["action"] == "boas-vindas enviadas"
+    enviados = len(outbox)
+
+    reentrega = client.post("/api/v1/chatbot/webhook/chatwoot", json=payload)
+    assert reentrega.json() == {"ok": True, "skipped": "mensagem duplicada"}
+    assert len(outbox) == enviados
+    assert webhook_queue.get_webhook_queue().stats()["submitted"] == 1
+    assert webhook_dedup.get_seen_index().stats()["duplicates"] == 1
+
+
+@pytest.mark.parametrize("falha", [webhook_queue.QueueFull("fila cheia"), RuntimeError("erro inesperado")])
+def test_mensagem_nao_enfileirada_aceita_a_reentrega(client, outbox, rag, monkeypatch, falha):
+    """Se o evento não chegou à fila, a reentrega do Chatwoot não é tratada como duplicada."""
+    payload = {
+        "id": 124,
+        "account": {"id": 1},
+        "event": "message_created",
+        "message_type": "incoming",
+        "content": "oi",
+        "conversation": {"id": CONVERSATION_ID, "inbox_id": INBOX_ID},
+    }
+    fila = webhook_queue.get_webhook_queue()
+    submit = fila.submit
+    falhas = [falha]
+
+    def submit_instavel(key, fn):
+        if falhas:
+            raise falhas.pop()
+        return submit(key, fn)
+
+    monkeypatch.setattr(fila, "submit", submit_instavel)
+
+    primeira = client.post("/api/v1/chatbot/webhook/chatwoot", json=payload)
+    assert primeira.json()["ok"] is False
+
+    reentrega = client.post("/api/v1/chatbot/webhook/chatwoot", json=payload)
+    assert _resultado(client, reentrega)["action"] == "boas-vindas enviadas"
+
+
 # ── Guardas do webhook ────────────────────────────────────────────────────────
 
 def test_ignora_eventos_e_canais_fora_do_escopo(client, outbox, rag):
@@ -237,8 +329,7 @@ def _say_whatsapp(client: TestClient, text: str, *, telefone: str = "+5591991744
             "sender": {"id": 42, "name": "Vitor", "phone_number": telefone},
         },
     )
-    assert resp.status_code == 200
-    return resp.json()
+    return _resultado(client, resp)
 
 
 # ── Primeiro contato: ensina o diretório ──────────────────────────────────────
@@ -371,7 +462,7 @@ def test_widget_do_site_nao_reconhece_mesmo_com_telefone_forjado(client, outbox,
         },
     )
     assert resp.status_code == 200
-    assert resp.json()["action"] == "boas-vindas enviadas"
+    assert _resultado(client, resp)["action"] == "boas-vindas enviadas"
 
     entregue = _last(outbox)
     assert "Vitor" not in entregue["content"]
@@ -417,8 +508,7 @@ def _say_whatsapp_autenticado(client: TestClient, text: str, *, token: str | Non
             "sender": {"id": 42, "name": "Vitor", "phone_number": "+5591991744186"},
         },
     )
-    assert resp.status_code == 200
-    return resp.json()
+    return _resultado(client, resp)
 
 
 def test_webhook_autenticado_reconhece(client, outbox, rag, diretorio):
@@ -441,7 +531,7 @@ def test_token_pode_vir_no_header(client, outbox, rag, diretorio):
             "sender": {"id": 42, "phone_number": "+5591991744186"},
         },
     )
-    assert resp.json()["action"] == "reconhecimento oferecido"
+    assert _resultado(client, resp)["action"] == "reconhecimento oferecido"
 
 
 @pytest.mark.parametrize("token", [None, "", "token-errado", "segredo-do-webhook-12"])
@@ -497,7 +587,7 @@ def test_url_exata_configurada_no_chatwoot(client, outbox, rag, diretorio):
         },
     )
     assert resp.status_code == 200
-    assert resp.json()["ok"] is True
+    assert _resultado(client, resp)["ok"] is True
 
 
 @pytest.mark.parametrize(
@@ -522,7 +612,7 @@ def test_token_hostil_nao_derruba_o_webhook(client, outbox, rag, diretorio, toke
         },
     )
     assert resp.status_code == 200, "token hostil não pode virar 500"
-    assert resp.json()["action"] == "boas-vindas enviadas"  # e não reconhece
+    assert _resultado(client, resp)["action"] == "boas-vindas enviadas"  # e não reconhece
 
 
 def test_token_com_caractere_nao_ascii_configurado_nao_quebra(
@@ -543,4 +633,4 @@ def test_token_com_caractere_nao_ascii_configurado_nao_quebra(
         },
     )
     assert resp.status_code == 200
-    assert resp.json()["action"] == "reconhecimento oferecido"
+    assert _resultado(client, resp)["action"] == "reconhecimento oferecido"
@@ -0,0 +1,57 @@
+"""Testes do pool HTTP compartilhado da integração com o Chatwoot."""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend.config.settings import settings
+from backend.infrastructure.chatwoot import chatwoot_service as cw
+
+
+@pytest.fixture
+def requests_seen(monkeypatch) -> list[httpx.Request]:
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"id": 1})
+
+    options = cw._client_options
+
+    def _mock_options() -> dict:
+        return {**options(), "transport": httpx.MockTransport(handler)}
+
+    monkeypatch.setattr(cw, "_client_options", _mock_options)
+    monkeypatch.setattr(settings, "chatwoot_api_url", "https://chat.exemplo.br/")
+    monkeypatch.setattr(settings, "chatwoot_api_token", "tkn")
+    asyncio.run(cw.close_clients())
+    yield seen
+    asyncio.run(cw.close_clients())
+
+
+def test_sync_calls_share_one_pooled_client(requests_seen):
+    cw.send_message(10, "olá")
+    client = cw.get_client()
+    cw.send_quick_replies(10, ["A", "B"], content="Menu")
+
+    assert cw.get_client() is client
+    assert [r.url.path for r in requests_seen] == ["/api/v1/accounts/1/conversations/10/messages"] * 2
+    assert requests_seen[0].headers["api_access_token"] == "tkn"
+
+
+def test_async_variants_reuse_the_lifespan_client(requests_seen):
+    async def scenario():
+        opened = await cw.open_async_client()
+        await cw.send_message_async(11, "oi", private=True)
+        await cw.send_quick_replies_async(11, ["1"], content="Escolha")
+        reused = cw.get_async_client() is opened
+        await cw.close_clients()
+        return reused, opened.is_closed
+
+    reused, closed = asyncio.run(scenario())
+
+    assert reused and closed
+    assert [r.url.path.rsplit("/", 1)[-1] for r in requests_seen] == ["messages", "messages"]
+    assert b'"private":true' in requests_seen[0].content.replace(b" ", b"")
@@ -0,0 +1,118 @@
+"""Testes da deduplicação de reentregas do webhook do Chatwoot."""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.infrastructure.chatwoot.webhook_dedup import (
+    DatabaseSeenBackend,
+    SeenMessageIndex,
+    message_key,
+)
+from backend.infrastructure.database import repository as repo
+from backend.infrastructure.database.models import ChatbotWebhookMensagem
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_message_key_uses_account_and_message_id():
+    assert message_key({"id": 42, "account": {"id": 3}}) == "3:42"
+    assert message_key({"id": 42}) == ":42"
+    assert message_key({"content": "sem id"}) is None
+
+
+def test_duplicate_within_ttl_and_accepted_after_expiry():
+    clock = FakeClock()
+    index = SeenMessageIndex(max_entries=10, ttl_s=60, clock=clock)
+
+    assert index.check_and_mark("1:1") is True
+    assert index.check_and_mark("1:1") is False
+    clock.now += 61
+    assert index.check_and_mark("1:1") is True
+    assert index.stats()["duplicates"] == 1
+
+
+def test_oldest_entries_are_evicted_beyond_max_entries():
+    index = SeenMessageIndex(max_entries=2, ttl_s=60, clock=FakeClock())
+
+    for key in ("a", "b", "c"):
+        assert index.check_and_mark(key) is True
+
+    assert len(index) == 2
+    assert index.stats()["evicted"] == 1
+    assert index.check_and_mark("a") is True, "a mais antiga saiu do índice"
+    assert index.check_and_mark("c") is False
+
+
+def test_forget_allows_redelivery():
+    index = SeenMessageIndex(max_entries=10, ttl_s=60, clock=FakeClock())
+    index.check_and_mark("k")
+    index.forget("k")
+    assert index.check_and_mark("k") is True
+
+
+class SharedBackend:
+    """Backend que já viu ``seen`` (como outra réplica teria registrado)."""
+
+    def __init__(self, seen=(), fail=False) -> None:
+        self.seen = set(seen)
+        self.fail = fail
+
+    def claim(self, key, ttl_s):
+        if self.fail:
+            raise RuntimeError("banco fora")
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    def forget(self, key):
+        self.seen.discard(key)
+
+
+def test_backend_detects_redelivery_seen_by_another_replica():
+    index = SeenMessageIndex(backend=SharedBackend(seen={"1:9"}), clock=FakeClock())
+
+    assert index.check_and_mark("1:9") is False
+    assert index.check_and_mark("1:10") is True
+    assert index.stats()["duplicates"] == 1
+
+
+def test_backend_failure_fails_open():
+    index = SeenMessageIndex(backend=SharedBackend(fail=True), clock=FakeClock())
+
+    assert index.check_and_mark("1:9") is True
+    assert index.check_and_mark("1:9") is False, "a memória local ainda deduplica"
+    assert index.stats()["backend_errors"] == 1
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine, tables=[ChatbotWebhookMensagem.__table__])
+    monkeypatch.setattr(repo, "get_db_session", lambda: Session(engine))
+    monkeypatch.setattr(repo, "_chatbot_webhook_schema_ready", True)
+    return engine
+
+
+def test_database_backend_claims_once_until_expiry(banco, monkeypatch):
+    backend = DatabaseSeenBackend()
+
+    assert backend.claim("1:1", ttl_s=60) is True
+    assert backend.claim("1:1", ttl_s=60) is False
+
+    backend.forget("1:1")
+    assert backend.claim("1:1", ttl_s=60) is True
+
+    assert backend.claim("1:2", ttl_s=-1) is True
+    assert repo.purgar_mensagens_webhook_expiradas() == 1
+    assert backend.claim("1:2", ttl_s=60) is True
@@ -0,0 +1,77 @@
+"""Testes da fila do webhook do Chatwoot (FIFO por conversa, limite e métricas)."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from backend.infrastructure.chatwoot.webhook_queue import ConversationJobQueue, QueueFull
+
+
+def test_fifo_per_conversation_and_parallel_across_conversations():
+    async def scenario():
+        queue = ConversationJobQueue(workers=4, max_pending=10)
+        log: list[tuple] = []
+        running: dict = {}
+        overlap = []
+
+        def job(conv, n, delay):
+            async def run():
+                running[conv] = running.get(conv, 0) + 1
+                overlap.append(running[conv])
+                log.append(("start", conv, n))
+                await asyncio.sleep(delay)
+                running[conv] -= 1
+                log.append(("end", conv, n))
+                return n
+            return run
+
+        jobs = [
+            queue.submit(1, job(1, 1, 0.03)),
+            queue.submit(1, job(1, 2, 0.0)),
+            queue.submit(2, job(2, 1, 0.0)),
+            queue.submit(1, job(1, 3, 0.0)),
+        ]
+        await queue.join()
+        results = [await queue.result(j.job_id) for j in jobs]
+        stats = queue.stats()
+        await queue.stop()
+        return log, overlap, results, stats
+
+    log, overlap, results, stats = asyncio.run(scenario())
+
+    assert [n for kind, conv, n in log if conv == 1 and kind == "start"] == [1, 2, 3]
+    assert max(overlap) == 1, "duas mensagens da mesma conversa nunca correm juntas"
+    assert log.index(("end", 2, 1)) < log.index(("end", 1, 1)), "outra conversa não espera"
+    assert results == [1, 2, 1, 3]
+    assert stats["completed"] == 4 and stats["depth"] == 0 and stats["peak_depth"] == 4
+    assert stats["processing_s"]["count"] == 4 and stats["wait_s"]["count"] == 4
+
+
+def test_full_queue_rejects_and_failures_are_counted():
+    async def scenario():
+        queue = ConversationJobQueue(workers=1, max_pending=2)
+
+        async def boom():
+            raise RuntimeError("LLM fora do ar")
+
+        async def ok():
+            return "ok"
+
+        failed = queue.submit(1, boom)
+        queue.submit(2, ok)
+        with pytest.raises(QueueFull):
+            queue.submit(3, ok)
+        await queue.join()
+        with pytest.raises(RuntimeError):
+            await queue.result(failed.job_id)
+        text = queue.render_prometheus()
+        await queue.stop()
+        return queue.stats(), text
+
+    stats, text = asyncio.run(scenario())
+
+    assert (stats["completed"], stats["failed"], stats["rejected"]) == (1, 1, 1)
+    assert 'chatwoot_webhook_jobs_total{outcome="rejected"} 1' in text
+    assert "chatwoot_webhook_processing_seconds_count 2" in text
+    assert "chatwoot_webhook_queue_depth 0" in text
@@ -0,0 +1,101 @@
+"""Testes do controle de admissão do LLM e da inicialização do singleton."""
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.infrastructure.rag import rag_ppc
+from backend.infrastructure.rag.admission import AdmissionLimiter, AdmissionRejected
+from backend.infrastructure.rag.rag_ppc import LLM_BUSY_MESSAGE, ChatbotService
+
+
+def test_limiter_rejects_when_queue_is_full():
+    limiter = AdmissionLimiter(max_in_flight=1, max_waiting=0, wait_timeout=1.0)
+    limiter.acquire()
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.acquire()
+
+    assert excinfo.value.reason == "queue_full"
+    limiter.release()
+    with limiter.slot():
+        pass
+    stats = limiter.stats()
+    assert (stats["admitted"], stats["rejected_queue_full"], stats["in_flight"]) == (2, 1, 0)
+
+
+def test_limiter_waits_for_a_slot_and_times_out():
+    limiter = AdmissionLimiter(max_in_flight=1, max_waiting=2, wait_timeout=0.05)
+    limiter.acquire()
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.reason == "timeout"
+
+    limiter.wait_timeout = 2.0
+    threading.Timer(0.05, limiter.release).start()
+    limiter.acquire()  # entra assim que a vaga é liberada
+
+    stats = limiter.stats()
+    assert stats["rejected_timeout"] == 1
+    assert stats["peak_waiting"] == 1
+    assert stats["max_wait_ms"] > 0
+
+
+def test_concurrent_first_calls_build_the_service_once(monkeypatch):
+    monkeypatch.setattr(ChatbotService, "_instance", None)
+    monkeypatch.setattr(ChatbotService, "_initialized", False)
+    builds = []
+
+    def slow_setup(self):
+        builds.append(threading.get_ident())
+        time.sleep(0.05)
+
+    monkeypatch.setattr(ChatbotService, "_setup_service", slow_setup)
+
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(ChatbotService())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(builds) == 1
+    assert len({id(i) for i in instances}) == 1
+    assert all(i._initialized for i in instances)
+
+
+@pytest.fixture
+def service(monkeypatch) -> ChatbotService:
+    monkeypatch.setattr(rag_ppc, "LLM_MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(rag_ppc, "LLM_MAX_WAITING", 0)
+    svc = object.__new__(ChatbotService)
+    svc._initialized = True
+    svc._total_questions = 0
+    svc.model = object()
+    svc.model_fallback = None
+    svc._prepare_question = lambda question, start: {"prompt": question, "context_chunks": []}
+    svc._record_question_frequency = lambda *args, **kwargs: None
+    svc._get_agent = lambda session_id: SimpleNamespace(run=lambda prompt: SimpleNamespace(content="ok"))
+    return svc
+
+
+def test_saturated_llm_returns_busy_message(service: ChatbotService):
+    limiter = service._get_llm_limiter()
+    limiter.acquire()  # outra geração ocupando a única vaga
+
+    result = service.ask_question("Carga horária de ACC?")
+    events = list(service.ask_question_stream("Carga horária de ACC?"))
+
+    assert result["success"] is False
+    assert result["error"] == "busy"
+    assert result["message"] == LLM_BUSY_MESSAGE
+    assert events == [{"event": "done", "result": result}]
+    assert limiter.stats()["rejected_queue_full"] == 2
+
+    limiter.release()
+    assert service.ask_question("Carga horária de ACC?")["success"] is True
+    assert limiter.stats()["in_flight"] == 0
@@ -0,0 +1,71 @@
+"""Testes do benchmark offline do RAG (embedder de hashing + LLM stub)."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from scripts.rag_benchmark import (
+    HashingEmbedder,
+    build_service,
+    load_questions,
+    run_benchmark,
+)
+
+DOC = """# Regulamento
+
+## Estágio
+
+O estágio supervisionado tem carga horária de 320 horas e começa no sétimo período.
+
+## TCC
+
+O TCC deve ser defendido perante banca examinadora com no mínimo três membros.
+
+## Atividades complementares
+
+O aluno deve cumprir 150 horas de atividades complementares ao longo do curso.
+"""
+
+
+def test_hashing_embedder_is_deterministic_and_accent_insensitive():
+    embedder = HashingEmbedder(dimensions=64)
+
+    assert embedder.get_embedding("Estágio supervisionado") == embedder.get_embedding("estagio  SUPERVISIONADO")
+    assert embedder.get_embedding("estágio") != embedder.get_embedding("banca")
+
+
+@pytest.fixture
+def questions(tmp_path):
+    path = tmp_path / "perguntas.jsonl"
+    lines = [
+        {"id": "estagio", "question": "Qual a carga horária do estágio supervisionado?", "expected": ["320 horas"]},
+        {"id": "banca", "question": "Quantos membros tem a banca do TCC?", "expected": ["três membros"]},
+        {"id": "sem-gabarito", "question": "Quem coordena o curso?"},
+        {"title": "linha sem pergunta é ignorada"},
+    ]
+    path.write_text("\n".join(json.dumps(line, ensure_ascii=False) for line in lines), encoding="utf-8")
+    return load_questions(path)
+
+
+def test_benchmark_reports_recall_mrr_and_throughput(tmp_path, questions):
+    doc = tmp_path / "docs" / "Regulamento.md"
+    doc.parent.mkdir()
+    doc.write_text(DOC, encoding="utf-8")
+    service = build_service([doc], tmp_path / "work", reranker=False, domain_gate=False)
+
+    report = run_benchmark(service, questions, ks=(1, 3), concurrency_levels=(1, 2))
+
+    assert [q["id"] for q in questions] == ["estagio", "banca", "sem-gabarito"]
+    retrieval = report["retrieval"]
+    assert retrieval["questions"] == 2
+    assert retrieval["recall"]["@3"] == 1.0
+    assert 0 < retrieval["mrr"] <= 1.0
+    assert "dense_search" in report["retrieval_stages"]
+
+    assert [run["concurrency"] for run in report["throughput"]] == [1, 2]
+    for run in report["throughput"]:
+        assert run["requests"] == 3
+        assert run["outcomes"] == {"agent": 3}
+        assert run["throughput_qps"] > 0
+        assert run["stages"]["llm_primary"]["count"] == 3
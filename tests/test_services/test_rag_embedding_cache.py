@@ -0,0 +1,88 @@
+"""Testes do cache LRU de embeddings do ChatbotService (rag_ppc.py).
+
+Mesmo esquema de `test_semantic_cache_frequency.py`: a instância é criada com
+`object.__new__` para pular `_setup_service()` e o embedder é um fake que conta
+quantas vezes foi chamado — cada chamada real seria uma ida ao Ollama.
+"""
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+from backend.infrastructure.rag import rag_ppc
+from backend.infrastructure.rag.lru import BoundedLRUCache
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+
+class _CountingEmbedder:
+    id = "nomic-embed-text"
+
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+
+    def get_embedding(self, text: str) -> List[float]:
+        self.calls.append(text)
+        return [float(len(text)), 1.0, 0.0]
+
+
+@pytest.fixture
+def service() -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.embedder = _CountingEmbedder()
+    return svc
+
+
+def test_same_question_is_embedded_only_once(service: ChatbotService):
+    first = service._get_question_embedding("Qual a carga horária de ACC?")
+    second = service._get_question_embedding("  Qual a carga   horária de ACC? ")
+
+    assert first == second
+    assert len(service.embedder.calls) == 1
+    stats = service._get_embedding_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_query_and_document_prefixes_do_not_share_entries(service: ChatbotService):
+    service._get_question_embedding("Estrutura de Dados II")
+    service._get_question_embedding("Estrutura de Dados II", input_type="document")
+
+    assert service.embedder.calls == [
+        "search_query: Estrutura de Dados II",
+        "search_document: Estrutura de Dados II",
+    ]
+
+
+def test_indexing_path_bypasses_cache(service: ChatbotService):
+    service._get_question_embedding("chunk", input_type="document", use_cache=False)
+    service._get_question_embedding("chunk", input_type="document", use_cache=False)
+
+    assert len(service.embedder.calls) == 2
+    assert len(service._get_embedding_cache()) == 0
+
+
+def test_returned_vector_is_a_copy(service: ChatbotService):
+    vector = service._get_question_embedding("prazo de matrícula")
+    vector[0] = 123.0
+
+    assert service._get_question_embedding("prazo de matrícula")[0] != 123.0
+
+
+def test_cache_is_bounded(monkeypatch, service: ChatbotService):
+    monkeypatch.setattr(rag_ppc, "EMBEDDING_CACHE_MAX_ENTRIES", 2)
+
+    for question in ("a", "b", "c"):
+        service._get_question_embedding(question)
+    service._get_question_embedding("a")
+
+    assert len(service._get_embedding_cache()) == 2
+    assert service._get_embedding_cache().stats()["evictions"] >= 1
+    assert len(service.embedder.calls) == 4
+
+
+def test_lru_disabled_with_zero_entries():
+    cache: BoundedLRUCache[int] = BoundedLRUCache(0)
+    cache.put("k", 1)
+    assert cache.get("k") is None
+    assert cache.stats()["enabled"] is False
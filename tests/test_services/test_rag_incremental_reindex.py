@@ -0,0 +1,221 @@
+"""Testes da reindexação incremental por documento do ChatbotService (rag_ppc.py)."""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+DOCS = {
+    "Regulamento_ACC.md": "## ACC\n\nA carga horária de Atividades Curriculares Complementares é de 200 horas no curso.\n",
+    "Calendario.md": "## Calendário 2026.2\n\nMatrícula em 2026.2 de 03/08 a 07/08, com rematrícula até o fim do mês.\n",
+}
+
+
+class _Embedder768:
+    id = "fake-embedder"
+
+    def __init__(self) -> None:
+        self.texts: List[str] = []
+
+    def get_embedding(self, text: str) -> List[float]:
+        self.texts.append(text)
+        return [1.0] + [0.0] * 767
+
+
+@pytest.fixture
+def docs(tmp_path) -> List[Path]:
+    doc_dir = tmp_path / "docs"
+    doc_dir.mkdir()
+    files = []
+    for name, text in DOCS.items():
+        path = doc_dir / name
+        path.write_text(text, encoding="utf-8")
+        files.append(path)
+    return files
+
+
+@pytest.fixture
+def service(tmp_path, docs) -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "rag" / "lancedb")
+    svc.embedder = _Embedder768()
+    svc.vector_db = object()
+    svc.document_files = docs
+    svc._index_documents_fine_grained(docs)
+    svc._save_documents_hash(docs, Path(svc.db_url).parent)
+    svc._refresh_keyword_index()
+    svc._setup_semantic_cache()
+    return svc
+
+
+def _rows_by_source(svc: ChatbotService) -> dict:
+    data = svc._get_table_pool().get("recipes").to_arrow()
+    by_source: dict = {}
+    for chunk_id, source in zip(data.column("id").to_pylist(), data.column("source").to_pylist()):
+        by_source.setdefault(source, set()).add(chunk_id)
+    return by_source
+
+
+def test_plan_detects_changed_added_and_removed_files(service: ChatbotService, docs, tmp_path):
+    cache_dir = Path(service.db_url).parent
+    docs[0].write_text(DOCS["Regulamento_ACC.md"] + "\nCarga horária revisada.\n", encoding="utf-8")
+    new_doc = docs[0].parent / "FAQ.md"
+    new_doc.write_text("## FAQ\n\nDúvidas frequentes sobre o TCC e o estágio supervisionado.\n", encoding="utf-8")
+
+    plan = service._plan_reindex([docs[0], new_doc], cache_dir)
+
+    assert plan["mode"] == "incremental"
+    assert plan["changed"] == ["Regulamento_ACC.md"]
+    assert plan["added"] == ["FAQ.md"]
+    assert plan["removed"] == ["Calendario.md"]
+
+
+def test_touch_without_content_change_does_not_reindex(service: ChatbotService, docs):
+    os.utime(docs[0], (1, 1))
+
+    plan = service._plan_reindex(docs, Path(service.db_url).parent)
+
+    assert plan["mode"] == "none"
+    assert plan["refresh_hash"] is True
+
+
+def test_legacy_metadata_forces_full_rebuild(service: ChatbotService, docs):
+    hash_file = Path(service.db_url).parent / "documents_hash.json"
+    hash_file.write_text(json.dumps({"hash": "antigo", "documents": [d.name for d in docs]}))
+
+    assert service._plan_reindex(docs, Path(service.db_url).parent) == {"mode": "full"}
+
+
+def test_only_changed_file_is_reembedded(service: ChatbotService, docs):
+    cache_dir = Path(service.db_url).parent
+    before = _rows_by_source(service)
+    docs[1].write_text(
+        "## Calendário 2026.3\n\nMatrícula em 2026.3 de 01/09 a 05/09, com rematrícula até o fim do mês.\n",
+        encoding="utf-8",
+    )
+    service.embedder.texts.clear()
+
+    plan = service._plan_reindex(docs, cache_dir)
+    service._apply_incremental_reindex(plan, docs, cache_dir)
+
+    after = _rows_by_source(service)
+    assert after["Regulamento_ACC.md"] == before["Regulamento_ACC.md"]
+    assert after["Calendario.md"].isdisjoint(before["Calendario.md"])
+    assert service.embedder.texts and all("2026.3" in t for t in service.embedder.texts)
+    assert service._get_available_periods() == ["2026.3"]
+    assert "2026.3" in service._keyword_search("rematrícula 2026.3", top_k=1)[0]
+    assert service._plan_reindex(docs, cache_dir)["mode"] == "none"
+
+
+def test_cache_invalidation_is_scoped_to_cited_sources(service: ChatbotService):
+    for key, sources in (("acc", ["Regulamento_ACC.md"]), ("cal", ["Calendario.md"]), ("sem", [])):
+        service._upsert_cache_entry({
+            "question": key,
+            "answer": key,
+            "sources": json.dumps(sources),
+            "vector": [1.0, 0.0],
+            "question_key": key,
+            "documents_hash": "v1",
+        })
+
+    removed = service._invalidate_cache_for_sources(["Calendario.md"], "v1", "v2")
+
+    rows = service._cache_table.to_arrow().to_pylist()
+    assert removed == 2
+    assert [(r["question_key"], r["documents_hash"]) for r in rows] == [("acc", "v2")]
+    mirrored = service._get_cache_mirror().entries()
+    assert [(r["question_key"], r["documents_hash"]) for r in mirrored] == [("acc", "v2")]
+
+
+def test_retag_to_a_version_already_cached_keeps_keys_unique(service: ChatbotService):
+    # Documentos voltaram a "v2": a pergunta já tem resposta nessa versão.
+    for documents_hash, answer in (("v1", "antiga"), ("v2", "atual")):
+        service._upsert_cache_entry({
+            "question": "acc",
+            "answer": answer,
+            "sources": json.dumps(["Regulamento_ACC.md"]),
+            "vector": [1.0, 0.0],
+            "question_key": "acc",
+            "documents_hash": documents_hash,
+        })
+
+    assert service._invalidate_cache_for_sources([], "v1", "v2") == 1
+
+    rows = service._cache_table.to_arrow().to_pylist()
+    assert [(r["question_key"], r["documents_hash"], r["answer"]) for r in rows] == [("acc", "v2", "atual")]
+    mirrored = service._get_cache_mirror().entries()
+    assert [(r["question_key"], r["documents_hash"]) for r in mirrored] == [("acc", "v2")]
+
+
+def test_answer_sources_come_from_retrieved_chunks(service: ChatbotService):
+    chunks = service._keyword_search("matrícula 2026.2", top_k=1)
+
+    assert service._sources_for_chunks(chunks) == ["Calendario.md"]
+
+
+def test_chunk_shared_by_two_documents_reports_both_sources():
+    import pyarrow as pa
+
+    text = "Matrícula em 2026.2 de 03/08 a 07/08."
+    payloads = [
+        json.dumps({"content": text, "meta_data": {"source": source}})
+        for source in ("Calendario.md", "Calendario_Copia.md")
+    ]
+    table = SimpleNamespace(to_arrow=lambda: pa.table({"id": ["c1", "c2"], "payload": payloads}))
+    svc = object.__new__(ChatbotService)
+    svc._build_keyword_index(table)
+
+    assert svc._sources_for_chunks([text]) == ["Calendario.md", "Calendario_Copia.md"]
+
+
+def test_watcher_reindexes_changes_and_hash_is_memoized(service: ChatbotService, docs, monkeypatch):
+    from backend.infrastructure.rag.document_watcher import DocumentWatcher
+
+    indexed_hash = service._get_current_documents_hash()
+    watcher = DocumentWatcher(service._scan_documents_fingerprint, service._reload_changed_documents)
+    watcher._fingerprint = indexed_hash
+    assert watcher.check() is False
+
+    # O caminho quente não toca o disco.
+    monkeypatch.setattr(Path, "stat", lambda self, **kwargs: pytest.fail("stat na pergunta"))
+    assert service._get_current_documents_hash() == indexed_hash
+    monkeypatch.undo()
+
+    new_doc = docs[0].parent / "FAQ.md"
+    new_doc.write_text("## FAQ\n\nDúvidas frequentes sobre o TCC e o estágio supervisionado do curso.\n", encoding="utf-8")
+
+    assert watcher.check() is True
+    assert service._get_current_documents_hash() == service._scan_documents_fingerprint() != indexed_hash
+    assert "FAQ.md" in _rows_by_source(service)
+    assert "FAQ.md" in [f.name for f in service.document_files]
+    assert watcher.check() is False
+
+
+def test_failed_watcher_reindex_keeps_indexed_version_and_retries(service: ChatbotService, docs, monkeypatch):
+    from backend.infrastructure.rag.document_watcher import DocumentWatcher
+
+    indexed_hash = service._get_current_documents_hash()
+    indexed_files = list(service.document_files)
+    watcher = DocumentWatcher(service._scan_documents_fingerprint, service._reload_changed_documents)
+    watcher._fingerprint = indexed_hash
+
+    new_doc = docs[0].parent / "FAQ.md"
+    new_doc.write_text("## FAQ\n\nDúvidas frequentes sobre o TCC e o estágio supervisionado do curso.\n", encoding="utf-8")
+
+    def embedding_fora(*args, **kwargs):
+        raise RuntimeError("embedder indisponível")
+
+    monkeypatch.setattr(service, "_apply_incremental_reindex", embedding_fora)
+    assert watcher.check() is False
+    assert service._get_current_documents_hash() == indexed_hash
+    assert service.document_files == indexed_files
+
+    monkeypatch.undo()
+    assert watcher.check() is True, "a próxima rodada tenta de novo"
+    assert "FAQ.md" in _rows_by_source(service)
@@ -0,0 +1,63 @@
+"""Testes do índice BM25 que alimenta o ranking esparso do RAG (rag_ppc.py)."""
+from __future__ import annotations
+
+import json
+
+import lancedb
+import pytest
+
+from backend.infrastructure.rag.bm25 import BM25Index
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+CHUNKS = {
+    "ed1": "[Documento: PCC.md | Seção: 6.1.10. ESTRUTURA DE DADOS I]\n\nListas, pilhas e filas.",
+    "ed2": "[Documento: PCC.md | Seção: 6.1.19. ESTRUTURA DE DADOS II]\n\nÁrvores, grafos e hashing.",
+    "cal": "Calendário 2026.2: período de matrícula de 03/08 a 07/08.",
+    "acc": "A carga horária mínima de Atividades Curriculares Complementares é de 200 horas.",
+}
+
+
+@pytest.fixture
+def index() -> BM25Index:
+    return BM25Index(stop_words=ChatbotService._PT_STOP_WORDS).build(CHUNKS.items())
+
+
+def test_accent_folding_matches_unaccented_query(index: BM25Index):
+    top_id, _ = index.search("matricula", top_k=1)[0]
+    assert top_id == "cal"
+
+
+def test_roman_numeral_discriminates_between_courses(index: BM25Index):
+    ranked = [chunk_id for chunk_id, _ in index.search("ementa de Estrutura de Dados II", top_k=2)]
+    assert ranked[0] == "ed2"
+
+
+def test_period_is_a_single_token(index: BM25Index):
+    assert "2026.2" in index.tokenize("prazo 2026.2")
+    assert [chunk_id for chunk_id, _ in index.search("2026.2", top_k=5)] == ["cal"]
+
+
+def test_stop_words_do_not_score(index: BM25Index):
+    assert index.search("de para com não", top_k=5) == []
+
+
+def test_keyword_search_builds_index_from_recipes_table(tmp_path):
+    db = lancedb.connect(str(tmp_path / "lancedb"))
+    rows = [
+        {
+            "vector": [1.0, 0.0],
+            "id": chunk_id,
+            "payload": json.dumps({"name": "doc", "meta_data": {}, "content": content}),
+        }
+        for chunk_id, content in CHUNKS.items()
+    ]
+    table = db.create_table("recipes", data=rows)
+
+    svc = object.__new__(ChatbotService)
+    results = svc._keyword_search("Qual a carga horária de ACC?", table, top_k=2)
+
+    assert results[0] == CHUNKS["acc"]
+    assert svc._keyword_index is not None and len(svc._keyword_index) == len(CHUNKS)
+
+    # Consultas seguintes não precisam mais da tabela.
+    assert svc._keyword_search("hashing", top_k=1) == [CHUNKS["ed2"]]
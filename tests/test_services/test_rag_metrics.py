@@ -0,0 +1,95 @@
+"""Testes da latência por etapa do RAG (histogramas, percentis e /metrics)."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.infrastructure.rag.metrics import RagMetrics, rag_metrics
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    rag_metrics.reset()
+    yield
+    rag_metrics.reset()
+
+
+def test_histogram_percentiles_and_prometheus_text():
+    metrics = RagMetrics(buckets=(0.1, 1.0))
+    for ms in range(1, 101):
+        metrics.observe("rerank", ms / 100)
+    metrics.count_question("agent")
+
+    summary = metrics.summary()["rerank"]
+    assert summary["count"] == 100
+    assert summary["avg"] == pytest.approx(0.505)
+    assert summary["p50"] == pytest.approx(0.505)
+    assert summary["p95"] == pytest.approx(0.9505)
+    assert summary["p99"] == pytest.approx(0.9901)
+
+    text = metrics.render_prometheus()
+    assert 'rag_stage_latency_seconds_bucket{stage="rerank",le="0.1"} 10' in text
+    assert 'rag_stage_latency_seconds_bucket{stage="rerank",le="1.0"} 100' in text
+    assert 'rag_stage_latency_seconds_bucket{stage="rerank",le="+Inf"} 100' in text
+    assert 'rag_stage_latency_seconds_count{stage="rerank"} 100' in text
+    assert 'rag_questions_total{outcome="agent"} 1' in text
+
+
+@pytest.fixture
+def service() -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc._initialized = True
+    svc._total_questions = 0
+    svc._last_latency = None
+    svc._last_question_at = None
+    svc._knowledge_loaded = True
+    svc.vector_db = object()
+    svc.model = object()
+    svc.model_fallback = None
+    svc._reranker_loaded = True
+    svc._reranker = None
+    svc._search_cache = lambda question: None
+    svc._dense_search = lambda question, limit=30: [{"content": "A carga horária de ACC é de 200 horas."}]
+    svc._is_question_in_domain = lambda question, dense_results=None: (True, 0.9)
+    svc._keyword_search = lambda question, table, top_k: []
+    svc._get_table_pool = lambda: SimpleNamespace(get_if_exists=lambda name: None)
+    svc._record_question_frequency = lambda *args, **kwargs: None
+    svc._get_agent = lambda session_id: SimpleNamespace(run=lambda prompt: SimpleNamespace(content="200 horas."))
+    return svc
+
+
+def test_pipeline_records_each_stage(service: ChatbotService):
+    service.ask_question("Qual a carga horária de ACC?")
+    service.ask_question("Qual a carga horária de ACC em 2026.2?")
+
+    stages = rag_metrics.summary()
+    for stage in (
+        "cache_lookup", "temporal_check", "dense_search", "domain_gate",
+        "keyword_search", "rrf", "rerank", "llm_primary", "total",
+    ):
+        assert stages[stage]["count"] == 2, stage
+    assert "llm_fallback" not in stages
+
+
+def test_avg_latency_is_the_mean_of_answered_questions(service: ChatbotService):
+    service._record_answer_latency(1.0)
+    service._record_answer_latency(3.0)
+
+    assert service._total_questions == 2
+    assert service._latency_sum / service._total_questions == pytest.approx(2.0)
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    from backend.presentation.main import app
+
+    rag_metrics.observe("llm_primary", 2.0)
+    client = TestClient(app)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_latency_seconds_count{stage="llm_primary"} 1' in response.text
@@ -0,0 +1,146 @@
+"""Testes do backend ONNX do reranker (exportação única, paridade e fallback).
+
+onnxruntime/torch não são necessários: exportação e sessão ONNX são
+substituídas por fakes que gravam o arquivo e devolvem notas fixas.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.infrastructure.rag import onnx_reranker, rag_ppc
+from backend.infrastructure.rag.onnx_reranker import (
+    EXPORT_META_FILE_NAME,
+    PARITY_CASES,
+    QUANTIZED_FILE_NAME,
+    check_parity,
+    load_onnx_reranker,
+)
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+
+class _KeywordScorer:
+    """Nota alta quando o documento contém a palavra esperada do caso."""
+
+    def __init__(self, noise: float = 0.0) -> None:
+        self.noise = noise
+
+    def predict(self, pairs, **kwargs):
+        best = {q: docs[i] for q, docs, i in PARITY_CASES}
+        return np.array([0.9 if best.get(q) == d else 0.1 for q, d in pairs]) + self.noise
+
+
+def test_parity_accepts_close_scores_and_rejects_reordering():
+    assert check_parity(_KeywordScorer(), _KeywordScorer(noise=0.01))["ok"] is True
+
+    class _Reversed:
+        def predict(self, pairs, **kwargs):
+            return 1.0 - _KeywordScorer().predict(pairs)
+
+    report = check_parity(_KeywordScorer(), _Reversed())
+    assert report["ok"] is False
+    assert report["correct_top1"] == 0
+
+
+@pytest.fixture
+def fake_export(monkeypatch):
+    exports = []
+
+    def export(model_name, export_dir, max_length=512):
+        exports.append(model_name)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        (export_dir / QUANTIZED_FILE_NAME).write_bytes(b"onnx")
+        return export_dir / QUANTIZED_FILE_NAME
+
+    class _FakeOnnx(_KeywordScorer):
+        def __init__(self, export_dir, threads=0, **kwargs):
+            super().__init__(noise=0.001)
+            self.threads = threads
+
+    monkeypatch.setattr(onnx_reranker, "export_quantized_model", export)
+    monkeypatch.setattr(onnx_reranker, "OnnxCrossEncoder", _FakeOnnx)
+    return exports
+
+
+def test_model_is_exported_and_validated_once(tmp_path, fake_export):
+    references = []
+
+    def reference():
+        references.append(1)
+        return _KeywordScorer()
+
+    first, meta = load_onnx_reranker("BAAI/bge-reranker-base", tmp_path, reference, threads=2)
+    second, _ = load_onnx_reranker("BAAI/bge-reranker-base", tmp_path, reference, threads=2)
+
+    assert first is not None and second is not None
+    assert second.threads == 2
+    assert fake_export == ["BAAI/bge-reranker-base"]
+    assert references == [1]  # PyTorch só é carregado na exportação
+    saved = json.loads((tmp_path / "BAAI__bge-reranker-base" / EXPORT_META_FILE_NAME).read_text())
+    assert saved["parity"]["ok"] is True
+
+
+def test_failed_parity_keeps_pytorch(tmp_path, fake_export, monkeypatch):
+    class _Reversed:
+        def predict(self, pairs, **kwargs):
+            return 1.0 - _KeywordScorer().predict(pairs)
+
+    monkeypatch.setattr(rag_ppc, "RERANKER_BACKEND", "onnx")
+    monkeypatch.setattr(rag_ppc, "load_onnx_reranker", lambda *a, **kw: load_onnx_reranker(
+        "m", tmp_path, reference_factory=lambda: _Reversed()
+    ))
+    monkeypatch.setitem(sys.modules, "sentence_transformers", SimpleNamespace(CrossEncoder=lambda name: _Reversed()))
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+
+    assert isinstance(svc._get_reranker(), _Reversed)
+    assert svc._reranker_info["backend"] == "torch"
+    assert svc._reranker_info["parity"]["ok"] is False
+
+
+def test_request_path_never_exports(tmp_path, fake_export, monkeypatch):
+    monkeypatch.setattr(rag_ppc, "RERANKER_BACKEND", "onnx")
+    monkeypatch.setitem(sys.modules, "sentence_transformers", SimpleNamespace(CrossEncoder=lambda name: _KeywordScorer()))
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+
+    assert isinstance(svc._get_reranker(), _KeywordScorer)
+    assert fake_export == []
+    assert svc._reranker_info["backend"] == "torch"
+
+    # O aquecimento do boot exporta e troca para o ONNX.
+    reranker = svc._get_reranker(allow_export=True)
+    assert fake_export == [rag_ppc.RERANKER_MODEL_DEFAULT]
+    assert svc._reranker_info["backend"] == "onnx-int8"
+    assert svc._get_reranker() is reranker
+
+
+def test_real_export_of_tiny_model(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    model_dir = tmp_path / "tiny-reranker"
+    model_dir.mkdir()
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "carga", "horaria", "acc", "tcc", "estagio"]
+    (model_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    transformers.BertTokenizer(str(model_dir / "vocab.txt")).save_pretrained(model_dir)
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=32, max_position_embeddings=64, num_labels=1,
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(model_dir)
+
+    export_dir = tmp_path / "export"
+    onnx_reranker.export_quantized_model(str(model_dir), export_dir, max_length=32)
+
+    assert (export_dir / QUANTIZED_FILE_NAME).exists()
+    scores = onnx_reranker.OnnxCrossEncoder(export_dir, max_length=32).predict(
+        [("carga horaria acc", "acc"), ("tcc", "estagio"), ("estagio", "carga")]
+    )
+    assert len(scores) == 3
@@ -0,0 +1,77 @@
+"""Testes do pré-aquecimento do RAG e do gate de prontidão em /health."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.infrastructure.rag import prewarm, rag_ppc
+
+
+class _FakeService:
+    def __init__(self, release: threading.Event, fail: bool = False) -> None:
+        self.release = release
+        self.fail = fail
+
+    def warm_up(self):
+        self.release.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("ollama fora do ar")
+        return {"embedding": 0.1, "reranker_load": 0.2, "retrieval": 0.05, "chunks": 3}
+
+
+@pytest.fixture(autouse=True)
+def _reset_prewarm(monkeypatch):
+    monkeypatch.setattr(prewarm, "_thread", None)
+    monkeypatch.setattr(prewarm, "_state", {"enabled": False, "state": "disabled"})
+
+
+@pytest.fixture
+def client():
+    from backend.presentation.main import app
+    return TestClient(app)
+
+
+def _wait_for_thread():
+    prewarm._thread.join(timeout=5)
+    assert not prewarm._thread.is_alive()
+
+
+def test_health_is_ok_when_prewarm_is_disabled(client):
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.json()["rag"]["state"] == "disabled"
+
+
+def test_health_waits_for_the_rag_to_be_hot(client, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(rag_ppc, "get_service", lambda: _FakeService(release))
+
+    assert prewarm.start_prewarm() is True
+    assert prewarm.start_prewarm() is False  # idempotente
+    assert client.get("/health").status_code == 503
+
+    release.set()
+    _wait_for_thread()
+
+    response = client.get("/health")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok"
+    assert body["rag"]["state"] == "ready"
+    assert body["rag"]["timings"]["chunks"] == 3
+
+
+def test_failed_prewarm_reports_degraded(client, monkeypatch):
+    release = threading.Event()
+    release.set()
+    monkeypatch.setattr(rag_ppc, "get_service", lambda: _FakeService(release, fail=True))
+
+    prewarm.start_prewarm()
+    _wait_for_thread()
+
+    body = client.get("/health").json()
+    assert body["status"] == "degraded"
+    assert body["rag"]["error"] == "ollama fora do ar"
@@ -0,0 +1,80 @@
+"""Testes do cache de notas do reranker e do pool adaptativo de candidatos."""
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+from backend.infrastructure.rag import rag_ppc
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+DOCS = [f"Trecho {i} do regulamento." for i in range(40)]
+
+
+class _CountingReranker:
+    def __init__(self) -> None:
+        self.pairs: List[tuple] = []
+
+    def predict(self, pairs):
+        self.pairs.extend(pairs)
+        # Nota maior para trechos com índice maior.
+        return [float(doc.split()[1]) for _, doc in pairs]
+
+
+@pytest.fixture
+def service(tmp_path) -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+    svc._reranker_loaded = True
+    svc._reranker = _CountingReranker()
+    svc._reranker_info = {"model": "bge", "backend": "torch"}
+    svc._knowledge_loaded = True
+    svc.vector_db = object()
+    return svc
+
+
+def test_repeated_question_is_served_from_score_cache(service: ChatbotService):
+    stats_first, stats_second = {}, {}
+
+    first = service._rerank("Carga horária de ACC?", DOCS[:10], top_n=3, stats=stats_first)
+    second = service._rerank("  carga horária de   ACC? ", DOCS[:12], top_n=3, stats=stats_second)
+
+    assert first == [DOCS[9], DOCS[8], DOCS[7]]
+    assert second == [DOCS[11], DOCS[10], DOCS[9]]
+    assert stats_first == {"candidates": 10, "pairs_scored": 10, "cached": 0}
+    assert stats_second == {"candidates": 12, "pairs_scored": 2, "cached": 10}
+    assert len(service._reranker.pairs) == 12
+
+    # Outro modelo/backend não reaproveita as notas.
+    service._reranker_info = {"model": "bge", "backend": "onnx-int8"}
+    stats_onnx = {}
+    service._rerank("Carga horária de ACC?", DOCS[:10], top_n=3, stats=stats_onnx)
+    assert stats_onnx["pairs_scored"] == 10
+
+
+def _retrieve(service: ChatbotService, dense: List[str], sparse: List[str]) -> dict:
+    service._keyword_search = lambda question, table, top_k: sparse
+    stats: dict = {}
+    service._retrieve_context(
+        "Carga horária de ACC?", top_k=5, dense_results=[{"content": d} for d in dense], stats=stats
+    )
+    return stats
+
+
+def test_pool_shrinks_when_dense_and_sparse_agree(service: ChatbotService):
+    stats = _retrieve(service, dense=DOCS[:30], sparse=DOCS[:4] + DOCS[30:40] + DOCS[4:20])
+
+    assert stats["adaptive"] is True
+    assert stats["pool"] == rag_ppc.RERANK_ADAPTIVE_POOL_SIZE
+    assert stats["pairs_scored"] == rag_ppc.RERANK_ADAPTIVE_POOL_SIZE
+    assert service._get_rerank_totals()["adaptive_shrunk"] == 1
+
+
+def test_full_pool_when_rankings_disagree(service: ChatbotService, monkeypatch):
+    stats = _retrieve(service, dense=DOCS[:20], sparse=DOCS[20:40])
+
+    assert stats["adaptive"] is False
+    assert stats["pool"] == rag_ppc.RERANK_CANDIDATE_POOL
+
+    monkeypatch.setattr(rag_ppc, "RERANK_ADAPTIVE_POOL", False)
+    assert _retrieve(service, dense=DOCS[:30], sparse=DOCS[:30])["adaptive"] is False
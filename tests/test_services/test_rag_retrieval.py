@@ -0,0 +1,196 @@
+"""Testes do estágio de recuperação do ChatbotService (rag_ppc.py).
+
+Tabela `recipes` real (LanceDB em diretório temporário) com vetores de 3
+dimensões e um embedder fake; o reranker é desligado para que a ordem final
+seja a da fusão RRF.
+"""
+from __future__ import annotations
+
+import json
+from typing import List
+
+import lancedb
+import pytest
+
+from backend.infrastructure.rag import rag_ppc
+from backend.infrastructure.rag.rag_ppc import (
+    AVAILABLE_PERIODS_FILE_NAME,
+    RETRIEVER_FANOUT,
+    ChatbotService,
+)
+
+CHUNKS = [
+    ("acc", [1.0, 0.0, 0.0], "A carga horária de Atividades Curriculares Complementares é de 200 horas."),
+    ("tcc", [0.8, 0.6, 0.0], "O TCC deve ser defendido perante banca de três membros."),
+    ("cal", [0.0, 1.0, 0.0], "Calendário 2026.2: matrícula de 03/08 a 07/08."),
+    ("est", [0.0, 0.0, 1.0], "O estágio supervisionado tem 300 horas."),
+]
+
+
+class _Embedder:
+    id = "fake-embedder"
+
+    def get_embedding(self, text: str) -> List[float]:
+        return [1.0, 0.1, 0.0] if "acc" in text.lower() else [0.0, 0.0, 1.0]
+
+
+class _CountingTable:
+    """Proxy que conta buscas vetoriais na tabela real."""
+
+    def __init__(self, table) -> None:
+        self._table = table
+        self.searches = 0
+
+    def search(self, *args, **kwargs):
+        self.searches += 1
+        return self._table.search(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+
+@pytest.fixture
+def service(tmp_path) -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+    svc.embedder = _Embedder()
+    svc.vector_db = object()
+    svc._knowledge_loaded = True
+    svc._reranker_loaded = True
+    svc._reranker = None
+    db = lancedb.connect(svc.db_url)
+    table = db.create_table(
+        "recipes",
+        data=[
+            {
+                "vector": vector,
+                "id": chunk_id,
+                "payload": json.dumps({"name": "doc", "meta_data": {}, "content": content}),
+            }
+            for chunk_id, vector, content in CHUNKS
+        ],
+    )
+    svc._counting_table = _CountingTable(table)
+    svc._get_table_pool().register("recipes", svc._counting_table)
+    svc._build_keyword_index(table)
+    return svc
+
+
+def test_one_vector_search_serves_domain_gate_and_retrieval(service: ChatbotService):
+    question = "Qual a carga horária de ACC?"
+
+    dense = service._dense_search(question, limit=RETRIEVER_FANOUT)
+    in_domain, score = service._is_question_in_domain(question, dense_results=dense)
+    chunks = service._retrieve_context(question, top_k=2, dense_results=dense)
+
+    assert service._counting_table.searches == 1
+    assert in_domain is True
+    assert score > 0.5
+    assert chunks[0] == CHUNKS[0][2]
+
+
+def test_domain_score_matches_standalone_top5_search(service: ChatbotService):
+    question = "Qual a carga horária de ACC?"
+
+    standalone = service._is_question_in_domain(question)
+    shared = service._is_question_in_domain(
+        question, dense_results=service._dense_search(question, limit=RETRIEVER_FANOUT)
+    )
+
+    assert shared == pytest.approx(standalone)
+
+
+def test_empty_search_is_out_of_domain(service: ChatbotService):
+    assert service._is_question_in_domain("Qual a carga horária de ACC?", dense_results=[]) == (False, 0.0)
+
+
+def test_periods_are_scanned_once_then_served_from_memory(service: ChatbotService, tmp_path):
+    assert service._get_available_periods() == ["2026.2"]
+    assert (tmp_path / AVAILABLE_PERIODS_FILE_NAME).exists()
+
+    service._get_table_pool().invalidate("recipes")
+    assert service._get_available_periods() == ["2026.2"]
+    assert service._get_table_pool().stats()["opens"] == 0
+
+
+def test_periods_are_loaded_from_disk_after_restart(service: ChatbotService):
+    service._get_available_periods()
+
+    restarted = object.__new__(ChatbotService)
+    restarted.db_url = service.db_url
+    restarted.vector_db = None  # sem tabela: só o arquivo pode responder
+    assert restarted._get_available_periods() == ["2026.2"]
+
+
+def test_indexing_extracts_periods(tmp_path):
+    doc = tmp_path / "docs" / "Calendario.md"
+    doc.parent.mkdir()
+    doc.write_text(
+        "## Calendário 2026.3\n\nMatrícula em 2026.3 de 01/09 a 05/09, rematrícula até o fim do mês.\n\n"
+        "## Calendário 2026.4\n\nMatrícula em 2026.4 de 01/12 a 05/12, rematrícula até o fim do mês.\n",
+        encoding="utf-8",
+    )
+
+    class _Embedder768:
+        id = "fake-embedder"
+
+        def get_embedding(self, text: str) -> List[float]:
+            return [1.0] + [0.0] * 767
+
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "rag" / "lancedb")
+    svc.embedder = _Embedder768()
+    svc._index_documents_fine_grained([doc])
+
+    assert svc._get_available_periods() == ["2026.3", "2026.4"]
+    saved = json.loads((tmp_path / "rag" / AVAILABLE_PERIODS_FILE_NAME).read_text())
+    assert saved["periods"] == ["2026.3", "2026.4"]
+
+
+class _FakeOllamaClient:
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+
+    def embed(self, input, model, **kwargs):
+        self.batches.append(list(input))
+        return {"embeddings": [[3.0, 4.0] for _ in input]}
+
+
+class _BatchEmbedder:
+    id = "nomic-embed-text"
+    dimensions = 2
+    options = None
+
+    def __init__(self) -> None:
+        self.client = _FakeOllamaClient()
+
+
+def test_document_embeddings_are_batched_and_normalized(monkeypatch):
+    monkeypatch.setattr(rag_ppc, "INDEX_EMBED_BATCH_SIZE", 2)
+    svc = object.__new__(ChatbotService)
+    svc.embedder = _BatchEmbedder()
+
+    vectors = svc._embed_documents_batched(["a", "b", "c", "d", "e"])
+
+    assert sorted(len(b) for b in svc.embedder.client.batches) == [1, 2, 2]
+    assert all(t.startswith("search_document: ") for b in svc.embedder.client.batches for t in b)
+    assert vectors == [pytest.approx([0.6, 0.8])] * 5
+
+
+def test_batch_failure_falls_back_to_single_embeddings(monkeypatch):
+    class _BrokenClient:
+        def embed(self, input, model, **kwargs):
+            raise ConnectionError("ollama fora do ar")
+
+    class _Embedder:
+        id = "fake-embedder"
+        dimensions = 2
+        client = _BrokenClient()
+
+        def get_embedding(self, text: str) -> List[float]:
+            return [] if text == "ruim" else [0.0, 2.0]
+
+    svc = object.__new__(ChatbotService)
+    svc.embedder = _Embedder()
+
+    assert svc._embed_documents_batched(["bom", "ruim"]) == [[0.0, 1.0], None]
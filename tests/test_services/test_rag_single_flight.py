@@ -0,0 +1,122 @@
+"""Testes da coalescência de perguntas idênticas em andamento (single-flight)."""
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+from backend.infrastructure.rag.single_flight import SingleFlight
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.005)
+
+
+def test_single_flight_shares_result_and_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return "resposta"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(4)]
+    threads[0].start()
+    _wait_for(lambda: calls)
+    for t in threads[1:]:
+        t.start()
+    _wait_for(lambda: flight.stats()["waiting"] == 3)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("resposta", False)] + [("resposta", True)] * 3
+    assert flight.stats()["in_flight"] == 0
+
+    # Chave liberada: a próxima chamada executa de novo; exceções também são propagadas.
+    def failing():
+        raise ValueError("falhou")
+
+    with pytest.raises(ValueError):
+        flight.do("k", failing)
+    assert flight.do("k", lambda: "nova") == ("nova", False)
+
+
+@pytest.fixture
+def service() -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc._initialized = True
+    svc._total_questions = 0
+    svc.model = object()
+    svc.model_fallback = None
+    svc.recorded = []
+    svc._prepare_question = lambda question, start: {"prompt": question, "context_chunks": []}
+    svc._record_question_frequency = lambda q, a, sources=None: svc.recorded.append(q)
+    return svc
+
+
+def test_identical_questions_share_one_generation(service: ChatbotService):
+    release = threading.Event()
+    runs = []
+
+    def run(prompt):
+        runs.append(prompt)
+        release.wait(2)
+        return SimpleNamespace(content="O prazo é de 03/08 a 07/08.")
+
+    service._get_agent = lambda session_id: SimpleNamespace(run=run)
+
+    results = {}
+    first = threading.Thread(
+        target=lambda: results.__setitem__("a", service.ask_question("Qual o prazo de matrícula 2026.2?", "s1"))
+    )
+    second = threading.Thread(
+        target=lambda: results.__setitem__("b", service.ask_question("  qual o prazo de  MATRÍCULA 2026.2? ", "s2"))
+    )
+    first.start()
+    _wait_for(lambda: runs)
+    second.start()
+    _wait_for(lambda: service._get_single_flight().stats()["waiting"] == 1)
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(runs) == 1
+    assert results["a"]["answer"] == results["b"]["answer"] == "O prazo é de 03/08 a 07/08."
+    assert results["b"]["coalesced"] is True
+    assert results["b"]["question"] == "qual o prazo de  MATRÍCULA 2026.2?"
+    # As duas perguntas contam como repetições para a promoção no cache.
+    assert len(service.recorded) == 2
+    assert service._total_questions == 2
+
+
+def test_different_documents_hash_does_not_coalesce(service: ChatbotService):
+    hashes = iter(["v1", "v2"])
+    service._get_current_documents_hash = lambda: next(hashes)
+    release = threading.Event()
+    runs = []
+
+    def run(prompt):
+        runs.append(prompt)
+        release.wait(2)
+        return SimpleNamespace(content="ok")
+
+    service._get_agent = lambda session_id: SimpleNamespace(run=run)
+
+    threads = [threading.Thread(target=service.ask_question, args=("Prazo de matrícula?",)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: len(runs) == 2)
+    release.set()
+    for t in threads:
+        t.join()
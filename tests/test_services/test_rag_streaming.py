@@ -0,0 +1,112 @@
+"""Testes do modo streaming do ChatbotService (ask_question_stream) e do SSE."""
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+from backend.presentation.api.v1.rag.diretor_virtual import _sse_events
+
+
+class _StreamingAgent:
+    def __init__(self, tokens: List[str], fail_after: int = -1) -> None:
+        self.tokens = tokens
+        self.fail_after = fail_after
+
+    def run(self, prompt, stream=False):
+        assert stream is True
+        yield SimpleNamespace(event="RunStarted", content=None)
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise ConnectionError("conexão caiu")
+            yield SimpleNamespace(event="RunContent", content=token)
+        yield SimpleNamespace(event="RunCompleted", content="".join(self.tokens))
+
+
+@pytest.fixture
+def service() -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc._initialized = True
+    svc._total_questions = 0
+    svc.model = object()
+    svc.model_fallback = object()
+    svc.recorded = []
+    svc._prepare_question = lambda question, start: {"prompt": question, "context_chunks": []}
+    svc._record_question_frequency = lambda q, a, sources=None: svc.recorded.append((q, a))
+    return svc
+
+
+def test_tokens_are_yielded_as_they_arrive(service: ChatbotService):
+    service._get_agent = lambda session_id: _StreamingAgent(["A carga ", "é de ", "200 horas.\n\n\n"])
+
+    events = list(service.ask_question("Carga horária de ACC?", stream=True))
+
+    assert [e["content"] for e in events if e["event"] == "token"] == ["A carga ", "é de ", "200 horas.\n\n\n"]
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["result"]["answer"] == "A carga é de 200 horas."
+    assert done["result"]["time_to_first_token"] is not None
+    # O cache semântico recebe o texto completo só no fim.
+    assert service.recorded == [("Carga horária de ACC?", "A carga é de 200 horas.")]
+
+
+def test_falls_back_when_primary_fails_before_first_token(service: ChatbotService):
+    service._get_agent = lambda session_id: _StreamingAgent(["x"], fail_after=0)
+    service._get_fallback_agent = lambda session_id: _StreamingAgent(["Resposta ", "do Gemini"])
+
+    events = list(service.ask_question_stream("Carga horária de ACC?"))
+
+    assert events[-1]["result"]["answer"] == "Resposta do Gemini"
+
+
+def test_failure_mid_stream_is_reported_without_fallback(service: ChatbotService):
+    service._get_agent = lambda session_id: _StreamingAgent(["A carga ", "é"], fail_after=1)
+    service._get_fallback_agent = lambda session_id: pytest.fail("fallback após tokens enviados")
+
+    events = list(service.ask_question_stream("Carga horária de ACC?"))
+
+    assert [e["event"] for e in events] == ["token", "error"]
+    assert service.recorded == []
+
+
+def test_llm_stage_excludes_time_the_client_takes_to_read(service: ChatbotService):
+    import time
+
+    from backend.infrastructure.rag.metrics import rag_metrics
+
+    service._get_agent = lambda session_id: _StreamingAgent(["A carga ", "é de ", "200 horas."])
+    rag_metrics.reset()
+
+    for event in service.ask_question_stream("Carga horária de ACC?"):
+        if event["event"] == "token":
+            time.sleep(0.05)  # cliente SSE lento
+
+    llm = rag_metrics.summary()["llm_primary"]
+    assert llm["count"] == 1
+    assert llm["avg"] < 0.05
+
+
+def test_resolved_questions_stream_the_whole_answer(service: ChatbotService):
+    cached = {"success": True, "answer": "Resposta do cache.", "method": "cache"}
+    service._prepare_question = lambda question, start: {"result": cached}
+
+    events = list(service.ask_question_stream("Carga horária de ACC?"))
+
+    assert events == [
+        {"event": "token", "content": "Resposta do cache."},
+        {"event": "done", "result": cached},
+    ]
+
+
+def test_sse_framing():
+    frames = list(_sse_events(iter([
+        {"event": "token", "content": "Olá"},
+        {"event": "done", "result": {"success": True, "answer": "Olá", "sources": ["PPC.md"]}},
+    ])))
+
+    assert frames[0] == 'event: token\ndata: {"content": "Olá"}\n\n'
+    assert frames[1].startswith("event: done\ndata: ")
+    assert json.loads(frames[1].split("data: ", 1)[1]) == {"resposta": "Olá", "fontes": ["PPC.md"]}
@@ -0,0 +1,59 @@
+"""Testes do pool de handles LanceDB usado pelo ChatbotService (rag_ppc.py)."""
+from __future__ import annotations
+
+from backend.infrastructure.rag.rag_ppc import SEMANTIC_CACHE_TABLE_NAME, ChatbotService
+from backend.infrastructure.rag.table_pool import LanceTablePool
+
+
+def _rows(n: int) -> list[dict]:
+    return [{"vector": [1.0, 0.0], "id": str(i), "payload": "{}"} for i in range(n)]
+
+
+def test_handle_is_opened_once_and_reused(tmp_path):
+    pool = LanceTablePool(str(tmp_path / "lancedb"))
+    pool.connection().create_table("recipes", data=_rows(2))
+
+    first = pool.get("recipes")
+    second = pool.get("recipes")
+
+    assert first is second
+    stats = pool.stats()
+    assert stats["connects"] == 1
+    assert stats["opens"] == 1
+    assert stats["reuses"] == 1
+
+
+def test_reindex_swaps_handle(tmp_path):
+    pool = LanceTablePool(str(tmp_path / "lancedb"))
+    pool.register("recipes", pool.connection().create_table("recipes", data=_rows(2)))
+    old = pool.get("recipes")
+
+    # Reindexação: a tabela é recriada e o handle antigo precisa ser descartado.
+    pool.invalidate("recipes")
+    pool.connection().create_table("recipes", data=_rows(5), mode="overwrite")
+
+    assert pool.get("recipes") is not old
+    assert pool.get("recipes").count_rows() == 5
+    assert pool.stats()["refreshes"] == 1
+
+
+def test_missing_table(tmp_path):
+    pool = LanceTablePool(str(tmp_path / "lancedb"))
+
+    assert pool.get_if_exists("recipes") is None
+    assert pool.drop_table("recipes") is False
+
+
+def test_semantic_cache_shares_the_service_pool(tmp_path):
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+    svc._setup_semantic_cache()
+    svc._upsert_cache_entry({"question_key": "k", "documents_hash": "h", "vector": [1.0, 0.0]})
+
+    pool = svc._get_table_pool()
+    assert pool.get(SEMANTIC_CACHE_TABLE_NAME) is svc._cache_table
+    assert pool.stats()["connects"] == 1
+
+    assert svc.clear_semantic_cache() is True
+    assert svc._cache_table is None
+    assert SEMANTIC_CACHE_TABLE_NAME not in pool.stats()["open_tables"]
@@ -0,0 +1,68 @@
+"""Testes da criação/ajuste dos índices ANN das tabelas vetoriais do RAG."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.infrastructure.rag import rag_ppc
+from backend.infrastructure.rag.rag_ppc import SEMANTIC_CACHE_TABLE_NAME, ChatbotService
+from backend.infrastructure.rag.vector_index import ensure_vector_index, tune_vector_query
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def _rows(n: int, dim: int = 16, seed: int = 0) -> list[dict]:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [{"vector": v.tolist(), "id": f"{seed}-{i}", "payload": "{}"} for i, v in enumerate(vectors)]
+
+
+@pytest.fixture
+def service(tmp_path) -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+    return svc
+
+
+def test_small_table_stays_flat(service: ChatbotService):
+    table = service._get_table_pool().connection().create_table("recipes", data=_rows(50))
+
+    state = ensure_vector_index(table, min_rows=300)
+
+    assert state["action"] == "below_threshold"
+    assert table.list_indices() == []
+    # nprobes/refine_factor são ignorados sem índice.
+    hits = tune_vector_query(table.search(_rows(1)[0]["vector"]), 20, 10).limit(1).to_list()
+    assert hits[0]["id"] == "0-0"
+
+
+def test_index_is_created_past_threshold_and_optimized(service: ChatbotService):
+    table = service._get_table_pool().connection().create_table("recipes", data=_rows(400))
+
+    created = ensure_vector_index(table, min_rows=300)
+    assert created["action"] == "created"
+    assert created["index"]["num_indexed_rows"] == 400
+
+    table.add(_rows(100, seed=1))
+    optimized = ensure_vector_index(table, min_rows=300)
+    assert optimized["action"] == "optimized"
+    assert optimized["index"]["num_unindexed_rows"] == 0
+
+    probe = _rows(1, seed=1)[0]["vector"]
+    hits = tune_vector_query(table.search(probe).metric("cosine"), 20, 10).limit(1).to_list()
+    assert hits[0]["id"] == "1-0"
+
+
+def test_service_reports_index_state(service: ChatbotService, monkeypatch):
+    monkeypatch.setattr(rag_ppc, "RECIPES_INDEX_MIN_ROWS", 300)
+    service._get_table_pool().connection().create_table("recipes", data=_rows(400))
+
+    service._ensure_vector_index("recipes")
+    status = service.get_vector_index_status()
+
+    recipes = status["tables"]["recipes"]
+    assert recipes["search_mode"] == "ann"
+    assert recipes["rows"] == 400
+    assert recipes["last_check"]["action"] == "created"
+    assert status["tables"][SEMANTIC_CACHE_TABLE_NAME]["exists"] is False
+    assert status["nprobes"] == rag_ppc.VECTOR_INDEX_NPROBES
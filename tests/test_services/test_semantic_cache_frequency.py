@@ -179,8 +179,8 @@ def test_safeguard_ttl_expiration_invalidates_trusted_entry(service: ChatbotServ
     df = service._cache_table.to_pandas()
     row = df.iloc[0].to_dict()
     row["expires_at"] = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
-    service._cache_table.delete(f"question_key = '{row['question_key']}'")
-    service._cache_table.add([row])
+    # Pelo upsert (write-through): as leituras vêm do espelho em memória.
+    service._upsert_cache_entry(row)
 
     assert service._search_cache(question) is None
 
@@ -202,3 +202,147 @@ def test_sliding_ttl_is_renewed_on_each_repetition(service: ChatbotService):
     second_expires_at = df.iloc[0]["expires_at"]
 
     assert second_expires_at > first_expires_at
+
+
+def test_reads_are_served_from_the_in_memory_mirror(service: ChatbotService, monkeypatch):
+    question = "Qual a carga horária de ACC?"
+    answer = "A carga horária de ACC é de 200 horas."
+    for _ in range(SEMANTIC_CACHE_FREQUENCY_PROMOTION_THRESHOLD):
+        service._track_question_frequency(question, answer)
+
+    def _no_lancedb_reads(*args, **kwargs):
+        raise AssertionError("leitura do cache não deveria ir ao LanceDB")
+
+    monkeypatch.setattr(service._cache_table, "search", _no_lancedb_reads)
+    monkeypatch.setattr(service._cache_table, "to_pandas", _no_lancedb_reads)
+
+    assert service._search_cache("Quantas horas sao ACC?")["answer"] == answer
+    assert service._search_cache("Qual o valor da mensalidade?") is None
+    entry = service._track_question_frequency(question, answer)
+    assert entry["hit_count"] == SEMANTIC_CACHE_FREQUENCY_PROMOTION_THRESHOLD + 1
+
+
+def test_mirror_is_reloaded_from_lancedb_after_restart(service: ChatbotService):
+    question = "Qual a carga horária de ACC?"
+    answer = "A carga horária de ACC é de 200 horas."
+    for _ in range(SEMANTIC_CACHE_FREQUENCY_PROMOTION_THRESHOLD):
+        service._track_question_frequency(question, answer)
+
+    restarted = object.__new__(ChatbotService)
+    restarted.db_url = service.db_url
+    restarted.embedder = service.embedder
+    restarted._get_current_documents_hash = service._get_current_documents_hash
+    restarted._setup_semantic_cache()
+
+    assert len(restarted._get_cache_mirror()) == 1
+    assert restarted._search_cache(question)["answer"] == answer
+
+
+def test_async_tracking_coalesces_and_flushes_in_one_write(service: ChatbotService, monkeypatch):
+    from backend.infrastructure.rag import rag_ppc
+
+    monkeypatch.setattr(rag_ppc, "SEMANTIC_CACHE_FREQUENCY_ASYNC", True)
+    monkeypatch.setattr(rag_ppc, "SEMANTIC_CACHE_FREQUENCY_FLUSH_INTERVAL_S", 3600.0)
+    answer = "A carga horária de ACC é de 200 horas."
+    service._track_question_frequency("Qual o valor da mensalidade?", "Não há mensalidade.")
+    version_before = service._cache_table.version
+
+    for question in ("Qual a carga horária de ACC?", "qual a carga  horária de ACC?", "Carga horária de ACC?"):
+        service._record_question_frequency(question, answer)
+    service._record_question_frequency("Qual o valor da mensalidade?", "Não há mensalidade.")
+
+    # Nada gravado no caminho da resposta.
+    assert service._search_cache("Qual a carga horária de ACC?") is None
+    stats = service._get_frequency_queue().stats()
+    assert stats["pending"] == 3 and stats["coalesced"] == 1
+
+    assert service.flush_question_frequency() == 3
+    assert service._cache_table.version == version_before + 1
+
+    df = service._cache_table.to_pandas().set_index("question")
+    assert df.loc["Qual a carga horária de ACC?", "hit_count"] == 3
+    assert df.loc["Qual a carga horária de ACC?", "status"] == "trusted"
+    assert df.loc["Qual o valor da mensalidade?", "hit_count"] == 2
+    assert service._search_cache("Quantas horas sao ACC?")["answer"] == answer
+    service._get_frequency_queue().stop()
+
+
+def test_async_flush_is_timed_apart_from_the_answer_path(service: ChatbotService, monkeypatch):
+    from backend.infrastructure.rag import rag_ppc
+    from backend.infrastructure.rag.metrics import rag_metrics
+
+    monkeypatch.setattr(rag_ppc, "SEMANTIC_CACHE_FREQUENCY_ASYNC", True)
+    monkeypatch.setattr(rag_ppc, "SEMANTIC_CACHE_FREQUENCY_FLUSH_INTERVAL_S", 3600.0)
+    rag_metrics.reset()
+
+    service._record_question_frequency("Qual a carga horária de ACC?", "200 horas.")
+    assert "cache_bookkeeping" not in rag_metrics.summary()
+    assert service.flush_question_frequency() == 1
+    assert rag_metrics.summary()["cache_flush"]["count"] == 1
+    service._get_frequency_queue().stop()
+
+    monkeypatch.setattr(rag_ppc, "SEMANTIC_CACHE_FREQUENCY_ASYNC", False)
+    service._record_question_frequency("Qual a carga horária de ACC?", "200 horas.")
+    assert rag_metrics.summary()["cache_bookkeeping"]["count"] == 1
+
+
+def test_background_thread_flushes_on_interval():
+    import threading
+
+    from backend.infrastructure.rag.batch_queue import CoalescingBatchQueue
+
+    flushed = []
+    done = threading.Event()
+
+    def _flush(batch):
+        flushed.append(batch)
+        done.set()
+
+    queue = CoalescingBatchQueue(_flush, lambda a, b: a + b, flush_interval=0.05).start()
+    queue.submit("k", 1)
+    queue.submit("k", 2)
+
+    assert done.wait(timeout=2.0)
+    assert flushed == [[3]]
+    queue.stop()
+    assert queue.stats()["running"] is False
+
+
+def test_failed_flush_requeues_batch_and_merges_new_repetitions():
+    from backend.infrastructure.rag.batch_queue import CoalescingBatchQueue
+
+    flushed = []
+    failures = [RuntimeError("merge_insert falhou")]
+
+    def _flush(batch):
+        if failures:
+            raise failures.pop()
+        flushed.append(batch)
+
+    queue = CoalescingBatchQueue(_flush, lambda a, b: a + b)
+    queue.submit("k", 1)
+    queue.submit("k", 2)
+
+    assert queue.flush() == 0
+    queue.submit("k", 4)  # repetição que chegou depois da falha
+    assert queue.flush() == 1
+
+    assert flushed == [[7]]
+    stats = queue.stats()
+    assert stats["errors"] == 1 and stats["retried_items"] == 1 and stats["dropped"] == 0
+
+
+def test_item_failing_beyond_retry_cap_is_dropped_and_counted():
+    from backend.infrastructure.rag.batch_queue import CoalescingBatchQueue
+
+    def _flush(batch):
+        raise RuntimeError("tabela indisponível")
+
+    queue = CoalescingBatchQueue(_flush, lambda a, b: a + b, max_retries=2)
+    queue.submit("k", 1)
+
+    for _ in range(3):
+        assert queue.flush() == 0
+
+    assert len(queue) == 0
+    assert queue.stats()["dropped"] == 1
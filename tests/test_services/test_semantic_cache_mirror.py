@@ -0,0 +1,58 @@
+"""Testes do espelho em memória do cache semântico (semantic_cache_mirror.py)."""
+from __future__ import annotations
+
+import pytest
+
+from backend.infrastructure.rag.semantic_cache_mirror import SemanticCacheMirror
+
+
+def _entry(key: str, vector, documents_hash: str = "h1") -> dict:
+    return {"question_key": key, "documents_hash": documents_hash, "vector": vector, "answer": key}
+
+
+def test_search_ranks_by_cosine_like_lancedb():
+    mirror = SemanticCacheMirror(initial_capacity=1).load(
+        [_entry("a", [1.0, 0.0]), _entry("b", [0.0, 2.0]), _entry("c", [1.0, 1.0])]
+    )
+
+    hits = mirror.search([3.0, 0.0], limit=2)
+
+    assert [h["question_key"] for h in hits] == ["a", "c"]
+    assert hits[0]["_distance"] == pytest.approx(0.0, abs=1e-6)
+    assert hits[1]["_distance"] == pytest.approx(1 - 2 ** -0.5, abs=1e-6)
+
+
+def test_upsert_replaces_entry_with_same_key():
+    mirror = SemanticCacheMirror().load([_entry("a", [1.0, 0.0])])
+
+    mirror.upsert({**_entry("a", [0.0, 1.0]), "answer": "nova"})
+
+    assert len(mirror) == 1
+    assert mirror.get("a", "h1")["answer"] == "nova"
+    assert mirror.search([0.0, 1.0], limit=1)[0]["_distance"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_remove_and_retag_keep_lookup_consistent():
+    mirror = SemanticCacheMirror().load(
+        [_entry("a", [1.0, 0.0]), _entry("b", [0.0, 1.0]), _entry("c", [1.0, 1.0])]
+    )
+
+    assert mirror.remove(("a", "h1")) is True
+    assert mirror.remove(("a", "h1")) is False
+    assert mirror.retag("h1", "h2") == 2
+
+    assert mirror.get("b", "h1") is None
+    assert mirror.get("c", "h2")["question_key"] == "c"
+    assert [h["question_key"] for h in mirror.search([0.0, 1.0], limit=5)] == ["b", "c"]
+
+
+def test_retag_drops_previous_entry_when_key_exists_in_target_version():
+    mirror = SemanticCacheMirror().load(
+        [_entry("a", [1.0, 0.0], "h1"), _entry("a", [0.0, 1.0], "h2"), _entry("b", [1.0, 1.0], "h1")]
+    )
+
+    assert mirror.retag("h1", "h2") == 1
+
+    assert len(mirror) == 2
+    assert mirror.get("a", "h2")["vector"] == [0.0, 1.0]
+    assert sorted(e["question_key"] for e in mirror.entries()) == ["a", "b"]
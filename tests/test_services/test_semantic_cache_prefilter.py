@@ -0,0 +1,80 @@
+"""Testes do prefilter da busca no cache semântico (status, versão dos
+documentos e validade aplicados ANTES do top-N de vizinhos)."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+
+from backend.infrastructure.rag.rag_ppc import ChatbotService
+
+HASH = "docs-v2"
+
+
+class _FixedEmbedder:
+    id = "fake-embedder"
+
+    def get_embedding(self, text: str) -> List[float]:
+        return [1.0, 0.0, 0.0]
+
+
+def _entry(key: str, vector, status: str = "candidate", documents_hash: str = HASH, days: int = 7) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "question": key,
+        "answer": f"resposta {key}",
+        "sources": "[]",
+        "vector": vector,
+        "question_key": key,
+        "documents_hash": documents_hash,
+        "status": status,
+        "hit_count": 3 if status == "trusted" else 1,
+        "cached_at": now.isoformat(),
+        "last_feedback_at": now.isoformat(),
+        "expires_at": (now + timedelta(days=days)).isoformat(),
+    }
+
+
+@pytest.fixture
+def service(tmp_path) -> ChatbotService:
+    svc = object.__new__(ChatbotService)
+    svc.db_url = str(tmp_path / "lancedb")
+    svc.embedder = _FixedEmbedder()
+    svc.document_files = []
+    svc._get_current_documents_hash = lambda: HASH
+    svc._setup_semantic_cache()
+    # 30 entradas inelegíveis MAIS próximas da pergunta que a trusted válida:
+    # um pós-filtro sobre os 20 vizinhos nunca chegaria até ela.
+    entries = [_entry(f"candidata-{i}", [1.0, 0.0, 0.0]) for i in range(10)]
+    entries += [_entry(f"expirada-{i}", [1.0, 0.0, 0.0], status="trusted", days=-1) for i in range(10)]
+    entries += [_entry(f"antiga-{i}", [1.0, 0.0, 0.0], status="trusted", documents_hash="docs-v1") for i in range(10)]
+    entries.append(_entry("valida", [0.99, 0.05, 0.0], status="trusted"))
+    assert svc._upsert_cache_entries(entries)
+    return svc
+
+
+def test_trusted_entry_behind_closer_ineligible_ones_is_served(service: ChatbotService):
+    assert service._loaded_cache_mirror() is not None
+
+    hit = service._search_cache("Qual a carga horária de ACC?")
+
+    assert hit is not None
+    assert hit["answer"] == "resposta valida"
+
+
+def test_lancedb_prefilter_without_mirror(service: ChatbotService):
+    service._cache_mirror.loaded = False
+
+    hit = service._search_cache("Qual a carga horária de ACC?")
+    similar = service._find_similar_cache_entry([1.0, 0.0, 0.0], "docs-v1")
+
+    assert hit is not None
+    assert hit["answer"] == "resposta valida"
+    assert similar["documents_hash"] == "docs-v1"
+
+
+def test_scalar_indexes_are_created_with_the_cache_table(service: ChatbotService):
+    indexed = service.get_vector_index_status()["tables"]["semantic_cache"]["scalar_indexes"]
+
+    assert {"status", "documents_hash", "question_key"} <= set(indexed)